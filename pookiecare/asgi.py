@@ -5,6 +5,10 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+Set POOKIECARE_URLCONF=pookiecare.asgi_urls to serve the home, product and
+cart pages with the async views. Measure first (manage.py bench_async): the
+async ORM still runs each query on a worker thread.
 """
 
 import os
@@ -0,0 +1,28 @@
+"""
+Optional URL configuration for ASGI deployments (see pookiecare/asgi.py).
+
+Same routes as pookiecare.urls, except that the home, product detail and
+cart pages are served by the async views in products.async_views.
+"""
+from django.contrib import admin
+from django.urls import path, include
+from django.conf import settings
+from django.conf.urls.static import static
+
+from products.metrics import metrics_view
+from products.static_assets import static_asset_urlpatterns
+from products.urls import app_name as products_app_name, async_urlpatterns
+
+urlpatterns = [
+    path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
+    path('user/', include('user.urls')),
+    path('', include((async_urlpatterns, products_app_name))),  # Homepage and products
+]
+
+# Collected, hashed static files; a front-end server can take this over
+urlpatterns += static_asset_urlpatterns()
+
+# Serve media files in development
+if settings.DEBUG:
+    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
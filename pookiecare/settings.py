@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,7 +43,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so request latency includes all other middleware
+    'products.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # Outermost after security so session and auth queries are counted too
+    'products.middleware.QueryInstrumentationMiddleware',
+    'products.middleware.ReplicaPinMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -51,7 +57,9 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'pookiecare.urls'
+# Set POOKIECARE_URLCONF=pookiecare.asgi_urls under ASGI to serve the catalog
+# with async views (see pookiecare/asgi.py)
+ROOT_URLCONF = os.environ.get('POOKIECARE_URLCONF', 'pookiecare.urls')
 
 TEMPLATES = [
     {
@@ -63,6 +71,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'products.context_processors.cart_summary',
             ],
         },
     },
@@ -74,13 +83,83 @@ WSGI_APPLICATION = 'pookiecare.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Connections are kept for CONN_MAX_AGE seconds and tuned once when opened
+# with the SQLITE_PROFILE pragmas (see products/sqlite.py).
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.environ.get('POOKIECARE_DB', BASE_DIR / 'db.sqlite3'),
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+SQLITE_PROFILE = 'tuned'
+
+# Catalog reads (Product, Brand, Category) go to CATALOG_REPLICA when that alias
+# is configured; a visitor's reads stay on the primary for REPLICA_PIN_SECONDS
+# after they write. Locally, POOKIECARE_REPLICA_DB names a second SQLite file
+# that ``manage.py sync_replica`` refreshes from the primary.
+
+if os.environ.get('POOKIECARE_REPLICA_DB'):
+    DATABASES['replica'] = dict(DATABASES['default'], NAME=os.environ['POOKIECARE_REPLICA_DB'])
+
+DATABASE_ROUTERS = ['products.routers.CatalogReplicaRouter']
+
+CATALOG_REPLICA = 'replica'
+REPLICA_PIN_SECONDS = 15
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Per-process memory cache; point this at Redis or Memcached when running
+# several workers so cached cart summaries are shared between them.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'pookiecare',
+    }
+}
+
+# Cache alias holding the page cache and login throttle counters read by
+# page_cache_stats and login_throttle_stats. LocMemCache is per process, so
+# those commands only see the web server's counts once this alias (or
+# default) is a shared backend such as Redis or Memcached.
+
+STATS_CACHE = 'default'
+
+# Seconds a cart line holds its stock before release_expired_reservations
+# hands the units back.
+
+STOCK_RESERVATION_TTL = 60 * 15
+
+# Seconds an anonymous home/product page stays cached. Catalog edits expire
+# pages immediately; stock changes from checkout show up after this delay.
+
+PAGE_CACHE_TIMEOUT = 60
+
+# Per-request SQL instrumentation (products.middleware): warn when a view runs
+# more than QUERY_COUNT_WARNING queries or one statement more than
+# QUERY_REPEAT_WARNING times. SERVER_TIMING defaults to DEBUG.
+
+QUERY_COUNT_WARNING = 30
+QUERY_REPEAT_WARNING = 5
+
+# Addresses allowed to scrape /metrics (products.metrics); None allows all.
+# Set PROMETHEUS_MULTIPROC_DIR in the environment when running several workers.
+
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+
+# Login attempts allowed per client IP and per email as (attempts, seconds).
+# Rejected attempts never reach the password hasher.
+
+LOGIN_THROTTLE_RATES = {
+    'ip': (30, 60 * 5),
+    'email': (10, 60 * 5),
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -117,6 +196,18 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
 STATIC_URL = 'static/'
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# collectstatic writes content-hashed copies plus .gz/.br variants of them
+# (products/static_assets.py), served with far-future cache headers
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'products.static_assets.PrecompressedManifestStaticFilesStorage',
+    },
+}
 
 # Media files (User-uploaded content)
 MEDIA_URL = '/media/'
@@ -132,8 +223,9 @@ AUTH_USER_MODEL = 'user.User'
 
 # Authentication Backends
 AUTHENTICATION_BACKENDS = [
+    # Subclasses ModelBackend, so permissions work as usual. Listing ModelBackend
+    # too would hash every failed password a second time.
     'user.backends.EmailBackend',  # Custom email authentication backend
-    'django.contrib.auth.backends.ModelBackend',  # Default backend
 ]
 
 # Login/Logout URLs
@@ -19,12 +19,19 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from products.metrics import metrics_view
+from products.static_assets import static_asset_urlpatterns
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
     path('user/', include('user.urls')),
     path('', include('products.urls')),  # Homepage and products
 ]
 
+# Collected, hashed static files; a front-end server can take this over
+urlpatterns += static_asset_urlpatterns()
+
 # Serve media files in development
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -1,6 +1,14 @@
+from datetime import date
+
 from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.db.models import Count, DecimalField, F, Sum
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils import timezone
 from django.utils.html import format_html
-from .models import Brand, Category, Product, Order, OrderItem
+from .models import Brand, Category, Product, Order, OrderItem, SalesDailyRollup
+from . import sales
 
 
 @admin.register(Brand)
@@ -22,11 +30,16 @@ class BrandAdmin(admin.ModelAdmin):
         }),
     )
     
+    def get_queryset(self, request):
+        """Annotate product counts so the changelist runs a single query."""
+        return super().get_queryset(request).annotate(_product_count=Count('products'))
+    
     def product_count(self, obj):
         """Display number of products for this brand."""
-        count = obj.products.count()
+        count = obj._product_count
         return f"{count} product{'s' if count != 1 else ''}"
     product_count.short_description = 'Products'
+    product_count.admin_order_field = '_product_count'
 
 
 @admin.register(Category)
@@ -48,11 +61,16 @@ class CategoryAdmin(admin.ModelAdmin):
         }),
     )
     
+    def get_queryset(self, request):
+        """Annotate product counts so the changelist runs a single query."""
+        return super().get_queryset(request).annotate(_product_count=Count('products'))
+    
     def product_count(self, obj):
         """Display number of products in this category."""
-        count = obj.products.count()
+        count = obj._product_count
         return f"{count} product{'s' if count != 1 else ''}"
     product_count.short_description = 'Products'
+    product_count.admin_order_field = '_product_count'
 
 
 @admin.register(Product)
@@ -63,8 +81,9 @@ class ProductAdmin(admin.ModelAdmin):
                     'stock_status', 'featured', 'created_at')
     list_filter = ('brand', 'category', 'featured', 'created_at')
     search_fields = ('product_name', 'brand__brand_name', 'category__category_name')
-    readonly_fields = ('product_id', 'created_at', 'updated_at', 'image_preview')
+    readonly_fields = ('product_id', 'reserved_stock', 'created_at', 'updated_at', 'image_preview')
     list_editable = ('featured',)
+    list_select_related = ('brand', 'category')
     ordering = ('-created_at',)
     
     fieldsets = (
@@ -76,7 +95,7 @@ class ProductAdmin(admin.ModelAdmin):
             'description': 'Upload an image OR provide a URL. Uploaded image takes priority.'
         }),
         ('Product Details', {
-            'fields': ('product_details', 'price', 'available_stock', 'featured')
+            'fields': ('product_details', 'price', 'available_stock', 'reserved_stock', 'featured')
         }),
         ('Timestamps', {
             'fields': ('created_at', 'updated_at'),
@@ -146,6 +165,7 @@ class OrderAdmin(admin.ModelAdmin):
                        'total_items', 'total_price_display')
     inlines = [OrderItemInline]
     date_hierarchy = 'created_at'
+    list_select_related = ('user',)
     ordering = ('-created_at',)
     
     fieldsets = (
@@ -178,35 +198,62 @@ class OrderAdmin(admin.ModelAdmin):
     status_display.short_description = 'Status'
     status_display.admin_order_field = 'in_cart'
     
+    def get_queryset(self, request):
+        """Annotate item and price totals so the changelist runs a single query."""
+        return super().get_queryset(request).annotate(
+            _total_items=Sum('items__quantity'),
+            _total_price=Sum(
+                F('items__quantity') * F('items__price_at_purchase'),
+                output_field=DecimalField(max_digits=12, decimal_places=2)
+            ),
+        )
+    
     def total_items(self, obj):
         """Display total number of items."""
-        return obj.get_total_items()
+        return obj._total_items or 0
     total_items.short_description = 'Total Items'
+    total_items.admin_order_field = '_total_items'
     
     def total_price_display(self, obj):
         """Display total price."""
-        return f"৳{obj.get_total_price():,.2f}"
+        return f"৳{obj._total_price or 0:,.2f}"
     total_price_display.short_description = 'Total Price'
+    total_price_display.admin_order_field = '_total_price'
     
     actions = ['complete_orders']
     
     def complete_orders(self, request, queryset):
         """Admin action to complete selected orders."""
         completed = 0
-        failed = 0
+        already_completed = []
+        out_of_stock = []
         
-        for order in queryset.filter(in_cart=True):
-            if order.complete_order():
+        for order in queryset:
+            # complete_order() also reports orders checked out since the
+            # changelist was loaded
+            result = order.complete_order() if order.in_cart else None
+            if result:
                 completed += 1
+            elif result is None or result.reason == 'not_in_cart':
+                already_completed.append(str(order.order_id)[:8])
             else:
-                failed += 1
+                products = ", ".join(
+                    item.product.product_name for item in result.failed_items
+                )
+                out_of_stock.append(f"{str(order.order_id)[:8]} ({products or 'stock changed, try again'})")
         
         if completed:
             self.message_user(request, f'{completed} order(s) completed successfully.')
-        if failed:
+        if already_completed:
+            self.message_user(
+                request,
+                f'{len(already_completed)} order(s) were already completed: {", ".join(already_completed)}',
+                level='warning'
+            )
+        if out_of_stock:
             self.message_user(
                 request, 
-                f'{failed} order(s) failed due to insufficient stock.',
+                f'{len(out_of_stock)} order(s) failed due to insufficient stock: {"; ".join(out_of_stock)}',
                 level='error'
             )
     complete_orders.short_description = 'Complete selected orders'
@@ -222,6 +269,7 @@ class OrderItemAdmin(admin.ModelAdmin):
     search_fields = ('product__product_name', 'order__order_id', 'order__user__email')
     readonly_fields = ('order_item_id', 'price_at_purchase', 'subtotal_display', 
                        'created_at', 'updated_at')
+    list_select_related = ('order', 'product__brand')
     ordering = ('-created_at',)
     
     fieldsets = (
@@ -245,6 +293,7 @@ class OrderItemAdmin(admin.ModelAdmin):
         """Display order status."""
         return "In Cart" if obj.order.in_cart else "Completed"
     order_status.short_description = 'Status'
+    order_status.admin_order_field = 'order__in_cart'
     
     def price_at_purchase_display(self, obj):
         """Display price at purchase."""
@@ -255,3 +304,71 @@ class OrderItemAdmin(admin.ModelAdmin):
         """Display subtotal."""
         return f"৳{obj.get_subtotal():,.2f}"
     subtotal_display.short_description = 'Subtotal'
+
+
+@admin.register(SalesDailyRollup)
+class SalesDailyRollupAdmin(admin.ModelAdmin):
+    """
+    Read-only view of the daily sales rollups, plus a sales dashboard built
+    from them rather than from raw orders. Totals and daily sales read only
+    the rollup table; the top-seller lists join Product, Brand or Category
+    for the names of the grouped rows.
+    """
+    
+    list_display = ('day', 'product', 'brand', 'category', 'units', 'revenue_display')
+    list_filter = ('brand', 'category')
+    search_fields = ('product__product_name',)
+    list_select_related = ('product__brand', 'brand', 'category')
+    date_hierarchy = 'day'
+    ordering = ('-day', '-revenue')
+    change_list_template = 'admin/products/salesdailyrollup/change_list.html'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+    
+    def revenue_display(self, obj):
+        """Display revenue with BDT currency."""
+        return f"৳{obj.revenue:,.2f}"
+    revenue_display.short_description = 'Revenue'
+    revenue_display.admin_order_field = 'revenue'
+    
+    def get_urls(self):
+        return [
+            path(
+                'dashboard/',
+                self.admin_site.admin_view(self.dashboard_view),
+                name='products_salesdailyrollup_dashboard',
+            ),
+        ] + super().get_urls()
+    
+    def dashboard_view(self, request):
+        """Month-over-month totals and the selected month's daily sales and best sellers."""
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        today = timezone.localdate()
+        try:
+            month = date.fromisoformat(f"{request.GET.get('month', '')}-01")
+        except ValueError:
+            month = today.replace(day=1)
+        month_end = sales.month_end(month)
+        
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Sales dashboard',
+            'opts': self.model._meta,
+            'month': month,
+            'monthly': sales.monthly_totals(months=12, today=today),
+            'daily': sales.daily_totals(month, month_end),
+            'top_products': sales.top_sellers(month, month_end, 'product'),
+            'top_brands': sales.top_sellers(month, month_end, 'brand'),
+            'top_categories': sales.top_sellers(month, month_end, 'category'),
+        }
+        return TemplateResponse(
+            request, 'admin/products/salesdailyrollup/dashboard.html', context
+        )
@@ -0,0 +1,161 @@
+"""
+Read-only JSON catalog API for mobile clients and partners.
+
+Responses carry a strong ``ETag`` and a ``Last-Modified`` header derived
+from ``Product.updated_at``. Conditional requests (``If-None-Match`` /
+``If-Modified-Since``) are answered with ``304 Not Modified`` before any
+product is loaded or serialized. Anything shown in a response that can
+change must bump ``updated_at``: checkout does, and so do brand and
+category renames via ``products.signals``.
+"""
+import hashlib
+import uuid
+
+from django.http import JsonResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import require_safe
+
+from .models import Product
+from .pagination import DEFAULT_PAGE_SIZE, clamp_page_size, paginate_products
+
+
+# Bump when the JSON shape changes so clients holding old ETags refetch
+API_VERSION = 1
+
+
+def _error(status, detail):
+    return JsonResponse({'detail': detail}, status=status)
+
+
+def _parse_uuid(value):
+    try:
+        return uuid.UUID(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _timestamp(value):
+    return int(value.timestamp() * 1_000_000)
+
+
+def _conditional(request, etag, last_modified, build):
+    """
+    Return a 304 if the client's copy is current, otherwise the response
+    from ``build()`` with validators and revalidation headers attached.
+    """
+    etag = quote_etag(etag)
+    last_modified = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = build()
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    # Clients may keep the body but must check back before reusing it
+    patch_cache_control(response, max_age=0, must_revalidate=True)
+    return response
+
+
+def serialize_product(product, request, details=False):
+    """Return the JSON representation of a product with brand and category loaded."""
+    image_url = product.get_image_url()
+    data = {
+        'id': str(product.product_id),
+        'name': product.product_name,
+        'brand': {'id': str(product.brand_id), 'name': product.brand.brand_name},
+        'category': {'id': str(product.category_id), 'name': product.category.category_name},
+        'price': str(product.price),
+        'available_stock': product.available_stock,
+        'in_stock': product.available_stock > 0,
+        'featured': product.featured,
+        'image_url': request.build_absolute_uri(image_url) if image_url else None,
+        'url': request.build_absolute_uri(
+            reverse('products:product_detail', args=[product.product_id])
+        ),
+        'created_at': product.created_at.isoformat(),
+        'updated_at': product.updated_at.isoformat(),
+    }
+    if details:
+        data['details_html'] = product.product_details
+    return data
+
+
+def _page_url(request, **cursor):
+    params = request.GET.copy()
+    params.pop('after', None)
+    params.pop('before', None)
+    params.update(cursor)
+    return request.build_absolute_uri(f'{request.path}?{params.urlencode()}')
+
+
+@require_safe
+def product_list_api(request):
+    """
+    List in-stock products newest first, optionally filtered by ``brand``
+    and ``category`` ids, paginated with the same cursors as the home page.
+    """
+    products = Product.objects.filter(available_stock__gt=0)
+    for param in ('brand', 'category'):
+        value = request.GET.get(param)
+        if value:
+            pk = _parse_uuid(value)
+            if pk is None:
+                return _error(400, f'Invalid {param} id.')
+            products = products.filter(**{f'{param}_id': pk})
+    page_size = clamp_page_size(request.GET.get('page_size', DEFAULT_PAGE_SIZE))
+
+    # Page through the keys only; full rows are loaded after the 304 check
+    page = paginate_products(
+        products.only('product_id', 'created_at', 'updated_at'),
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+        page_size=page_size,
+    )
+    keys = [(product.product_id, product.updated_at) for product in page]
+    digest = hashlib.sha256(f'v{API_VERSION}|{request.get_full_path()}'.encode())
+    for product_id, updated_at in keys:
+        digest.update(f'|{product_id.hex}:{_timestamp(updated_at)}'.encode())
+    last_modified = max((updated_at for _, updated_at in keys), default=None)
+
+    def build():
+        loaded = Product.objects.select_related('brand', 'category').in_bulk(
+            [product_id for product_id, _ in keys]
+        )
+        return JsonResponse({
+            'results': [
+                serialize_product(loaded[product_id], request)
+                for product_id, _ in keys if product_id in loaded
+            ],
+            'next': _page_url(request, after=page.next_cursor) if page.has_next else None,
+            'previous': _page_url(request, before=page.previous_cursor) if page.has_previous else None,
+        })
+
+    return _conditional(request, digest.hexdigest()[:32], last_modified, build)
+
+
+@require_safe
+def product_detail_api(request, product_id):
+    """Return a single product, including its HTML details."""
+    # Only the validator is read before the 304 check; the full row after
+    updated_at = (
+        Product.objects.filter(product_id=product_id)
+        .values_list('updated_at', flat=True)
+        .first()
+    )
+    if updated_at is None:
+        return _error(404, 'Not found.')
+
+    def build():
+        product = (
+            Product.objects.select_related('brand', 'category')
+            .filter(product_id=product_id)
+            .first()
+        )
+        if product is None:
+            return _error(404, 'Not found.')
+        return JsonResponse(serialize_product(product, request, details=True))
+
+    etag = f'v{API_VERSION}-{product_id.hex}-{_timestamp(updated_at)}'
+    return _conditional(request, etag, updated_at, build)
@@ -5,3 +5,6 @@ class ProductsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'products'
     verbose_name = 'Products & Orders'
+
+    def ready(self):
+        from . import middleware, signals, sqlite  # noqa: F401
@@ -0,0 +1,157 @@
+"""
+Async versions of the catalog read views, routed by ``pookiecare.asgi_urls``.
+
+Under ASGI a sync view is run in the thread pool, which costs a hop per
+request. These views stay in the event loop and start their independent
+lookups (listing page, featured products, facet counts, cart summary)
+together with ``asyncio.gather``. Django still runs every async ORM and
+cache call on one shared worker thread, so the database work is not
+parallel and each lookup pays its own hop; ``manage.py bench_async``
+compares both under load before switching a deployment over.
+
+Everything the templates read is loaded before ``render``, including
+``request.user`` and the cart summary, so rendering never runs a query
+inside the event loop. The mutating cart views stay synchronous.
+"""
+import asyncio
+
+from django.db.models import Prefetch
+from django.http import Http404
+from django.shortcuts import render
+
+from .cart import aget_cart_summary
+from .guest_cart import (
+    aguest_cart_items, guest_cart_summary, guest_cart_total, read_guest_cart,
+)
+from .facets import FacetFilters, aget_facets
+from .models import Order, OrderItem, Product
+from .page_cache import cache_anonymous_page
+from .pagination import apaginate_products
+from .recommendations import arecommended_products
+from .reservations import with_max_quantity
+
+
+async def _resolve_user(request):
+    # Replace the lazy request.user, whose first access would query synchronously
+    request.user = await request.auser()
+    return request.user
+
+
+async def _cart_summary(request, user):
+    if user.is_authenticated:
+        return await aget_cart_summary(user)
+    return guest_cart_summary(read_guest_cart(request))
+
+
+async def _featured(products, filters, cursor=None):
+    # Only the first page of an unfiltered listing shows the featured block.
+    # A cursor usually means a later page; None asks the caller to check
+    # the page once it is known.
+    if filters.active:
+        return []
+    if cursor:
+        return None
+    return [product async for product in products.filter(featured=True)[:6]]
+
+
+@cache_anonymous_page
+async def home_view(request):
+    """Display homepage with all products and featured products."""
+    user = await _resolve_user(request)
+    products = Product.objects.filter(available_stock__gt=0).select_related('brand', 'category')
+    filters = FacetFilters.from_query(request.GET)
+    listing = filters.apply(products) if filters.active else products
+
+    after, before = request.GET.get('after'), request.GET.get('before')
+
+    page, featured_products, facets, cart_summary = await asyncio.gather(
+        apaginate_products(listing, after=after, before=before),
+        _featured(products, filters, cursor=after or before),
+        aget_facets(filters),
+        _cart_summary(request, user),
+    )
+    if featured_products is None:
+        # Paging back with ?before= can land on the first page again
+        featured_products = [] if page.has_previous else await _featured(products, filters)
+
+    context = {
+        'products': page,
+        'page': page,
+        'is_first_page': not page.has_previous,
+        'featured_products': featured_products,
+        'filters': filters,
+        'brand_facets': facets['brands'],
+        'category_facets': facets['categories'],
+        'cart_summary': cart_summary,
+    }
+
+    return render(request, 'products/home.html', context)
+
+
+@cache_anonymous_page
+async def product_detail_view(request, product_id):
+    """Display detailed product information."""
+    user = await _resolve_user(request)
+    try:
+        product = await Product.objects.select_related('brand', 'category').aget(
+            product_id=product_id
+        )
+    except Product.DoesNotExist:
+        raise Http404('No Product matches the given query.')
+
+    related_products, cart_summary = await asyncio.gather(
+        arecommended_products(product, limit=4),
+        _cart_summary(request, user),
+    )
+
+    context = {
+        'product': product,
+        'related_products': related_products,
+        'cart_summary': cart_summary,
+    }
+
+    return render(request, 'products/product_detail.html', context)
+
+
+async def cart_view(request):
+    """Display the shopping cart: the user's database cart or the guest's cookie cart."""
+    user = await _resolve_user(request)
+    if not user.is_authenticated:
+        lines = read_guest_cart(request)
+        items = await aguest_cart_items(lines)
+        return render(
+            request,
+            'products/cart.html',
+            {
+                'cart': None,
+                'items': items,
+                'total_price': guest_cart_total(items),
+                'cart_summary': guest_cart_summary(lines),
+            }
+        )
+
+    cart, cart_summary = await asyncio.gather(
+        Order.objects.filter(user=user, in_cart=True)
+        .prefetch_related(
+            Prefetch(
+                'items',
+                queryset=with_max_quantity(OrderItem.objects.all())
+                .select_related('product__brand', 'product__category')
+            )
+        )
+        .afirst(),
+        aget_cart_summary(user),
+    )
+    items = cart.items.all() if cart else []
+    total_price = cart.get_total_price() if cart else 0
+
+    return render(
+        request,
+        'products/cart.html',
+        {
+            'cart': cart,
+            'items': items,
+            'total_price': total_price,
+            'cart_summary': cart_summary,
+        }
+    )
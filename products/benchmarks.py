@@ -0,0 +1,65 @@
+"""
+Shared plumbing for the ``bench_*`` management commands.
+
+- ``rolled_back()`` runs the seeding and measuring in one transaction that
+  is rolled back at the end, so a benchmark leaves the database as it was
+- ``test_environment()`` sets up Django's test environment (needed for
+  ``Client`` and ``response.context``) unless the test suite already did
+- ``isolated_caches()`` points every cache alias at a private, empty
+  LocMemCache, so runs start cold and never clear or fill the configured
+  cache, which may be shared with a running site
+"""
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import transaction
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+@contextmanager
+def rolled_back(keep=False):
+    """Run the block in a transaction that is rolled back unless ``keep``."""
+    with transaction.atomic():
+        yield
+        if not keep:
+            transaction.set_rollback(True)
+
+
+@contextmanager
+def test_environment():
+    try:
+        setup_test_environment()
+    except RuntimeError:
+        # Already set up, e.g. when called from the test suite
+        owns_test_environment = False
+    else:
+        owns_test_environment = True
+    try:
+        yield
+    finally:
+        if owns_test_environment:
+            teardown_test_environment()
+
+
+@contextmanager
+def isolated_caches():
+    """Replace every configured cache alias with a new private LocMemCache."""
+    run = uuid.uuid4().hex[:8]
+    private = {
+        alias: {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': f'bench-{run}-{alias}',
+        }
+        for alias in settings.CACHES
+    }
+    with override_settings(CACHES=private):
+        yield
@@ -0,0 +1,77 @@
+"""
+Per-user cart summary (item count and total) kept in the cache framework.
+
+The summary is shown in the header of every page, so it is computed once
+with a single aggregate query and then served from the cache until a cart
+mutation or checkout invalidates it.
+"""
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import DecimalField, F, Sum
+
+from .metrics import count_cache_lookup
+from .models import OrderItem
+
+
+CART_SUMMARY_TIMEOUT = 60 * 15
+
+EMPTY_CART_SUMMARY = {'item_count': 0, 'total_price': Decimal('0.00')}
+
+CART_TOTALS = {
+    'item_count': Sum('quantity'),
+    'total_price': Sum(
+        F('quantity') * F('price_at_purchase'),
+        output_field=DecimalField(max_digits=12, decimal_places=2)
+    ),
+}
+
+
+def _cart_items(user):
+    return OrderItem.objects.filter(order__user=user, order__in_cart=True)
+
+
+def _summary(totals):
+    return {
+        'item_count': totals['item_count'] or 0,
+        'total_price': totals['total_price'] or Decimal('0.00'),
+    }
+
+
+def cart_summary_key(user_id):
+    """Return the cache key holding the cart summary of a user."""
+    return f'products:cart-summary:{user_id}'
+
+
+def get_cart_summary(user):
+    """
+    Return ``{'item_count': int, 'total_price': Decimal}`` for the user's cart.
+    Anonymous users always get an empty summary.
+    """
+    if not user.is_authenticated:
+        return EMPTY_CART_SUMMARY
+    key = cart_summary_key(user.pk)
+    summary = cache.get(key)
+    count_cache_lookup('cart_summary', summary is not None)
+    if summary is None:
+        summary = _summary(_cart_items(user).aggregate(**CART_TOTALS))
+        cache.set(key, summary, CART_SUMMARY_TIMEOUT)
+    return summary
+
+
+async def aget_cart_summary(user):
+    """Async version of ``get_cart_summary`` for an already resolved user."""
+    if not user.is_authenticated:
+        return EMPTY_CART_SUMMARY
+    key = cart_summary_key(user.pk)
+    summary = await cache.aget(key)
+    count_cache_lookup('cart_summary', summary is not None)
+    if summary is None:
+        summary = _summary(await _cart_items(user).aaggregate(**CART_TOTALS))
+        await cache.aset(key, summary, CART_SUMMARY_TIMEOUT)
+    return summary
+
+
+def invalidate_cart_summary(user_id):
+    """Drop the cached cart summary after the user's cart has changed."""
+    cache.delete(cart_summary_key(user_id))
@@ -0,0 +1,127 @@
+"""
+Batched cart edits.
+
+``update_cart_lines`` applies the quantity changes of a whole cart in one
+transaction instead of one request and ``reserve()`` call per line. Lines
+and their products' stock are read with one query; lines set below 1 are
+deleted, the rest go through ``bulk_update``, and the matching stock holds
+move with one conditional ``UPDATE`` of ``Product.reserved_stock``. The
+query count is the same for two lines or twenty.
+"""
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OrderItem, Product, StockReservation
+from .reservations import per_product, reservation_ttl
+
+
+class CartUpdate:
+    """
+    Outcome of ``update_cart_lines``. ``updated`` holds the OrderItems with
+    their new quantity, ``removed`` the ids of deleted lines, ``rejected``
+    maps lines asking for more than is free to the units this cart could
+    have, and ``missing`` lists ids not in the cart. ``conflict`` is set
+    when another cart claimed stock between the read and the write; the
+    whole batch is then rolled back and nothing is applied.
+    """
+
+    def __init__(self):
+        self.updated = []
+        self.removed = []
+        self.rejected = {}
+        self.missing = []
+        self.conflict = False
+
+    def __bool__(self):
+        return not self.rejected and not self.missing and not self.conflict
+
+
+def update_cart_lines(order, quantities):
+    """
+    Set ``{order_item_id: quantity}`` on the lines of an open cart order;
+    a quantity below 1 removes the line. Lines that stock cannot cover are
+    left unchanged and reported, the others are applied. Returns a
+    CartUpdate.
+    """
+    result = CartUpdate()
+    now = timezone.now()
+    expires_at = now + reservation_ttl()
+    with transaction.atomic():
+        items = {
+            item.pk: item
+            for item in OrderItem.objects.select_for_update()
+            .filter(order=order, pk__in=quantities)
+            .select_related('product')
+        }
+        result.missing = [pk for pk in quantities if pk not in items]
+        # Locked like reserve() does, so release_expired cannot sweep a
+        # hold this batch is about to move
+        holds = {
+            hold.product_id: hold
+            for hold in StockReservation.objects.select_for_update().filter(
+                order=order, product_id__in=[item.product_id for item in items.values()]
+            )
+        }
+
+        deleted, changed_holds, new_holds, deltas = [], [], [], {}
+        for pk, item in items.items():
+            quantity = quantities[pk]
+            hold = holds.get(item.product_id)
+            held = hold.quantity if hold else 0
+            if quantity < 1:
+                deleted.append(pk)
+                result.removed.append(pk)
+                if held:
+                    deltas[item.product_id] = -held
+                continue
+            if quantity == item.quantity and quantity == held:
+                continue
+            product = item.product
+            available = product.available_stock - product.reserved_stock + held
+            if quantity > available:
+                result.rejected[pk] = max(available, 0)
+                continue
+            item.quantity, item.updated_at = quantity, now
+            result.updated.append(item)
+            if hold:
+                hold.quantity, hold.expires_at, hold.updated_at = quantity, expires_at, now
+                changed_holds.append(hold)
+            else:
+                new_holds.append(StockReservation(
+                    order=order, product=product, quantity=quantity, expires_at=expires_at,
+                ))
+            if quantity != held:
+                deltas[item.product_id] = quantity - held
+
+        claims = {pk: delta for pk, delta in deltas.items() if delta > 0}
+        releases = {pk: delta for pk, delta in deltas.items() if delta < 0}
+        if claims:
+            # Re-check the stock in the UPDATE itself in case another cart
+            # claimed units since it was read
+            claimed = Product.objects.filter(
+                pk__in=claims,
+                available_stock__gte=F('reserved_stock') + per_product(claims),
+            ).update(reserved_stock=F('reserved_stock') + per_product(claims))
+            if claimed != len(claims):
+                transaction.set_rollback(True)
+                result.conflict = True
+                for item in result.updated:
+                    if item.product_id in claims:
+                        result.rejected[item.pk] = 0
+                result.updated, result.removed = [], []
+                return result
+        if releases:
+            # Giving units back never needs stock, like release()
+            Product.objects.filter(pk__in=releases).update(
+                reserved_stock=F('reserved_stock') + per_product(releases)
+            )
+
+        OrderItem.objects.filter(pk__in=deleted).delete()
+        StockReservation.objects.filter(
+            order=order, product_id__in=[items[pk].product_id for pk in deleted]
+        ).delete()
+        OrderItem.objects.bulk_update(result.updated, ['quantity', 'updated_at'])
+        StockReservation.objects.bulk_update(changed_holds, ['quantity', 'expires_at', 'updated_at'])
+        StockReservation.objects.bulk_create(new_holds)
+    return result
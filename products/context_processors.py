@@ -0,0 +1,21 @@
+from django.utils.functional import SimpleLazyObject
+
+from .cart import get_cart_summary
+from .guest_cart import guest_cart_summary, read_guest_cart
+
+
+def cart_summary(request):
+    """
+    Expose the current user's cart summary to every template, or the
+    guest's cookie cart summary for anonymous visitors.
+    Evaluated lazily, so pages that never show the header badge (e.g. the
+    admin) do not touch the cache at all.
+    """
+    def summary():
+        if request.user.is_authenticated:
+            return get_cart_summary(request.user)
+        return guest_cart_summary(read_guest_cart(request))
+
+    return {
+        'cart_summary': SimpleLazyObject(summary),
+    }
@@ -0,0 +1,75 @@
+"""
+Event counters kept in the cache.
+
+The anonymous page cache counts hits and misses and the login throttle
+counts rejections here. The counters live in the cache alias named by the
+``STATS_CACHE`` setting (``default`` unless set), so every process sharing
+that backend adds to, and reads, the same numbers.
+
+A process-local backend (LocMemCache, DummyCache) keeps one set per
+process: a management command then runs in a process of its own and
+reads zeros. ``counters_are_shared()`` lets the stats commands say so.
+"""
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+
+PROCESS_LOCAL_WARNING = (
+    'The {alias!r} cache is {backend}, which is per process: these counters only '
+    'cover this command, not the web server. Point STATS_CACHE at a shared cache '
+    '(Redis, Memcached, database) to see them.'
+)
+
+
+def stats_cache_alias():
+    return getattr(settings, 'STATS_CACHE', DEFAULT_CACHE_ALIAS)
+
+
+def counters_cache():
+    return caches[stats_cache_alias()]
+
+
+def counters_are_shared():
+    """Return False when the counters cache is private to this process."""
+    return not isinstance(counters_cache(), (LocMemCache, DummyCache))
+
+
+def process_local_warning():
+    """Return the warning the stats commands print, or '' for a shared cache."""
+    if counters_are_shared():
+        return ''
+    return PROCESS_LOCAL_WARNING.format(
+        alias=stats_cache_alias(), backend=type(counters_cache()).__name__
+    )
+
+
+def increment(key):
+    """Add one to the counter ``key``, creating it at zero first."""
+    cache = counters_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+
+
+async def aincrement(key):
+    """Async version of ``increment``."""
+    cache = counters_cache()
+    try:
+        await cache.aincr(key)
+    except ValueError:
+        await cache.aadd(key, 0, timeout=None)
+        await cache.aincr(key)
+
+
+def read_counters(keys):
+    """Return ``{key: count}`` for ``keys``, zero for counters never incremented."""
+    counts = counters_cache().get_many(keys)
+    return {key: counts.get(key, 0) for key in keys}
+
+
+def reset_counters(keys):
+    counters_cache().delete_many(list(keys))
@@ -0,0 +1,175 @@
+"""
+Faceted filtering for product listings.
+
+A listing can be narrowed by several brands, several categories and a price
+range at once. Each facet shows how many in-stock products every value would
+match given the *other* active filters, which is how shoppers expect
+multi-select facets to behave. Counts for a facet come from one grouped
+aggregate over its own table and are cached per filter signature and
+catalog version, so most page views do not query for them at all.
+"""
+import hashlib
+import uuid
+from decimal import Decimal, InvalidOperation
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from .metrics import count_cache_lookup
+from .models import Brand, Category
+from .page_cache import aget_catalog_version, get_catalog_version
+
+
+FACET_CACHE_TIMEOUT = 60
+
+
+def _uuids(values):
+    parsed = []
+    for value in values:
+        try:
+            parsed.append(uuid.UUID(value))
+        except (TypeError, ValueError, AttributeError):
+            continue
+    return sorted(set(parsed))
+
+
+def _price(value):
+    try:
+        price = Decimal(value)
+    except (TypeError, ValueError, InvalidOperation):
+        return None
+    return price if price.is_finite() and price >= 0 else None
+
+
+def _price_key(price):
+    # 50, 50.0 and 50.00 are the same filter
+    return format(price.normalize(), 'f') if price is not None else ''
+
+
+class FacetFilters:
+    """The brand, category and price selections of one listing request."""
+
+    def __init__(self, brands=(), categories=(), min_price=None, max_price=None):
+        self.brands = list(brands)
+        self.categories = list(categories)
+        self.min_price = min_price
+        self.max_price = max_price
+
+    @classmethod
+    def from_query(cls, params):
+        """Parse ``brand``/``category`` (repeatable) and ``min_price``/``max_price``, ignoring bad values."""
+        return cls(
+            brands=_uuids(params.getlist('brand')),
+            categories=_uuids(params.getlist('category')),
+            min_price=_price(params.get('min_price')),
+            max_price=_price(params.get('max_price')),
+        )
+
+    @property
+    def active(self):
+        return bool(
+            self.brands or self.categories
+            or self.min_price is not None or self.max_price is not None
+        )
+
+    def q(self, prefix='', exclude=None):
+        """
+        Return the in-stock condition plus every active filter except the
+        ``exclude`` facet, with field names prefixed by ``prefix``.
+        """
+        conditions = {f'{prefix}available_stock__gt': 0}
+        if self.brands and exclude != 'brand':
+            conditions[f'{prefix}brand_id__in'] = self.brands
+        if self.categories and exclude != 'category':
+            conditions[f'{prefix}category_id__in'] = self.categories
+        if self.min_price is not None:
+            conditions[f'{prefix}price__gte'] = self.min_price
+        if self.max_price is not None:
+            conditions[f'{prefix}price__lte'] = self.max_price
+        return Q(**conditions)
+
+    def apply(self, queryset):
+        """Narrow a Product queryset to the selected products."""
+        return queryset.filter(self.q())
+
+    def signature(self):
+        """Return a stable string identifying this filter state."""
+        return '|'.join([
+            ','.join(pk.hex for pk in self.brands),
+            ','.join(pk.hex for pk in self.categories),
+            _price_key(self.min_price),
+            _price_key(self.max_price),
+        ])
+
+
+class FacetValue:
+    """One selectable facet value with its product count."""
+
+    def __init__(self, pk, name, count, selected):
+        self.pk = pk
+        self.name = name
+        self.count = count
+        self.selected = selected
+
+
+def _facet_rows(model, name_field, facet, filters):
+    return (
+        model.objects.annotate(
+            product_count=Count('products', filter=filters.q(prefix='products__', exclude=facet))
+        )
+        .order_by(name_field)
+        .values_list('pk', name_field, 'product_count')
+    )
+
+
+def _facet(model, name_field, facet, filters, selected):
+    rows = _facet_rows(model, name_field, facet, filters)
+    return [FacetValue(pk, name, count, pk in selected) for pk, name, count in rows]
+
+
+async def _afacet(model, name_field, facet, filters, selected):
+    rows = _facet_rows(model, name_field, facet, filters)
+    return [FacetValue(pk, name, count, pk in selected) async for pk, name, count in rows]
+
+
+def _digest(filters):
+    return hashlib.sha256(filters.signature().encode()).hexdigest()[:32]
+
+
+def facet_cache_key(filters):
+    return f'products:facets:{get_catalog_version()}:{_digest(filters)}'
+
+
+def get_facets(filters):
+    """
+    Return ``{'brands': [FacetValue], 'categories': [FacetValue]}`` for a
+    filter state: one grouped query per facet on a cache miss, none on a hit.
+    """
+    key = facet_cache_key(filters)
+    facets = cache.get(key)
+    count_cache_lookup('facets', facets is not None)
+    if facets is None:
+        facets = {
+            'brands': _facet(Brand, 'brand_name', 'brand', filters, set(filters.brands)),
+            'categories': _facet(
+                Category, 'category_name', 'category', filters, set(filters.categories)
+            ),
+        }
+        cache.set(key, facets, FACET_CACHE_TIMEOUT)
+    return facets
+
+
+async def aget_facets(filters):
+    """Async version of ``get_facets``."""
+    key = f'products:facets:{await aget_catalog_version()}:{_digest(filters)}'
+    facets = await cache.aget(key)
+    count_cache_lookup('facets', facets is not None)
+    if facets is None:
+        facets = {
+            'brands': await _afacet(Brand, 'brand_name', 'brand', filters, set(filters.brands)),
+            'categories': await _afacet(
+                Category, 'category_name', 'category', filters, set(filters.categories)
+            ),
+        }
+        await cache.aset(key, facets, FACET_CACHE_TIMEOUT)
+    return facets
@@ -0,0 +1,64 @@
+"""
+Cached HTML fragments for product cards.
+
+The link/image/info part of a listing card only depends on the product, so
+its rendered HTML is cached under the product's id and ``updated_at``. A
+listing page fetches every card it needs with one ``get_many`` call and
+only renders the misses. Saving a product moves it to a new key and drops
+the old one (see ``products.signals``).
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+
+CARD_TEMPLATE = 'products/includes/product_card.html'
+CARD_CACHE_TIMEOUT = 60 * 60
+
+
+class ProductCard:
+    """A product paired with its rendered (and possibly cached) card HTML."""
+
+    def __init__(self, product, html):
+        self.product = product
+        self.html = html
+
+
+def card_cache_enabled():
+    """Return False when ``PRODUCT_CARD_CACHE`` is switched off in settings."""
+    return getattr(settings, 'PRODUCT_CARD_CACHE', True)
+
+
+def card_cache_key(product):
+    """Return the cache key for the current version of a product's card."""
+    version = int(product.updated_at.timestamp() * 1_000_000)
+    return f'products:card:{product.product_id.hex}:{version}'
+
+
+def render_product_cards(products):
+    """Return a ProductCard for each product, rendering only cache misses."""
+    products = list(products)
+    template = get_template(CARD_TEMPLATE)
+    if not card_cache_enabled():
+        return [ProductCard(p, mark_safe(template.render({'product': p}))) for p in products]
+
+    keys = [card_cache_key(product) for product in products]
+    cached = cache.get_many(keys)
+    missing = {}
+    cards = []
+    for key, product in zip(keys, products):
+        html = cached.get(key)
+        if html is None:
+            html = template.render({'product': product})
+            missing[key] = html
+        cards.append(ProductCard(product, mark_safe(html)))
+    if missing:
+        cache.set_many(missing, CARD_CACHE_TIMEOUT)
+    return cards
+
+
+def invalidate_product_card(product):
+    """Drop the cached card for the version of ``product`` held in memory."""
+    if product.updated_at is not None:
+        cache.delete(card_cache_key(product))
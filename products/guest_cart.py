@@ -0,0 +1,223 @@
+"""
+Anonymous carts kept in a signed cookie.
+
+A visitor who is not logged in gets their cart as ``<product hex>:<qty>``
+pairs in a signed cookie, so browsing and filling a cart writes nothing
+to the database. Prices and stock are always read from the catalog; the
+cookie only says what was picked. When the visitor logs in,
+``merge_guest_cart`` moves the lines into their database cart in one pass
+and the cookie is dropped.
+"""
+import uuid
+from decimal import Decimal
+
+from django.core import signing
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .cart import invalidate_cart_summary
+from .models import Order, OrderItem, Product, StockReservation
+from .reservations import per_product, reservation_ttl
+
+
+GUEST_CART_COOKIE = 'guest_cart'
+GUEST_CART_SALT = 'products.guest_cart'
+GUEST_CART_MAX_AGE = 60 * 60 * 24 * 30
+
+# Keeps the cookie well under the 4 KB browsers accept
+MAX_GUEST_CART_LINES = 40
+MAX_GUEST_LINE_QUANTITY = 99
+
+
+def read_guest_cart(request):
+    """
+    Return the visitor's cookie cart as ``{product_id: quantity}`` in the
+    order the lines were added. A missing, tampered or expired cookie is
+    an empty cart.
+    """
+    try:
+        value = request.get_signed_cookie(
+            GUEST_CART_COOKIE, salt=GUEST_CART_SALT, max_age=GUEST_CART_MAX_AGE
+        )
+    except (KeyError, signing.BadSignature):
+        return {}
+    lines = {}
+    for pair in value.split('|'):
+        product, _, quantity = pair.partition(':')
+        try:
+            product_id = uuid.UUID(hex=product)
+            quantity = int(quantity)
+        except ValueError:
+            continue
+        if 0 < quantity <= MAX_GUEST_LINE_QUANTITY and len(lines) < MAX_GUEST_CART_LINES:
+            lines[product_id] = quantity
+    return lines
+
+
+def save_guest_cart(response, lines):
+    """Store ``{product_id: quantity}`` on the response, or drop the cookie when empty."""
+    if not lines:
+        clear_guest_cart(response)
+        return
+    value = '|'.join(f'{product_id.hex}:{quantity}' for product_id, quantity in lines.items())
+    response.set_signed_cookie(
+        GUEST_CART_COOKIE, value, salt=GUEST_CART_SALT, max_age=GUEST_CART_MAX_AGE,
+        httponly=True, samesite='Lax',
+    )
+
+
+def clear_guest_cart(response):
+    response.delete_cookie(GUEST_CART_COOKIE, samesite='Lax')
+
+
+def guest_cart_summary(lines):
+    """
+    Header summary for a cookie cart. The item count needs no query; the
+    total would, so it is left as None and shown on the cart page only.
+    """
+    return {'item_count': sum(lines.values()), 'total_price': None}
+
+
+def _guest_items(lines, products):
+    items = []
+    for pk, quantity in lines.items():
+        product = products.get(pk)
+        if product is None:
+            continue
+        item = OrderItem(product=product, quantity=quantity, price_at_purchase=product.price)
+        item.max_quantity = min(product.available_to_sell, MAX_GUEST_LINE_QUANTITY)
+        items.append(item)
+    return items
+
+
+def _line_products(lines):
+    return Product.objects.filter(pk__in=lines).select_related('brand', 'category')
+
+
+def guest_cart_items(lines):
+    """
+    Return unsaved OrderItems for the cart page, priced at the current
+    product price, with one query. Products deleted since are left out.
+    """
+    return _guest_items(lines, _line_products(lines).in_bulk())
+
+
+async def aguest_cart_items(lines):
+    """Async version of ``guest_cart_items``."""
+    return _guest_items(lines, await _line_products(lines).ain_bulk())
+
+
+def guest_cart_total(items):
+    return sum((item.get_subtotal() for item in items), Decimal('0.00'))
+
+
+def _claim_stock(claims):
+    """
+    Add ``{product_pk: units}`` to ``reserved_stock`` where that many units
+    are free, with one conditional UPDATE. If some products are short, that
+    UPDATE is undone and each product is claimed on its own. Returns the
+    pks whose units could not be claimed.
+    """
+    if not claims:
+        return set()
+    with transaction.atomic():
+        claimed = Product.objects.filter(
+            pk__in=claims,
+            available_stock__gte=F('reserved_stock') + per_product(claims),
+        ).update(reserved_stock=F('reserved_stock') + per_product(claims))
+        if claimed == len(claims):
+            return set()
+        transaction.set_rollback(True)
+    lost = set()
+    for pk, units in claims.items():
+        if not Product.objects.filter(
+            pk=pk, available_stock__gte=F('reserved_stock') + units,
+        ).update(reserved_stock=F('reserved_stock') + units):
+            lost.add(pk)
+    return lost
+
+
+def merge_guest_cart(user, lines):
+    """
+    Add a cookie cart to the user's database cart, holding stock for every
+    line like ``reserve`` does. Quantities add up with lines already in the
+    cart and are cut to the units nobody else holds; stock for all lines is
+    read with one locked IN query and claimed with conditional UPDATEs, so a
+    line whose units went in the meantime keeps its old quantity. Returns the
+    products that could not be added in full.
+    """
+    if not lines:
+        return []
+    now = timezone.now()
+    expires_at = now + reservation_ttl()
+    short = []
+    with transaction.atomic():
+        products = Product.objects.select_for_update().in_bulk(list(lines))
+        if not products:
+            return []
+        order, _ = Order.objects.get_or_create(user=user, in_cart=True)
+        items = {
+            item.product_id: item
+            for item in OrderItem.objects.filter(order=order, product_id__in=products)
+        }
+        holds = {
+            hold.product_id: hold
+            for hold in StockReservation.objects.select_for_update().filter(
+                order=order, product_id__in=products
+            )
+        }
+
+        planned, claims = [], {}
+        for pk, product in products.items():
+            item, hold = items.get(pk), holds.get(pk)
+            current = item.quantity if item else 0
+            held = hold.quantity if hold else 0
+            wanted = current + lines[pk]
+            # This order may take its own holds plus whatever no cart holds
+            quantity = min(wanted, product.available_stock - product.reserved_stock + held)
+            if quantity < wanted:
+                short.append(product)
+            if quantity <= current:
+                continue
+            planned.append((product, item, hold, quantity))
+            claims[pk] = quantity - held
+
+        # Claimed with a conditional UPDATE like reserve(); lines that lose
+        # keep the quantity they already had
+        lost = _claim_stock({pk: delta for pk, delta in claims.items() if delta > 0})
+        releases = {pk: delta for pk, delta in claims.items() if delta < 0}
+        if releases:
+            Product.objects.filter(pk__in=releases).update(
+                reserved_stock=F('reserved_stock') + per_product(releases),
+            )
+
+        new_items, changed_items, new_holds, changed_holds = [], [], [], []
+        for product, item, hold, quantity in planned:
+            if product.pk in lost:
+                if product not in short:
+                    short.append(product)
+                continue
+            if item:
+                item.quantity, item.updated_at = quantity, now
+                changed_items.append(item)
+            else:
+                new_items.append(OrderItem(
+                    order=order, product=product, quantity=quantity,
+                    price_at_purchase=product.price,
+                ))
+            if hold:
+                hold.quantity, hold.expires_at, hold.updated_at = quantity, expires_at, now
+                changed_holds.append(hold)
+            else:
+                new_holds.append(StockReservation(
+                    order=order, product=product, quantity=quantity, expires_at=expires_at,
+                ))
+
+        OrderItem.objects.bulk_create(new_items)
+        OrderItem.objects.bulk_update(changed_items, ['quantity', 'updated_at'])
+        StockReservation.objects.bulk_create(new_holds)
+        StockReservation.objects.bulk_update(changed_holds, ['quantity', 'expires_at', 'updated_at'])
+
+    invalidate_cart_summary(user.pk)
+    return short
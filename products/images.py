@@ -0,0 +1,192 @@
+"""
+Fixed-width derivatives of uploaded product images.
+
+Every uploaded ``Product.product_image`` is resized to a small set of widths
+(thumb, card and detail) and saved as both WebP and JPEG next to the
+original under ``products/images/derivatives/``. Templates reference them
+through ``srcset`` so browsers only download the size they actually need.
+"""
+import logging
+import posixpath
+import time
+from collections import OrderedDict
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+
+logger = logging.getLogger(__name__)
+
+IMAGE_SIZES = {
+    'thumb': 160,
+    'card': 480,
+    'detail': 1000,
+}
+
+IMAGE_FORMATS = ('jpeg', 'webp')
+
+DERIVATIVES_DIR = 'derivatives'
+
+_SAVE_OPTIONS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpeg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+}
+
+_EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+
+# Seconds a missing derivative is remembered before storage is asked again.
+# generate_derivatives() forgets the miss at once in its own process; other
+# processes (web workers while a backfill runs) notice within this time.
+MISSING_RECHECK_SECONDS = 60
+
+# Originals remembered per process in each of the lookups below; the oldest
+# entries are dropped beyond this so long-running workers stay bounded
+MAX_REMEMBERED_IMAGES = 10_000
+
+
+class _BoundedDict(OrderedDict):
+    """A dict that forgets its oldest entries beyond ``maxsize``."""
+    
+    def __init__(self, maxsize):
+        super().__init__()
+        self.maxsize = maxsize
+    
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        while len(self) > self.maxsize:
+            self.popitem(last=False)
+
+
+# Originals whose derivatives are known to exist: name -> width of the
+# widest one, which is less than 'detail' when the original is narrower
+_ready = _BoundedDict(MAX_REMEMBERED_IMAGES)
+# Originals found without derivatives: name -> time.monotonic() to recheck at
+_missing = _BoundedDict(MAX_REMEMBERED_IMAGES)
+
+
+def derivative_name(name, size, fmt):
+    """
+    Return the storage name of one derivative of an original image, e.g.
+    ``products/images/derivatives/serum-png-480w.webp``.
+    """
+    directory, filename = posixpath.split(name)
+    stem = filename.replace('.', '-')
+    width = IMAGE_SIZES[size]
+    return posixpath.join(directory, DERIVATIVES_DIR, f'{stem}-{width}w.{_EXTENSIONS[fmt]}')
+
+
+def _widest_derivative(name):
+    """Return the width of the widest derivative of ``name``, or None if not written yet."""
+    if name in _ready:
+        return _ready[name]
+    if _missing.get(name, 0) > time.monotonic():
+        return None
+    # The largest WebP is written last, so it doubles as a completion marker;
+    # its width is the original's when that is narrower than 'detail'
+    marker = derivative_name(name, 'detail', 'webp')
+    if default_storage.exists(marker):
+        try:
+            with default_storage.open(marker, 'rb') as source:
+                width = Image.open(source).width
+        except OSError as exc:
+            logger.warning('Could not read derivative %s: %s', marker, exc)
+        else:
+            _ready[name] = width
+            _missing.pop(name, None)
+            return width
+    _missing[name] = time.monotonic() + MISSING_RECHECK_SECONDS
+    return None
+
+
+def has_derivatives(name):
+    """Return True once every derivative of ``name`` has been written."""
+    return _widest_derivative(name) is not None
+
+
+def derivative_url(name, size, fmt='jpeg'):
+    """Return the URL of a derivative, or None if it has not been generated."""
+    if not has_derivatives(name):
+        return None
+    return default_storage.url(derivative_name(name, size, fmt))
+
+
+def srcset(name, fmt='jpeg'):
+    """
+    Return a ``srcset`` value listing the widths of ``name`` in ``fmt``.
+    Sizes wider than the original are left out, and the widest entry gives
+    the width the derivative really has.
+    """
+    widest = _widest_derivative(name)
+    if widest is None:
+        return ''
+    entries = []
+    for size, width in sorted(IMAGE_SIZES.items(), key=lambda entry: entry[1]):
+        entries.append(f'{default_storage.url(derivative_name(name, size, fmt))} {min(width, widest)}w')
+        if width >= widest:
+            break
+    return ', '.join(entries)
+
+
+def _encode(image, fmt):
+    if fmt == 'jpeg' and image.mode != 'RGB':
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        rgba = image.convert('RGBA')
+        background.paste(rgba, mask=rgba.split()[-1])
+        image = background
+    buffer = BytesIO()
+    image.save(buffer, **_SAVE_OPTIONS[fmt])
+    return buffer.getvalue()
+
+
+def generate_derivatives(name, force=False):
+    """
+    Write every size/format derivative of the stored image ``name``.
+    Existing derivatives are kept unless ``force`` is set. Images narrower
+    than a target width are re-encoded at their own width rather than
+    upscaled. Returns the number of files written.
+    """
+    # Look at storage, not a remembered miss, before deciding to skip
+    _missing.pop(name, None)
+    if not force and has_derivatives(name):
+        return 0
+
+    with default_storage.open(name, 'rb') as source:
+        original = ImageOps.exif_transpose(Image.open(source))
+        original.load()
+    if original.mode not in ('RGB', 'RGBA'):
+        original = original.convert('RGBA' if 'A' in original.getbands() else 'RGB')
+
+    written = 0
+    # Smallest first so the detail WebP (the completion marker) is written last
+    for size, width in sorted(IMAGE_SIZES.items(), key=lambda entry: entry[1]):
+        if original.width > width:
+            height = max(1, round(original.height * width / original.width))
+            resized = original.resize((width, height), Image.Resampling.LANCZOS)
+        else:
+            resized = original
+        for fmt in IMAGE_FORMATS:
+            target = derivative_name(name, size, fmt)
+            if default_storage.exists(target):
+                default_storage.delete(target)
+            default_storage.save(target, ContentFile(_encode(resized, fmt)))
+            written += 1
+
+    _ready[name] = resized.width
+    _missing.pop(name, None)
+    return written
+
+
+def generate_derivatives_safely(name, force=False):
+    """
+    Like generate_derivatives() but logs and swallows unreadable images, so
+    a broken upload never fails the save or a whole backfill run.
+    Returns ``(name, files_written, error)``.
+    """
+    try:
+        return name, generate_derivatives(name, force=force), None
+    except (OSError, ValueError, Image.DecompressionBombError) as exc:
+        logger.warning('Could not generate derivatives for %s: %s', name, exc)
+        return name, 0, str(exc)
@@ -0,0 +1,133 @@
+import asyncio
+import time
+import uuid
+from decimal import Decimal
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, override_settings
+
+from products.benchmarks import isolated_caches, percentile, rolled_back, test_environment
+from products.models import Brand, Category, Order, OrderItem, Product
+
+
+User = get_user_model()
+
+URLCONFS = {
+    'sync': 'pookiecare.urls',
+    'async': 'pookiecare.asgi_urls',
+}
+
+
+class Command(BaseCommand):
+    """
+    Drive the catalog views through AsyncClient, i.e. the ASGI handler, with
+    many requests in flight, once with the sync views and once with
+    products.async_views. Prints throughput and latency per view. Seeded
+    rows are rolled back and each mode runs on private, empty caches.
+    """
+
+    help = 'Compare sync and async catalog views under concurrent ASGI requests.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=5000)
+        parser.add_argument('--requests', type=int, default=400, help='Requests per view and mode.')
+        parser.add_argument('--concurrency', type=int, default=50, help='Requests in flight.')
+        parser.add_argument(
+            '--page-cache', action='store_true',
+            help='Keep the anonymous page cache on (off by default so every request renders).',
+        )
+
+    def handle(self, *args, **options):
+        with test_environment(), rolled_back():
+            product_ids, user = self._seed(options['products'])
+            self.stdout.write(
+                f"{'view':<28}{'mode':>6}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}"
+            )
+            for mode, urlconf in URLCONFS.items():
+                # Each mode starts from its own empty caches
+                with isolated_caches(), override_settings(
+                    ROOT_URLCONF=urlconf, PAGE_CACHE=options['page_cache']
+                ):
+                    results = async_to_sync(self._run)(product_ids, user, options)
+                for name, (rate, p50, p95) in results.items():
+                    self.stdout.write(f'{name:<28}{mode:>6}{rate:>10.1f}{p50:>10.2f}{p95:>10.2f}')
+
+    def _seed(self, total):
+        tag = uuid.uuid4().hex[:8]
+        brands = Brand.objects.bulk_create(
+            Brand(brand_name=f'Bench Brand {tag}-{i}') for i in range(20)
+        )
+        categories = Category.objects.bulk_create(
+            Category(category_name=f'Bench Category {tag}-{i}') for i in range(10)
+        )
+        products = Product.objects.bulk_create(
+            (
+                Product(
+                    product_name=f'Bench Product {i}',
+                    brand=brands[i % len(brands)],
+                    category=categories[i % len(categories)],
+                    product_details='<p>Benchmark product.</p>',
+                    price=Decimal('750.00'),
+                    available_stock=1 + i % 40,
+                    featured=i % 25 == 0,
+                )
+                for i in range(total)
+            ),
+            batch_size=2000,
+        )
+        user = User(
+            email=f'bench-async-{tag}@example.com',
+            phone_number='01' + str(uuid.uuid4().int)[:9],
+            first_name='Bench',
+            last_name='User',
+            house_number='1',
+            road_number='1',
+            postal_code='1000',
+            district='Dhaka',
+        )
+        user.set_unusable_password()
+        user.save()
+        cart = Order.objects.create(user=user, in_cart=True)
+        OrderItem.objects.bulk_create(
+            OrderItem(order=cart, product=product, quantity=1, price_at_purchase=product.price)
+            for product in products[:5]
+        )
+        return [product.product_id for product in products], user
+
+    async def _run(self, product_ids, user, options):
+        anonymous = AsyncClient()
+        shopper = AsyncClient()
+        await shopper.aforce_login(user)
+        scenarios = {
+            'home_view (anonymous)': lambda i: anonymous.get('/'),
+            'home_view (authenticated)': lambda i: shopper.get('/'),
+            'product_detail_view': lambda i: anonymous.get(
+                f'/product/{product_ids[i % len(product_ids)]}/'
+            ),
+            'cart_view': lambda i: shopper.get('/cart/'),
+        }
+        results = {}
+        for name, request in scenarios.items():
+            await request(0)  # warm-up
+            results[name] = await self._measure(name, request, options['requests'], options['concurrency'])
+        return results
+
+    async def _measure(self, name, request, total, concurrency):
+        samples = []
+        pending = iter(range(total))
+
+        async def worker():
+            for i in pending:
+                started = time.perf_counter()
+                response = await request(i)
+                samples.append((time.perf_counter() - started) * 1000)
+                if response.status_code != 200:
+                    raise CommandError(f'{name}: HTTP {response.status_code}')
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        samples.sort()
+        return total / elapsed, percentile(samples, 50), percentile(samples, 95)
@@ -0,0 +1,222 @@
+import json
+import queue
+import random
+import threading
+import time
+import uuid
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections, transaction
+from django.test.utils import override_settings
+
+from products.benchmarks import isolated_caches, percentile
+from products.models import Brand, Category, Order, OrderItem, Product
+from products.reservations import reserve
+from products.sqlite import SQLITE_PROFILES, sqlite_profile
+
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """
+    Run concurrent checkouts from several threads, each with its own
+    database connection, under every SQLite pragma profile in turn and
+    print throughput, latency and "database is locked" errors as JSON.
+    Each checkout holds stock for its lines the way add_to_cart_view does
+    and then completes the order.
+
+    Reader threads page through the catalog meanwhile to show how long
+    reads wait behind writers. Needs a file database: threads cannot share
+    the in-memory test database. The seeded rows are deleted afterwards.
+    """
+
+    help = 'Stress concurrent checkouts under each SQLite pragma profile.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--carts', type=int, default=400, help='Checkouts per profile.')
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent checkout threads.')
+        parser.add_argument('--readers', type=int, default=2, help='Concurrent catalog readers.')
+        parser.add_argument('--products', type=int, default=20, help='Fewer products, more contention.')
+        parser.add_argument('--items-per-cart', type=int, default=3)
+        parser.add_argument(
+            '--profiles', default=','.join(SQLITE_PROFILES),
+            help='Comma-separated profiles to compare.',
+        )
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite' or connection.is_in_memory_db():
+            raise CommandError('bench_checkout needs a file-based SQLite database.')
+        profiles = [name.strip() for name in options['profiles'].split(',') if name.strip()]
+        unknown = sorted(set(profiles) - set(SQLITE_PROFILES))
+        if unknown:
+            raise CommandError(f'Unknown profile(s): {", ".join(unknown)}')
+
+        self.random = random.Random(options['seed'])
+        tag = uuid.uuid4().hex[:8]
+        report = {
+            'config': {
+                key: options[key] for key in (
+                    'carts', 'threads', 'readers', 'products', 'items_per_cart', 'seed',
+                )
+            },
+            'profiles': {},
+        }
+        try:
+            for name in profiles:
+                # Every thread opens a fresh connection, tuned with this profile;
+                # journal_mode can only change while no other connection is open
+                connections.close_all()
+                # Checkouts invalidate cart summaries; keep that off the site's cache
+                with override_settings(SQLITE_PROFILE=name), isolated_caches():
+                    carts = self._seed(tag, name, options)
+                    report['profiles'][name] = self._run(carts, options)
+                    connections.close_all()
+        finally:
+            self._cleanup(tag)
+            connections.close_all()
+        report['active_profile'] = sqlite_profile()
+        self.stdout.write(json.dumps(report, indent=2))
+
+    # Seeding -----------------------------------------------------------
+
+    def _seed(self, tag, profile, options):
+        rnd = self.random
+        brand, _ = Brand.objects.get_or_create(brand_name=f'Bench Brand {tag}')
+        category, _ = Category.objects.get_or_create(category_name=f'Bench Category {tag}')
+        # Plenty of stock: the benchmark measures locking, not sell-outs
+        products = Product.objects.bulk_create(
+            Product(
+                product_name=f'Bench Product {tag}-{i}',
+                brand=brand,
+                category=category,
+                product_details='<p>Synthetic product used by bench_checkout.</p>',
+                price=Decimal(rnd.randrange(200, 5000)),
+                available_stock=options['carts'] * options['items_per_cart'],
+            )
+            for i in range(options['products'])
+        )
+        password = make_password('bench-password')
+        phone_offset = rnd.randrange(10 ** 9 - options['carts'])
+        users = User.objects.bulk_create(
+            (
+                User(
+                    email=f'bench-checkout-{tag}-{profile}-{i}@example.com',
+                    phone_number=f'01{phone_offset + i:09d}',
+                    first_name='Bench',
+                    last_name=f'User {i}',
+                    house_number='1',
+                    road_number='1',
+                    postal_code='1000',
+                    district='Dhaka',
+                    password=password,
+                )
+                for i in range(options['carts'])
+            ),
+            batch_size=1000,
+        )
+        carts = Order.objects.bulk_create(Order(user=user, in_cart=True) for user in users)
+        per_cart = max(1, min(options['items_per_cart'], len(products)))
+        items = OrderItem.objects.bulk_create(
+            (
+                OrderItem(
+                    order=cart,
+                    product=product,
+                    quantity=rnd.randrange(1, 3),
+                    price_at_purchase=product.price,
+                )
+                for cart in carts
+                for product in rnd.sample(products, per_cart)
+            ),
+            batch_size=2000,
+        )
+        lines = {}
+        for item in items:
+            lines.setdefault(item.order_id, []).append((item.product_id, item.quantity))
+        return [(cart, lines[cart.pk]) for cart in carts]
+
+    def _cleanup(self, tag):
+        connections.close_all()
+        Order.objects.filter(user__email__startswith=f'bench-checkout-{tag}-').delete()
+        User.objects.filter(email__startswith=f'bench-checkout-{tag}-').delete()
+        Product.objects.filter(brand__brand_name=f'Bench Brand {tag}').delete()
+        Brand.objects.filter(brand_name=f'Bench Brand {tag}').delete()
+        Category.objects.filter(category_name=f'Bench Category {tag}').delete()
+
+    # Running -----------------------------------------------------------
+
+    def _run(self, carts, options):
+        pending = queue.Queue()
+        for cart in carts:
+            pending.put(cart)
+        lock = threading.Lock()
+        stats = {'completed': 0, 'failed': 0, 'locked': 0, 'errors': 0}
+        timings, read_timings = [], []
+        done = threading.Event()
+
+        def checkout_worker():
+            try:
+                while True:
+                    try:
+                        cart, lines = pending.get_nowait()
+                    except queue.Empty:
+                        return
+                    started = time.perf_counter()
+                    try:
+                        with transaction.atomic():
+                            held = all(reserve(cart.pk, product_id, qty) for product_id, qty in lines)
+                            if not held:
+                                # Give back the holds already taken for this cart
+                                transaction.set_rollback(True)
+                        outcome = 'completed' if held and cart.complete_order() else 'failed'
+                    except OperationalError as exc:
+                        outcome = 'locked' if 'locked' in str(exc) else 'errors'
+                    elapsed = (time.perf_counter() - started) * 1000
+                    with lock:
+                        stats[outcome] += 1
+                        timings.append(elapsed)
+            finally:
+                connection.close()
+
+        def reader():
+            try:
+                while not done.is_set():
+                    started = time.perf_counter()
+                    list(
+                        Product.objects.filter(available_stock__gt=0)
+                        .select_related('brand', 'category')
+                        .order_by('-created_at', '-product_id')[:24]
+                    )
+                    with lock:
+                        read_timings.append((time.perf_counter() - started) * 1000)
+            finally:
+                connection.close()
+
+        writers = [threading.Thread(target=checkout_worker) for _ in range(options['threads'])]
+        readers = [threading.Thread(target=reader) for _ in range(options['readers'])]
+        started = time.perf_counter()
+        for thread in readers + writers:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        seconds = time.perf_counter() - started
+        done.set()
+        for thread in readers:
+            thread.join()
+
+        timings.sort()
+        read_timings.sort()
+        return dict(
+            stats,
+            seconds=round(seconds, 3),
+            checkouts_per_second=round(stats['completed'] / seconds, 1) if seconds else 0.0,
+            p50_ms=round(percentile(timings, 50), 3),
+            p99_ms=round(percentile(timings, 99), 3),
+            reads=len(read_timings),
+            read_p50_ms=round(percentile(read_timings, 50), 3),
+            read_p99_ms=round(percentile(read_timings, 99), 3),
+        )
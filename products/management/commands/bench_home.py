@@ -0,0 +1,90 @@
+import time
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+
+from products.benchmarks import isolated_caches, percentile, rolled_back, test_environment
+from products.models import Brand, Category, Product
+
+
+class Command(BaseCommand):
+    """
+    Time anonymous home page renders on synthetic catalogs, with and without
+    the product-card fragment cache. The anonymous page cache is switched
+    off, otherwise both modes would time the same cached page. Generated
+    rows are rolled back and the site's cache is left alone.
+
+    The home page renders one page of cards (24 plus up to 6 featured)
+    whatever the catalog size, so ``--sizes`` changes the queries behind the
+    page (filters, facets, pagination), not the number of cards rendered.
+    The cards column shows how many were on the page.
+    """
+
+    help = 'Benchmark home page rendering with and without cached product cards.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[1000, 10000],
+            help='Catalog sizes to benchmark.',
+        )
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        with test_environment():
+            self.stdout.write(
+                f"{'products':>10}{'cards':>8}{'card cache':>12}{'p50 ms':>10}{'p95 ms':>10}"
+            )
+            for size in options['sizes']:
+                with rolled_back():
+                    self._seed(size)
+                    for enabled in (False, True):
+                        cards, p50, p95 = self._measure(enabled, options['repeat'])
+                        self.stdout.write(
+                            f"{size:>10}{cards:>8}{'on' if enabled else 'off':>12}"
+                            f"{p50:>10.2f}{p95:>10.2f}"
+                        )
+
+    def _seed(self, total):
+        brands = Brand.objects.bulk_create(
+            Brand(brand_name=f'Bench Brand {uuid.uuid4().hex[:8]}') for _ in range(20)
+        )
+        categories = Category.objects.bulk_create(
+            Category(category_name=f'Bench Category {uuid.uuid4().hex[:8]}') for _ in range(10)
+        )
+        Product.objects.bulk_create(
+            (
+                Product(
+                    product_name=f'Bench Product {i}',
+                    brand=brands[i % len(brands)],
+                    category=categories[i % len(categories)],
+                    product_details='<p>Benchmark product.</p>',
+                    price=Decimal('750.00'),
+                    available_stock=1 + i % 40,
+                    featured=i % 25 == 0,
+                )
+                for i in range(total)
+            ),
+            batch_size=2000,
+        )
+
+    def _measure(self, enabled, repeat):
+        client = Client()
+        samples = []
+        # Fresh private caches per mode, so the card cache starts cold
+        with isolated_caches(), override_settings(PRODUCT_CARD_CACHE=enabled, PAGE_CACHE=False):
+            # Warm templates, and the card cache when enabled
+            response = client.get('/')
+            cards = len(response.context['products']) + len(response.context['featured_products'])
+            for _ in range(repeat):
+                started = time.perf_counter()
+                response = client.get('/')
+                samples.append((time.perf_counter() - started) * 1000)
+                if response.status_code != 200:
+                    raise CommandError(f'home_view: HTTP {response.status_code}')
+        samples.sort()
+        return cards, percentile(samples, 50), percentile(samples, 95)
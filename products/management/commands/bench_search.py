@@ -0,0 +1,88 @@
+import statistics
+import time
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from products import search
+from products.benchmarks import rolled_back
+from products.models import Brand, Category, Product
+
+
+WORDS = (
+    'hydrating gentle foaming cleanser niacinamide serum retinol night cream '
+    'vitamin ceramide barrier repair sunscreen mineral spf50 toner exfoliating '
+    'salicylic acid hyaluronic moisturizer oil free fragrance sensitive acne '
+    'brightening peptide eye gel balm clay mask soothing aloe green tea'
+).split()
+
+QUERIES = ('niacinamide', 'hyaluronic serum', 'spf50 sunscreen', 'ceram', 'repair barrier cream')
+
+
+class Command(BaseCommand):
+    """
+    Compare FTS5 search with the admin-style icontains scan on a synthetic
+    catalog. All generated rows are rolled back when the run finishes.
+    """
+
+    help = 'Benchmark FTS5 product search against icontains.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        if not search.search_enabled():
+            self.stderr.write('Full-text search requires SQLite FTS5.')
+            return
+        with rolled_back():
+            self._seed(options['products'])
+            self._run(options['repeat'])
+
+    def _seed(self, total):
+        brands = Brand.objects.bulk_create(
+            Brand(brand_name=f'Bench Brand {uuid.uuid4().hex[:8]}') for _ in range(50)
+        )
+        categories = Category.objects.bulk_create(
+            Category(category_name=f'Bench Category {uuid.uuid4().hex[:8]}') for _ in range(20)
+        )
+        batch = []
+        for i in range(total):
+            words = [WORDS[(i * 7 + k * 13) % len(WORDS)] for k in range(12)]
+            batch.append(Product(
+                product_name=' '.join(words[:4]).title(),
+                brand=brands[i % len(brands)],
+                category=categories[i % len(categories)],
+                product_details=f"<p>{' '.join(words)}</p>",
+                price=Decimal('500.00'),
+                available_stock=1 + i % 50,
+            ))
+            if len(batch) == 5000:
+                Product.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            Product.objects.bulk_create(batch)
+
+        started = time.perf_counter()
+        indexed = search.rebuild_index()
+        self.stdout.write(
+            f'Indexed {indexed} products in {time.perf_counter() - started:.2f}s'
+        )
+
+    def _time(self, func, query, repeat):
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func(query, limit=20)
+            samples.append((time.perf_counter() - started) * 1000)
+        return statistics.median(samples)
+
+    def _run(self, repeat):
+        self.stdout.write(f"{'query':<24}{'fts5 ms':>12}{'icontains ms':>16}{'speedup':>10}")
+        for query in QUERIES:
+            fts = self._time(search.search_products, query, repeat)
+            scan = self._time(search.icontains_search, query, repeat)
+            self.stdout.write(
+                f'{query:<24}{fts:>12.2f}{scan:>16.2f}{scan / fts if fts else 0:>9.1f}x'
+            )
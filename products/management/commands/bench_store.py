@@ -0,0 +1,253 @@
+import json
+import random
+import time
+import uuid
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from products import search
+from products.benchmarks import isolated_caches, percentile, test_environment
+from products.models import Brand, Category, Order, OrderItem, Product
+
+
+User = get_user_model()
+
+CHECKOUT_FORM = {
+    'first_name': 'Bench',
+    'last_name': 'User',
+    'house_number': '1',
+    'road_number': '1',
+    'postal_code': '1000',
+    'district': 'Dhaka',
+}
+
+
+class Command(BaseCommand):
+    """
+    Seed a synthetic shop with bulk_create, drive the storefront views through
+    the Django test client and print latency, query and size stats as JSON.
+
+    The seed is committed in one transaction and every request then commits
+    its own writes, as it would in production, so commit and fsync cost is
+    part of the timings and the write lock is only held per request. The
+    seeded brands, categories and users, with everything hanging off them,
+    are deleted at the end unless --keep is given. The views run against
+    private in-memory caches and never clear the site's cache.
+    """
+
+    help = 'Seed a synthetic store and benchmark the storefront views.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--brands', type=int, default=20)
+        parser.add_argument('--categories', type=int, default=10)
+        parser.add_argument('--products', type=int, default=5000)
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--carts', type=int, default=100, help='Users with an open cart.')
+        parser.add_argument('--orders', type=int, default=1000, help='Completed orders.')
+        parser.add_argument('--items-per-order', type=int, default=3)
+        parser.add_argument('--requests', type=int, default=200, help='Requests per view.')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded data.')
+        parser.add_argument('--output', help='Write the JSON report to this file.')
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        with test_environment(), isolated_caches():
+            with transaction.atomic():
+                seeded = self._seed(options)
+            try:
+                report = {
+                    'config': {
+                        key: options[key] for key in (
+                            'brands', 'categories', 'products', 'users', 'carts',
+                            'orders', 'items_per_order', 'requests', 'seed',
+                        )
+                    },
+                    'seed_seconds': seeded.pop('seconds'),
+                    'views': self._run(seeded, options['requests']),
+                }
+            finally:
+                if not options['keep']:
+                    self._clean_up(seeded)
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                handle.write(output + '\n')
+        self.stdout.write(output)
+
+    # Seeding -----------------------------------------------------------
+
+    def _seed(self, options):
+        started = time.perf_counter()
+        rnd = self.random
+        tag = uuid.uuid4().hex[:8]
+        now = timezone.now()
+
+        brands = Brand.objects.bulk_create(
+            Brand(brand_name=f'Bench Brand {tag}-{i}') for i in range(options['brands'])
+        )
+        categories = Category.objects.bulk_create(
+            Category(category_name=f'Bench Category {tag}-{i}') for i in range(options['categories'])
+        )
+        products = Product.objects.bulk_create(
+            (
+                Product(
+                    product_name=f'Bench Product {i}',
+                    brand=rnd.choice(brands),
+                    category=rnd.choice(categories),
+                    product_details='<p>Synthetic product used by bench_store.</p>',
+                    price=Decimal(rnd.randrange(200, 5000)),
+                    available_stock=rnd.randrange(0, 500),
+                    featured=rnd.random() < 0.05,
+                )
+                for i in range(options['products'])
+            ),
+            batch_size=2000,
+        )
+        in_stock = [product for product in products if product.available_stock > 0]
+
+        password = make_password('bench-password')
+        phone_offset = rnd.randrange(10 ** 9 - options['users'])
+        users = User.objects.bulk_create(
+            (
+                User(
+                    email=f'bench-{tag}-{i}@example.com',
+                    phone_number=f'01{phone_offset + i:09d}',
+                    first_name='Bench',
+                    last_name=f'User {i}',
+                    house_number='1',
+                    road_number='1',
+                    postal_code='1000',
+                    district='Dhaka',
+                    password=password,
+                )
+                for i in range(options['users'])
+            ),
+            batch_size=1000,
+        )
+
+        per_order = max(1, min(options['items_per_order'], len(in_stock)))
+        carts = Order.objects.bulk_create(
+            Order(user=user, in_cart=True) for user in users[:options['carts']]
+        )
+        completed = Order.objects.bulk_create(
+            (
+                Order(user=rnd.choice(users), in_cart=False, completed_at=now)
+                for _ in range(options['orders'])
+            ),
+            batch_size=2000,
+        )
+        OrderItem.objects.bulk_create(
+            (
+                OrderItem(
+                    order=order,
+                    product=product,
+                    quantity=rnd.randrange(1, 4),
+                    price_at_purchase=product.price,
+                )
+                for order in carts + completed
+                for product in rnd.sample(in_stock, per_order)
+            ),
+            batch_size=2000,
+        )
+        search.rebuild_index()
+
+        return {
+            'seconds': round(time.perf_counter() - started, 3),
+            'products': in_stock,
+            'cart_users': users[:options['carts']],
+            'brands': brands,
+            'categories': categories,
+            'users': users,
+        }
+
+    def _clean_up(self, seeded):
+        # Products, orders, holds and rollups cascade from these
+        with transaction.atomic():
+            User.objects.filter(pk__in=[user.pk for user in seeded['users']]).delete()
+            Brand.objects.filter(pk__in=[brand.pk for brand in seeded['brands']]).delete()
+            Category.objects.filter(pk__in=[category.pk for category in seeded['categories']]).delete()
+
+    # Driving the views ---------------------------------------------------
+
+    def _run(self, seeded, requests):
+        products = seeded['products']
+        cart_users = seeded['cart_users']
+        if not products or not cart_users:
+            self.stderr.write('Need at least one in-stock product and one cart to benchmark.')
+            return {}
+
+        anonymous = Client()
+        shopper = Client()
+        buyer = cart_users[0]
+        shopper.force_login(buyer)
+        rnd = self.random
+        checkout_form = dict(CHECKOUT_FORM, phone_number=buyer.phone_number)
+
+        def refill_cart():
+            order, _ = Order.objects.get_or_create(user=buyer, in_cart=True)
+            product = rnd.choice(products)
+            Product.objects.filter(pk=product.pk).update(available_stock=500)
+            OrderItem.objects.get_or_create(
+                order=order, product=product,
+                defaults={'quantity': 1, 'price_at_purchase': product.price},
+            )
+
+        scenarios = {
+            'home_view (anonymous)': lambda: anonymous.get('/'),
+            'home_view (authenticated)': lambda: shopper.get('/'),
+            'product_detail_view': lambda: anonymous.get(
+                f'/product/{rnd.choice(products).product_id}/'
+            ),
+            'cart_view': lambda: shopper.get('/cart/'),
+            'add_to_cart_view': lambda: shopper.post(
+                f'/cart/add/{rnd.choice(products).product_id}/', {'quantity': 1}
+            ),
+            'checkout_view (GET)': lambda: shopper.get('/checkout/'),
+            'checkout_view (POST)': lambda: shopper.post('/checkout/', checkout_form),
+        }
+        setup = {
+            'checkout_view (GET)': refill_cart,
+            'checkout_view (POST)': refill_cart,
+        }
+
+        results = {}
+        for name, request in scenarios.items():
+            prepare = setup.get(name)
+            if prepare:
+                prepare()
+            request()  # warm-up
+            timings, queries, sizes, statuses = [], [], [], {}
+            page_cache_hits = 0
+            for _ in range(requests):
+                if prepare:
+                    prepare()
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    response = request()
+                    timings.append((time.perf_counter() - started) * 1000)
+                queries.append(len(captured))
+                sizes.append(len(response.content))
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                page_cache_hits += response.get('X-Page-Cache') == 'hit'
+            timings.sort()
+            results[name] = {
+                'requests': requests,
+                'p50_ms': round(percentile(timings, 50), 3),
+                'p95_ms': round(percentile(timings, 95), 3),
+                'p99_ms': round(percentile(timings, 99), 3),
+                'queries_mean': round(sum(queries) / len(queries), 2),
+                'queries_max': max(queries),
+                'bytes_mean': round(sum(sizes) / len(sizes)),
+                'page_cache_hits': page_cache_hits,
+                'status_codes': {str(code): count for code, count in sorted(statuses.items())},
+            }
+        return results
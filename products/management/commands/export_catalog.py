@@ -0,0 +1,42 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products.catalog import FORMATS, RowWriter, export_catalog, guess_format
+
+
+class Command(BaseCommand):
+    """
+    Stream every product to a CSV or JSONL file in the format read by
+    import_catalog, using a server-side iterator so memory stays flat.
+    """
+
+    help = 'Export the product catalog as CSV or JSONL ("-" writes stdout).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to write, or "-" for stdout.')
+        parser.add_argument(
+            '--format',
+            choices=FORMATS,
+            help='Output format (default: guessed from the file extension).',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Rows fetched from the database per round trip.',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or guess_format(path)
+        if fmt is None:
+            raise CommandError('Cannot guess the format; pass --format csv or --format jsonl.')
+
+        chunk_size = max(1, options['chunk_size'])
+        if path == '-':
+            export_catalog(RowWriter(sys.stdout, fmt), chunk_size=chunk_size)
+            return
+        with open(path, 'w', newline='', encoding='utf-8') as stream:
+            count = export_catalog(RowWriter(stream, fmt), chunk_size=chunk_size)
+        self.stdout.write(self.style.SUCCESS(f'Exported {count} product(s) to {path}.'))
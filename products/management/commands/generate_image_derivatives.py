@@ -0,0 +1,73 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.core.management.base import BaseCommand
+
+from products import images
+from products.models import Product
+
+
+class Command(BaseCommand):
+    """
+    Backfill resized WebP/JPEG derivatives for every uploaded product image,
+    spreading the Pillow work across a pool of processes.
+    """
+
+    help = 'Generate responsive image derivatives for existing product images.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Number of worker processes (default: number of CPUs).',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Regenerate derivatives that already exist.',
+        )
+
+    def handle(self, *args, **options):
+        names = list(
+            Product.objects.exclude(product_image='')
+            .exclude(product_image__isnull=True)
+            .order_by()
+            .values_list('product_image', flat=True)
+            .distinct()
+        )
+        if not options['force']:
+            names = [name for name in names if not images.has_derivatives(name)]
+        if not names:
+            self.stdout.write('All product images already have derivatives.')
+            return
+
+        workers = max(1, options['workers'])
+        self.stdout.write(f'Generating derivatives for {len(names)} image(s) with {workers} worker(s)...')
+
+        if workers == 1:
+            results = (images.generate_derivatives_safely(name, options['force']) for name in names)
+            self._report(results, len(names))
+            return
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+            futures = [
+                pool.submit(images.generate_derivatives_safely, name, options['force'])
+                for name in names
+            ]
+            self._report((future.result() for future in as_completed(futures)), len(names))
+
+    def _report(self, results, total):
+        written = 0
+        failed = 0
+        for done, (name, count, error) in enumerate(results, start=1):
+            written += count
+            if error:
+                failed += 1
+                self.stderr.write(f'  {name}: {error}')
+            if done % 100 == 0 or done == total:
+                self.stdout.write(f'  {done}/{total} image(s) processed')
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} derivative file(s).'))
+        if failed:
+            self.stdout.write(self.style.WARNING(f'{failed} image(s) could not be processed.'))
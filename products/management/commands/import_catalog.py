@@ -0,0 +1,72 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products.catalog import FORMATS, CatalogImporter, guess_format, read_rows
+
+
+class Command(BaseCommand):
+    """
+    Stream a CSV or JSONL product feed into the catalog in chunks, creating
+    missing brands and categories in bulk. New products are written with
+    bulk_create, and existing ones with one executemany() UPDATE by primary
+    key (see ``products.catalog._update_products``). Each chunk commits in
+    its own transaction.
+    """
+
+    help = 'Import products from a CSV or JSONL file ("-" reads stdin).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import, or "-" for stdin.')
+        parser.add_argument(
+            '--format',
+            choices=FORMATS,
+            help='Input format (default: guessed from the file extension).',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows written per transaction.',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or guess_format(path)
+        if fmt is None:
+            raise CommandError('Cannot guess the format; pass --format csv or --format jsonl.')
+
+        started = time.perf_counter()
+
+        def progress(importer):
+            elapsed = time.perf_counter() - started
+            rate = importer.processed / elapsed if elapsed else 0
+            self.stdout.write(
+                f'  {importer.processed} row(s) read, {importer.created} created, '
+                f'{importer.updated} updated ({rate:.0f} rows/s)'
+            )
+
+        importer = CatalogImporter(batch_size=max(1, options['batch_size']), progress=progress)
+        if path == '-':
+            importer.run(read_rows(sys.stdin, fmt))
+        else:
+            try:
+                with open(path, newline='', encoding='utf-8') as stream:
+                    importer.run(read_rows(stream, fmt))
+            except FileNotFoundError:
+                raise CommandError(f'File not found: {path}')
+
+        for line_number, error in importer.errors[:20]:
+            self.stderr.write(f'  line {line_number}: {error}')
+        if len(importer.errors) > 20:
+            self.stderr.write(f'  ... and {len(importer.errors) - 20} more')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {importer.created + importer.updated} product(s): '
+            f'{importer.created} created, {importer.updated} updated, '
+            f'{importer.brands.created} brand(s) and {importer.categories.created} '
+            f'category(ies) added in {time.perf_counter() - started:.1f}s.'
+        ))
+        if importer.errors:
+            self.stdout.write(self.style.WARNING(f'Skipped {len(importer.errors)} invalid row(s).'))
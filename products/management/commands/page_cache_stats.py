@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from products.counters import process_local_warning
+
+from products.page_cache import page_cache_stats, reset_page_cache_stats
+
+
+class Command(BaseCommand):
+    """
+    Print the anonymous page cache hit/miss counters. The counters live in
+    the ``STATS_CACHE`` alias (see ``products.counters``); with a per-process
+    backend such as LocMemCache this command cannot see the web server's
+    counts, and says so.
+    """
+
+    help = 'Show (and optionally reset) the anonymous page cache hit rate.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Zero the counters afterwards.')
+
+    def handle(self, *args, **options):
+        warning = process_local_warning()
+        if warning:
+            self.stderr.write(self.style.WARNING(warning))
+        stats = page_cache_stats()
+        self.stdout.write(
+            f"hits={stats['hits']} misses={stats['misses']} hit_rate={stats['hit_rate']:.2%}"
+        )
+        if options['reset']:
+            reset_page_cache_stats()
@@ -0,0 +1,46 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+
+from products.models import Order
+from products.sales import rebuild_rollups
+
+
+class Command(BaseCommand):
+    """
+    Recompute SalesDailyRollup rows for a date range from completed orders.
+    Days are local (TIME_ZONE) calendar days; each month is replaced in its
+    own transaction, so reports never show a half-rebuilt month.
+    """
+
+    help = 'Rebuild daily sales rollups for a date range from raw orders.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First day (YYYY-MM-DD). Defaults to the first completed order.')
+        parser.add_argument('--end', help='Last day (YYYY-MM-DD). Defaults to today.')
+
+    def _parse(self, value, option):
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            raise CommandError(f'--{option} must be a date in YYYY-MM-DD format.')
+
+    def handle(self, *args, **options):
+        start = self._parse(options['start'], 'start') if options['start'] else None
+        end = self._parse(options['end'], 'end') if options['end'] else timezone.localdate()
+        if start is None:
+            first = Order.objects.filter(in_cart=False).aggregate(first=Min('completed_at'))['first']
+            if first is None:
+                self.stdout.write('No completed orders.')
+                return
+            start = timezone.localdate(first)
+        if start > end:
+            raise CommandError('--start must not be after --end.')
+
+        def progress(chunk_start, chunk_end, rows):
+            self.stdout.write(f'  {chunk_start} .. {chunk_end}: {rows} row(s)')
+
+        written = rebuild_rollups(start, end, progress=progress)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {start} .. {end}: {written} rollup row(s).'))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from products import search
+
+
+class Command(BaseCommand):
+    """Rebuild the FTS5 product search index from the product table."""
+
+    help = 'Rebuild the full-text product search index.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Number of products read and inserted per batch.',
+        )
+
+    def handle(self, *args, **options):
+        if not search.search_enabled():
+            self.stdout.write(self.style.WARNING(
+                'Full-text search requires SQLite FTS5; nothing to rebuild.'
+            ))
+            return
+        with transaction.atomic():
+            count = search.rebuild_index(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} product(s).'))
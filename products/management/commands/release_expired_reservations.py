@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from products.reservations import release_expired
+
+
+class Command(BaseCommand):
+    """
+    Release stock held by carts whose reservations have expired. Meant to
+    run every minute or so from cron.
+    """
+
+    help = 'Release expired cart stock reservations in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Reservations released per transaction.',
+        )
+
+    def handle(self, *args, **options):
+        released = release_expired(batch_size=max(1, options['batch_size']))
+        self.stdout.write(self.style.SUCCESS(f'Released {released} expired reservation(s).'))
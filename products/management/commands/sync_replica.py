@@ -0,0 +1,34 @@
+import sqlite3
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from products.routers import replica_alias
+
+
+class Command(BaseCommand):
+    """
+    Copy the primary SQLite database into the replica file with SQLite's
+    online backup API. Stands in for real replication when trying the
+    catalog replica locally: run it from a loop or cron to simulate lag.
+    """
+
+    help = 'Refresh the SQLite catalog replica from the primary database.'
+
+    def handle(self, *args, **options):
+        alias = replica_alias()
+        if alias is None:
+            raise CommandError('No replica configured; set POOKIECARE_REPLICA_DB.')
+        primary, replica = connections[DEFAULT_DB_ALIAS], connections[alias]
+        if primary.vendor != 'sqlite' or replica.vendor != 'sqlite':
+            raise CommandError('sync_replica only copies SQLite databases.')
+
+        replica.close()
+        primary.ensure_connection()
+        target = sqlite3.connect(replica.settings_dict['NAME'])
+        try:
+            # Consistent snapshot of the primary, written in one transaction
+            primary.connection.backup(target)
+        finally:
+            target.close()
+        self.stdout.write(self.style.SUCCESS(f'Copied {primary.settings_dict["NAME"]} to {alias}.'))
@@ -0,0 +1,47 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from products.recommendations import update_copurchases
+
+
+class Command(BaseCommand):
+    """
+    Fold newly completed orders into the "frequently bought together"
+    table. Safe to run from cron; each run continues where the last stopped.
+    """
+
+    help = 'Incrementally update co-purchase counts from completed orders.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Orders counted per transaction.',
+        )
+        parser.add_argument(
+            '--lag',
+            type=int,
+            default=60,
+            help='Skip orders completed in the last N seconds (picked up next run).',
+        )
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Drop all counts and recount every completed order.',
+        )
+
+    def handle(self, *args, **options):
+        def progress(run):
+            self.stdout.write(f'  {run.orders_processed} order(s), {run.pairs_updated} pair update(s)')
+
+        run = update_copurchases(
+            batch_size=max(1, options['batch_size']),
+            lag=timedelta(seconds=max(0, options['lag'])),
+            rebuild=options['rebuild'],
+            progress=progress,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Counted {run.orders_processed} order(s) into {run.pairs_updated} pair update(s).'
+        ))
@@ -0,0 +1,101 @@
+"""
+Prometheus metrics for the storefront.
+
+Request latency histograms and status-code counters per URL name (filled
+by ``products.middleware.MetricsMiddleware``), checkout outcomes from
+``Order.complete_order`` and hit/miss counts of the page, facet and cart
+summary caches, served in the Prometheus text format at ``/metrics``.
+
+With several worker processes, point the ``PROMETHEUS_MULTIPROC_DIR``
+environment variable at an empty directory shared by the workers before
+they start. prometheus_client then keeps each process's samples in mmap'd
+files there and every scrape sums all of them, whichever worker answers.
+Empty the directory when the server restarts and call
+``mark_process_dead(pid)`` from the server's worker-exit hook.
+"""
+import ipaddress
+import os
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.views.decorators.http import require_safe
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest,
+    multiprocess,
+)
+
+
+# Unresolved paths share one label so scanners cannot blow up cardinality
+UNMATCHED_ROUTE = 'unmatched'
+
+KNOWN_METHODS = frozenset({'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'})
+
+DEFAULT_METRICS_ALLOWED_IPS = ('127.0.0.1', '::1')
+
+REQUEST_LATENCY = Histogram(
+    'pookiecare_request_duration_seconds',
+    'Time spent handling a request, by URL name.',
+    ['route', 'method'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+RESPONSES = Counter(
+    'pookiecare_responses',
+    'Responses by URL name and status code.',
+    ['route', 'method', 'status'],
+)
+CHECKOUTS = Counter(
+    'pookiecare_checkouts',
+    'Order.complete_order outcomes: completed, out_of_stock or not_in_cart.',
+    ['result'],
+)
+CACHE_LOOKUPS = Counter(
+    'pookiecare_cache_lookups',
+    'Lookups in the page, facet and cart summary caches.',
+    ['cache', 'result'],
+)
+
+
+def observe_request(route, method, status, seconds):
+    method = method if method in KNOWN_METHODS else 'OTHER'
+    REQUEST_LATENCY.labels(route, method).observe(seconds)
+    RESPONSES.labels(route, method, str(status)).inc()
+
+
+def count_checkout(result):
+    CHECKOUTS.labels(result).inc()
+
+
+def count_cache_lookup(cache_name, hit):
+    CACHE_LOOKUPS.labels(cache_name, 'hit' if hit else 'miss').inc()
+
+
+def scrape_registry(path=None):
+    """
+    Return the registry to expose: the summed per-process files when
+    running multi-process, the default in-process registry otherwise.
+    """
+    path = path or os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if not path:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry, path=path)
+    return registry
+
+
+def _allowed(request):
+    allowed = getattr(settings, 'METRICS_ALLOWED_IPS', DEFAULT_METRICS_ALLOWED_IPS)
+    if allowed is None:
+        return True
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(address in ipaddress.ip_network(network) for network in allowed)
+
+
+@require_safe
+def metrics_view(request):
+    """Serve all metrics in the Prometheus text format to allowed addresses."""
+    if not _allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(generate_latest(scrape_registry()), content_type=CONTENT_TYPE_LATEST)
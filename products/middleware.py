@@ -0,0 +1,246 @@
+"""
+Per-request SQL instrumentation.
+
+``QueryInstrumentationMiddleware`` records, through an execute wrapper
+installed on every database connection, how many queries each request
+ran, how long they took and how often each statement shape ran.
+A shape is the SQL with IN lists and numeric literals collapsed, so the
+same lookup repeated for every row of a listing (an N+1) counts as one
+shape run many times.
+
+A warning is logged on the ``products.queries`` logger when a view runs
+more than ``QUERY_COUNT_WARNING`` queries or one shape more than
+``QUERY_REPEAT_WARNING`` times. With ``SERVER_TIMING`` on (the default
+under DEBUG) the numbers are also sent as a ``Server-Timing`` header,
+which browser devtools show in the network panel.
+
+``MetricsMiddleware`` records every request's latency and status code per
+URL name for the Prometheus endpoint in ``products.metrics``.
+
+``ReplicaPinMiddleware`` keeps a visitor's catalog reads on the primary
+for a while after they wrote (see ``products.routers``).
+
+All three are sync and async capable, like Django's own middleware, so
+under ASGI a request reaches the async views without thread switches.
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from .metrics import UNMATCHED_ROUTE, observe_request
+from .routers import PIN_COOKIE, end_request, replica_alias, replica_pin_seconds, start_request
+
+
+logger = logging.getLogger('products.queries')
+
+DEFAULT_QUERY_COUNT_WARNING = 30
+DEFAULT_QUERY_REPEAT_WARNING = 5
+
+_IN_LIST = re.compile(r'\((?:%s, )*%s\)')
+_NUMBER = re.compile(r'\b\d+\b')
+
+
+def fingerprint(sql):
+    """Return the shape of a statement: IN lists and numbers collapsed."""
+    return _NUMBER.sub('N', _IN_LIST.sub('(...)', sql))
+
+
+class QueryStats:
+    """Queries seen during one request; installed as an execute wrapper."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.shapes[fingerprint(sql)] += 1
+
+    def repeated(self, threshold):
+        """Return ``[(shape, times)]`` for shapes run more than ``threshold`` times."""
+        return [(shape, times) for shape, times in self.shapes.most_common() if times > threshold]
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+# The QueryStats of the request being handled. A ContextVar rather than a
+# per-request execute_wrapper because async views run their queries on
+# sync_to_async's thread, whose connections are not the event loop's;
+# asgiref copies the context into that thread
+_current_stats = ContextVar('query_stats', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper that reports to the current request's QueryStats, if any."""
+    stats = _current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    return stats(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    """``connection_created`` receiver putting ``record_query`` on every connection."""
+    if record_query not in connection.execute_wrappers:
+        # At the front: execute_wrapper() pops the last entry when it exits
+        connection.execute_wrappers.insert(0, record_query)
+
+
+class SyncAndAsyncMiddleware:
+    """
+    Base for middleware that runs natively under both WSGI and ASGI, as
+    Django's own does, so the ASGI handler does not hop threads around it.
+    Subclasses implement ``__call__`` for sync and ``__acall__`` for async.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+
+class QueryInstrumentationMiddleware(SyncAndAsyncMiddleware):
+    """
+    Record query count, SQL time and repeated statements per request.
+    The stats are left on ``request.query_stats`` for later middleware.
+    """
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not _setting('QUERY_INSTRUMENTATION', True):
+            return self.get_response(request)
+
+        stats, started, token = self._start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_stats.reset(token)
+        return self._finish(request, response, stats, started)
+
+    async def __acall__(self, request):
+        if not _setting('QUERY_INSTRUMENTATION', True):
+            return await self.get_response(request)
+
+        stats, started, token = self._start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_stats.reset(token)
+        return self._finish(request, response, stats, started)
+
+    def _start(self, request):
+        # Connections opened before the app was ready have no recorder yet
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(None, connection)
+        stats = QueryStats()
+        request.query_stats = stats
+        return stats, time.perf_counter(), _current_stats.set(stats)
+
+    def _finish(self, request, response, stats, started):
+        elapsed = time.perf_counter() - started
+        match = request.resolver_match
+        route = match.view_name if match else request.path
+        self._warn(route, stats)
+        if _setting('SERVER_TIMING', settings.DEBUG):
+            response['Server-Timing'] = (
+                f'db;dur={stats.duration * 1000:.2f};desc="{stats.count} queries", '
+                f'dup;desc="{len(stats.repeated(1))} repeated", '
+                f'total;dur={elapsed * 1000:.2f}'
+            )
+        return response
+
+    def _warn(self, route, stats):
+        limit = _setting('QUERY_COUNT_WARNING', DEFAULT_QUERY_COUNT_WARNING)
+        if stats.count > limit:
+            logger.warning(
+                '%s ran %d queries (%.1f ms), over the limit of %d',
+                route, stats.count, stats.duration * 1000, limit,
+            )
+        repeat_limit = _setting('QUERY_REPEAT_WARNING', DEFAULT_QUERY_REPEAT_WARNING)
+        for shape, times in stats.repeated(repeat_limit):
+            logger.warning('%s ran the same query %d times (likely N+1): %s', route, times, shape[:300])
+
+
+class MetricsMiddleware(SyncAndAsyncMiddleware):
+    """
+    Time each request and count its status code, labelled by URL name.
+    Placed first so the latency covers every other middleware.
+    """
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        self._observe(request, response, started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self._observe(request, response, started)
+        return response
+
+    def _observe(self, request, response, started):
+        match = request.resolver_match
+        route = match.view_name if match else UNMATCHED_ROUTE
+        observe_request(route, request.method, response.status_code, time.perf_counter() - started)
+
+
+class ReplicaPinMiddleware(SyncAndAsyncMiddleware):
+    """
+    Pin a visitor's reads to the primary for ``REPLICA_PIN_SECONDS`` after
+    any request of theirs writes to the database.
+    """
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if replica_alias() is None:
+            return self.get_response(request)
+
+        state, token = start_request(pinned=PIN_COOKIE in request.COOKIES)
+        try:
+            response = self.get_response(request)
+        finally:
+            end_request(token)
+        return self._pin(state, response)
+
+    async def __acall__(self, request):
+        if replica_alias() is None:
+            return await self.get_response(request)
+
+        state, token = start_request(pinned=PIN_COOKIE in request.COOKIES)
+        try:
+            response = await self.get_response(request)
+        finally:
+            end_request(token)
+        return self._pin(state, response)
+
+    def _pin(self, state, response):
+        if state.wrote:
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=replica_pin_seconds(), httponly=True, samesite='Lax'
+            )
+        return response
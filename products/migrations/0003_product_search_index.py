@@ -0,0 +1,54 @@
+import html
+
+from django.db import migrations
+from django.utils.html import strip_tags
+
+
+FTS_TABLE = 'products_product_fts'
+
+
+def create_search_index(apps, schema_editor):
+    """Create the FTS5 table and index any existing products (SQLite only)."""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5('
+        'product_id UNINDEXED, product_name, product_details, brand_name, category_name, '
+        "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    )
+    Product = apps.get_model('products', 'Product')
+    rows = [
+        (
+            product.product_id.hex,
+            product.product_name,
+            html.unescape(strip_tags(product.product_details or '')).strip(),
+            product.brand.brand_name,
+            product.category.category_name,
+        )
+        for product in Product.objects.select_related('brand', 'category')
+    ]
+    if rows:
+        with schema_editor.connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} '
+                '(product_id, product_name, product_details, brand_name, category_name) '
+                'VALUES (%s, %s, %s, %s, %s)',
+                rows
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_product_product_image_url_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-17 06:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_product_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('in_cart', True)), fields=['user', '-created_at'], name='order_open_cart_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('available_stock__gt', 0)), fields=['-created_at', '-product_id'], name='product_instock_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('available_stock__gt', 0), ('featured', True)), fields=['-created_at'], name='product_featured_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('available_stock__gt', 0)), fields=['brand', '-created_at', '-product_id'], name='product_brand_instock_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('available_stock__gt', 0)), fields=['category', '-created_at', '-product_id'], name='product_category_instock_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-17 06:19
+
+import django.core.validators
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_storefront_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='reserved_stock',
+            field=models.IntegerField(default=0, editable=False, help_text='Units held by open carts (see StockReservation)'),
+        ),
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('reservation_id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False, unique=True)),
+                ('quantity', models.IntegerField(help_text='Number of units held', validators=[django.core.validators.MinValueValidator(1)])),
+                ('expires_at', models.DateTimeField(db_index=True, help_text='The hold is released by release_expired_reservations after this time')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('order', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='reservations', to='products.order')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='products.product')),
+            ],
+            options={
+                'verbose_name': 'Stock Reservation',
+                'verbose_name_plural': 'Stock Reservations',
+                'ordering': ['expires_at'],
+                'unique_together': {('order', 'product')},
+            },
+        ),
+    ]
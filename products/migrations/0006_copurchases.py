@@ -0,0 +1,46 @@
+# Generated by Django 5.2.7 on 2026-10-17 06:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_stock_reservations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CoPurchaseRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_completed_at', models.DateTimeField(blank=True, null=True)),
+                ('last_order_id', models.UUIDField(blank=True, null=True)),
+                ('orders_processed', models.IntegerField(default=0)),
+                ('pairs_updated', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Co-purchase Run',
+                'verbose_name_plural': 'Co-purchase Runs',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CoPurchase',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.IntegerField(default=0, help_text='Number of completed orders containing both products')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='copurchases', to='products.product')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='copurchased_by', to='products.product')),
+            ],
+            options={
+                'verbose_name': 'Co-purchase',
+                'verbose_name_plural': 'Co-purchases',
+                'indexes': [models.Index(fields=['product', '-score'], name='copurchase_top_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'related'), name='copurchase_pair_unique')],
+            },
+        ),
+    ]
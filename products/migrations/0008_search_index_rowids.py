@@ -0,0 +1,64 @@
+import html
+
+from django.db import migrations
+from django.utils.html import strip_tags
+
+
+FTS_TABLE = 'products_product_fts'
+KEY_TABLE = 'products_product_fts_key'
+
+
+def key_search_index(apps, schema_editor):
+    """
+    Give every product an integer key and rebuild the FTS5 table with the
+    key as its rowid, so index rows are replaced by rowid (SQLite only).
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f'CREATE TABLE IF NOT EXISTS {KEY_TABLE} ('
+        'id INTEGER PRIMARY KEY, product_id char(32) NOT NULL UNIQUE)'
+    )
+    schema_editor.execute(f'DELETE FROM {FTS_TABLE}')
+    Product = apps.get_model('products', 'Product')
+    rows = [
+        (
+            product.product_id.hex,
+            product.product_id.hex,
+            product.product_name,
+            html.unescape(strip_tags(product.product_details or '')).strip(),
+            product.brand.brand_name,
+            product.category.category_name,
+        )
+        for product in Product.objects.select_related('brand', 'category')
+    ]
+    if rows:
+        with schema_editor.connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT OR IGNORE INTO {KEY_TABLE} (product_id) VALUES (%s)',
+                [[row[0]] for row in rows]
+            )
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} '
+                '(rowid, product_id, product_name, product_details, brand_name, category_name) '
+                f'VALUES ((SELECT id FROM {KEY_TABLE} WHERE product_id = %s), %s, %s, %s, %s, %s)',
+                rows
+            )
+
+
+def drop_search_keys(apps, schema_editor):
+    # The FTS rows still carry product_id, which is all the earlier code used
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f'DROP TABLE IF EXISTS {KEY_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(key_search_index, drop_search_keys),
+    ]
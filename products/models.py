@@ -1,8 +1,13 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Q
 from django.core.validators import MinValueValidator
 from django.conf import settings
+from django.utils import timezone
 import uuid
 
+from . import images
+from .metrics import count_checkout
+
 
 class Brand(models.Model):
     """Brand model for skincare products."""
@@ -94,6 +99,11 @@ class Product(models.Model):
         validators=[MinValueValidator(0)],
         help_text='Number of items available in stock'
     )
+    reserved_stock = models.IntegerField(
+        default=0,
+        editable=False,
+        help_text='Units held by open carts (see StockReservation)'
+    )
     featured = models.BooleanField(
         default=False,
         help_text='Featured products will be highlighted on the homepage'
@@ -105,18 +115,73 @@ class Product(models.Model):
         verbose_name = 'Product'
         verbose_name_plural = 'Products'
         ordering = ['-created_at']
+        indexes = [
+            # Storefront listings only ever show in-stock products, newest first
+            models.Index(
+                fields=['-created_at', '-product_id'],
+                condition=Q(available_stock__gt=0),
+                name='product_instock_recent_idx',
+            ),
+            models.Index(
+                fields=['-created_at'],
+                condition=Q(available_stock__gt=0, featured=True),
+                name='product_featured_recent_idx',
+            ),
+            models.Index(
+                fields=['brand', '-created_at', '-product_id'],
+                condition=Q(available_stock__gt=0),
+                name='product_brand_instock_idx',
+            ),
+            models.Index(
+                fields=['category', '-created_at', '-product_id'],
+                condition=Q(available_stock__gt=0),
+                name='product_category_instock_idx',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.product_name} - {self.brand.brand_name}"
     
-    def get_image_url(self):
-        """Return image URL, prioritizing uploaded image over URL field."""
+    def save(self, *args, **kwargs):
+        """
+        Leave reserved_stock out of updates. It only changes through the F()
+        updates in products.reservations, and writing back the value this
+        instance was loaded with would undo holds taken since then.
+        """
+        if not self._state.adding and not kwargs.get('force_insert') and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'reserved_stock'
+            ]
+        super().save(*args, **kwargs)
+    
+    def get_image_url(self, size=None, fmt='jpeg'):
+        """
+        Return image URL, prioritizing uploaded image over URL field.
+        Pass ``size`` ('thumb', 'card' or 'detail') to get the resized
+        derivative of an uploaded image once it has been generated.
+        """
         if self.product_image:
+            if size:
+                url = images.derivative_url(self.product_image.name, size, fmt)
+                if url:
+                    return url
             return self.product_image.url
         elif self.product_image_url:
             return self.product_image_url
         return None
     
+    def get_image_srcset(self, fmt='jpeg'):
+        """Return a srcset of the derivative widths, or '' if there are none."""
+        if self.product_image:
+            return images.srcset(self.product_image.name, fmt)
+        return ''
+    
+    @property
+    def available_to_sell(self):
+        """Units not yet held by any cart."""
+        return max(self.available_stock - self.reserved_stock, 0)
+    
     def is_in_stock(self):
         """Check if product is available in stock."""
         return self.available_stock > 0
@@ -161,6 +226,14 @@ class Order(models.Model):
         verbose_name = 'Order'
         verbose_name_plural = 'Orders'
         ordering = ['-created_at']
+        indexes = [
+            # Cart lookups: filter(user=..., in_cart=True), newest first
+            models.Index(
+                fields=['user', '-created_at'],
+                condition=Q(in_cart=True),
+                name='order_open_cart_idx',
+            ),
+        ]
     
     def __str__(self):
         status = "Cart" if self.in_cart else "Completed"
@@ -176,27 +249,117 @@ class Order(models.Model):
     
     def complete_order(self):
         """
-        Complete the order and update stock levels.
-        Returns True if successful, False if insufficient stock.
+        Complete the order and update stock levels in a single transaction.
+        Returns a truthy CheckoutResult if successful, or a falsy one listing
+        the items that could not be fulfilled.
+        
+        Stock is taken with one conditional UPDATE covering every line, so two
+        concurrent checkouts can never both claim the last units, and the query
+        count does not grow with the number of items in the cart. Units held
+        by the order's StockReservations are converted into the sale; lines
+        whose hold has been swept fall back to the unreserved stock. A
+        successful sale is added to SalesDailyRollup in the same transaction.
+        A failed checkout rolls back, holds included.
         """
-        from django.utils import timezone
+        now = timezone.now()
         
-        # Check stock availability for all items
-        for item in self.items.all():
-            if item.product.available_stock < item.quantity:
-                return False
+        with transaction.atomic():
+            # Claim the order first so it cannot be completed twice
+            claimed = Order.objects.filter(pk=self.pk, in_cart=True).update(
+                in_cart=False, completed_at=now, updated_at=now
+            )
+            if not claimed:
+                count_checkout('not_in_cart')
+                return CheckoutResult(False, reason='not_in_cart')
+            
+            # Read the lines only once the claim holds, so the sale covers
+            # exactly the rows that were claimed
+            items = list(self.items.select_related('product'))
+            quantities = {item.product_id: item.quantity for item in items}
+            
+            # Lock the holds and delete them before moving any counter, so
+            # release_expired cannot give the same units back as well (it
+            # skips locked holds and only releases the rows it deleted)
+            holds = list(
+                StockReservation.objects.select_for_update()
+                .filter(order=self, product_id__in=quantities)
+                .values_list('reservation_id', 'product_id', 'quantity')
+            )
+            held = {product_id: quantity for _, product_id, quantity in holds}
+            if holds:
+                StockReservation.objects.filter(
+                    reservation_id__in=[reservation_id for reservation_id, _, _ in holds]
+                ).delete()
+            fulfilled = True
+            if quantities:
+                # Imported here: reservations imports this module
+                from .reservations import per_product
+                quantity = per_product(quantities)
+                reserved = per_product(held, default=0)
+                # Each line needs its quantity from its own hold plus the
+                # stock nobody else is holding
+                updated = Product.objects.filter(
+                    product_id__in=quantities,
+                    available_stock__gte=F('reserved_stock') - reserved + quantity,
+                ).update(
+                    available_stock=F('available_stock') - quantity,
+                    reserved_stock=F('reserved_stock') - reserved,
+                    updated_at=now,
+                )
+                fulfilled = updated == len(quantities)
+            if fulfilled:
+                # Counted in the same transaction, so reports never see half a checkout
+                from .sales import record_sale
+                record_sale(items, now)
+            else:
+                transaction.set_rollback(True)
         
-        # Update stock for each item
-        for item in self.items.all():
-            item.product.available_stock -= item.quantity
-            item.product.save()
+        if not fulfilled:
+            stock = {
+                pk: (available, reserved)
+                for pk, available, reserved in Product.objects.filter(
+                    product_id__in=quantities
+                ).values_list('product_id', 'available_stock', 'reserved_stock')
+            }
+            failed_items = []
+            for item in items:
+                available, reserved = stock.get(item.product_id, (0, 0))
+                item.product.available_stock = available
+                item.product.reserved_stock = reserved
+                item.available_quantity = max(available - reserved + held.get(item.product_id, 0), 0)
+                if item.available_quantity < item.quantity:
+                    failed_items.append(item)
+            count_checkout('out_of_stock')
+            return CheckoutResult(False, failed_items, reason='out_of_stock')
         
-        # Mark order as completed
-        self.in_cart = False
-        self.completed_at = timezone.now()
-        self.save()
+        from .cart import invalidate_cart_summary
+        invalidate_cart_summary(self.user_id)
+        count_checkout('completed')
         
-        return True
+        self.in_cart = False
+        self.completed_at = now
+        self.updated_at = now
+        return CheckoutResult(True, reason='completed')
+
+
+class CheckoutResult:
+    """
+    Outcome of Order.complete_order().
+    Evaluates to True on success; ``reason`` is ``'completed'``,
+    ``'not_in_cart'`` (the order was already checked out) or
+    ``'out_of_stock'``. ``failed_items`` holds the OrderItems whose
+    product did not have enough stock, with ``product.available_stock``
+    refreshed to the current value and ``available_quantity`` set to the
+    units the order could have taken.
+    """
+    
+    def __init__(self, success, failed_items=None, reason=None):
+        self.success = success
+        self.failed_items = failed_items or []
+        self.reason = reason
+    
+    def __bool__(self):
+        return self.success
 
 
 class OrderItem(models.Model):
@@ -249,3 +412,157 @@ class OrderItem(models.Model):
         if not self.price_at_purchase:
             self.price_at_purchase = self.product.price
         super().save(*args, **kwargs)
+
+
+class StockReservation(models.Model):
+    """
+    Units of a product held for an open cart until ``expires_at``.
+    
+    Every hold is mirrored in ``Product.reserved_stock`` by the helpers in
+    ``products.reservations``. The order link has no database constraint so
+    deleting an order leaves its holds to expire and be swept normally.
+    """
+    
+    reservation_id = models.UUIDField(
+        primary_key=True,
+        default=uuid.uuid4,
+        editable=False,
+        unique=True
+    )
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='reservations'
+    )
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='reservations'
+    )
+    quantity = models.IntegerField(
+        validators=[MinValueValidator(1)],
+        help_text='Number of units held'
+    )
+    expires_at = models.DateTimeField(
+        db_index=True,
+        help_text='The hold is released by release_expired_reservations after this time'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Stock Reservation'
+        verbose_name_plural = 'Stock Reservations'
+        ordering = ['expires_at']
+        unique_together = ['order', 'product']
+    
+    def __str__(self):
+        return f"{self.quantity}x {self.product_id} for Order {str(self.order_id)[:8]}"
+
+
+class CoPurchase(models.Model):
+    """
+    How many completed orders contained both ``product`` and ``related``.
+    Every pair is stored in both directions, so the top recommendations of
+    a product are one index range scan. Maintained by the
+    ``update_copurchases`` command (see ``products.recommendations``).
+    """
+    
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='copurchases'
+    )
+    related = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='copurchased_by'
+    )
+    score = models.IntegerField(
+        default=0,
+        help_text='Number of completed orders containing both products'
+    )
+    
+    class Meta:
+        verbose_name = 'Co-purchase'
+        verbose_name_plural = 'Co-purchases'
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'related'], name='copurchase_pair_unique'),
+        ]
+        indexes = [
+            # Top-N lookups: filter(product=...).order_by('-score')
+            models.Index(fields=['product', '-score'], name='copurchase_top_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.product_id} + {self.related_id} ({self.score})"
+
+
+class CoPurchaseRun(models.Model):
+    """
+    One run of ``update_copurchases``. Completed orders up to and including
+    (``last_completed_at``, ``last_order_id``) have been counted; the next
+    run carries on from there. The cursor is saved with every batch, so an
+    interrupted run never counts an order twice.
+    """
+    
+    last_completed_at = models.DateTimeField(null=True, blank=True)
+    last_order_id = models.UUIDField(null=True, blank=True)
+    orders_processed = models.IntegerField(default=0)
+    pairs_updated = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = 'Co-purchase Run'
+        verbose_name_plural = 'Co-purchase Runs'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"Co-purchase run {self.created_at:%Y-%m-%d %H:%M} ({self.orders_processed} orders)"
+
+
+class SalesDailyRollup(models.Model):
+    """
+    Units sold and revenue per local calendar day and product, with the
+    product's brand and category copied in so reports can group by them
+    without touching Product. Updated by ``Order.complete_order`` and
+    rebuilt from raw orders by ``rebuild_sales_rollups`` (see
+    ``products.sales``).
+    """
+    
+    day = models.DateField()
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='sales_rollups'
+    )
+    brand = models.ForeignKey(
+        Brand,
+        on_delete=models.CASCADE,
+        related_name='sales_rollups'
+    )
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        related_name='sales_rollups'
+    )
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    
+    class Meta:
+        verbose_name = 'Daily Sales Rollup'
+        verbose_name_plural = 'Daily Sales Rollups'
+        ordering = ['-day']
+        constraints = [
+            # Also the index behind the day-range breakdowns
+            models.UniqueConstraint(fields=['day', 'product'], name='sales_rollup_day_product_unique'),
+        ]
+        indexes = [
+            # Covers the per-day totals behind the month-over-month report
+            models.Index(fields=['day', 'units', 'revenue'], name='sales_rollup_day_totals_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.day} {self.product_id}: {self.units} units"
@@ -0,0 +1,204 @@
+"""
+Full-page cache for anonymous visitors.
+
+Anonymous visitors all see the same home and product pages, so the rendered
+response is cached under the request path, the query parameters that change
+the page (filters and cursors) and a catalog version number. Saving or
+deleting a product, brand or category bumps the version (see
+``products.signals``), which moves every page to new keys at once; stale
+entries simply expire. Stock changes made
+by checkout do not bump the version, so stock levels on cached pages can
+lag by up to PAGE_CACHE_TIMEOUT seconds.
+
+Logged-in users and guests with a cookie cart always get a freshly
+rendered page with their own header.
+
+Cached pages carry no CSRF token. Every anonymous response gets the CSRF
+cookie instead (set after the page is stored), and the page's forms copy
+it into their empty token field on submit (``{% cached_page_csrf_token %}``
+and ``products/js/csrf.js``), a double-submit cookie.
+"""
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+
+from .counters import aincrement, increment, read_counters, reset_counters
+from .guest_cart import GUEST_CART_COOKIE
+from .metrics import count_cache_lookup
+
+
+CATALOG_VERSION_KEY = 'products:catalog-version'
+HITS_KEY = 'products:page-cache:hits'
+MISSES_KEY = 'products:page-cache:misses'
+
+DEFAULT_PAGE_CACHE_TIMEOUT = 60
+
+# Query parameters that change what the home and product pages render;
+# anything else (tracking tags and the like) shares the cached page
+PAGE_CACHE_PARAMS = ('brand', 'category', 'min_price', 'max_price', 'after', 'before')
+
+
+def page_cache_enabled():
+    """Return False when ``PAGE_CACHE`` is switched off in settings."""
+    return getattr(settings, 'PAGE_CACHE', True)
+
+
+def page_cache_timeout():
+    return getattr(settings, 'PAGE_CACHE_TIMEOUT', DEFAULT_PAGE_CACHE_TIMEOUT)
+
+
+def get_catalog_version():
+    """Return the current catalog version, starting at 1."""
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, 1, timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY, 1)
+    return version
+
+
+async def aget_catalog_version():
+    """Async version of ``get_catalog_version``."""
+    version = await cache.aget(CATALOG_VERSION_KEY)
+    if version is None:
+        await cache.aadd(CATALOG_VERSION_KEY, 1, timeout=None)
+        version = await cache.aget(CATALOG_VERSION_KEY, 1)
+    return version
+
+
+def bump_catalog_version():
+    """Invalidate every cached page by moving to a new catalog version."""
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        # Key evicted or never set: any value not used before will do
+        cache.set(CATALOG_VERSION_KEY, get_catalog_version() + 1, timeout=None)
+
+
+def page_cache_stats():
+    """Return ``{'hits', 'misses', 'hit_rate'}`` since the counters were last reset."""
+    counts = read_counters([HITS_KEY, MISSES_KEY])
+    hits, misses = counts[HITS_KEY], counts[MISSES_KEY]
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total, 4) if total else 0.0,
+    }
+
+
+def reset_page_cache_stats():
+    reset_counters([HITS_KEY, MISSES_KEY])
+
+
+def _page_digest(request):
+    parts = [request.path] + [
+        f'{param}={",".join(sorted(request.GET.getlist(param)))}' for param in PAGE_CACHE_PARAMS
+    ]
+    return hashlib.sha256('|'.join(parts).encode()).hexdigest()[:32]
+
+
+def page_cache_key(request):
+    """Return the cache key of the page ``request`` asks for."""
+    return f'products:page:{get_catalog_version()}:{_page_digest(request)}'
+
+
+async def apage_cache_key(request):
+    return f'products:page:{await aget_catalog_version()}:{_page_digest(request)}'
+
+
+def _cacheable_request(request, user):
+    if request.method != 'GET' or user.is_authenticated:
+        return False
+    # The header shows the guest's cart count
+    if GUEST_CART_COOKIE in request.COOKIES:
+        return False
+    # A pending flash message is meant for this visitor only
+    return not len(get_messages(request))
+
+
+def _cacheable_response(request, response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        # The page rendered a CSRF token, which must not be shared
+        and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+    )
+
+
+def _cached_response(cached):
+    content, content_type = cached
+    response = HttpResponse(content, content_type=content_type)
+    response['X-Page-Cache'] = 'hit'
+    return response
+
+
+def cache_anonymous_page(view):
+    """
+    Serve ``view`` from the page cache for anonymous GET requests.
+    Responses carry ``X-Page-Cache: hit`` or ``miss``. Works on both sync
+    and async views.
+    """
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapped(request, *args, **kwargs):
+            user = await request.auser()
+            response = await serve(request, user, *args, **kwargs)
+            if not user.is_authenticated:
+                get_token(request)
+            return response
+
+        async def serve(request, user, *args, **kwargs):
+            if not page_cache_enabled() or not _cacheable_request(request, user):
+                return await view(request, *args, **kwargs)
+
+            key = await apage_cache_key(request)
+            cached = await cache.aget(key)
+            count_cache_lookup('page', cached is not None)
+            if cached is not None:
+                await aincrement(HITS_KEY)
+                return _cached_response(cached)
+
+            await aincrement(MISSES_KEY)
+            response = await view(request, *args, **kwargs)
+            if _cacheable_response(request, response):
+                await cache.aset(
+                    key, (response.content, response['Content-Type']), page_cache_timeout()
+                )
+            response['X-Page-Cache'] = 'miss'
+            return response
+
+        return async_wrapped
+
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        response = serve(request, *args, **kwargs)
+        if not request.user.is_authenticated:
+            get_token(request)
+        return response
+
+    def serve(request, *args, **kwargs):
+        if not page_cache_enabled() or not _cacheable_request(request, request.user):
+            return view(request, *args, **kwargs)
+
+        key = page_cache_key(request)
+        cached = cache.get(key)
+        count_cache_lookup('page', cached is not None)
+        if cached is not None:
+            increment(HITS_KEY)
+            return _cached_response(cached)
+
+        increment(MISSES_KEY)
+        response = view(request, *args, **kwargs)
+        if _cacheable_response(request, response):
+            cache.set(key, (response.content, response['Content-Type']), page_cache_timeout())
+        response['X-Page-Cache'] = 'miss'
+        return response
+
+    return wrapped
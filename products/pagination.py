@@ -0,0 +1,144 @@
+"""
+Keyset (cursor) pagination for product listings.
+
+Pages are addressed by the ``(created_at, product_id)`` pair of the row on
+the page boundary instead of an OFFSET, so fetching a deep page costs the
+same as fetching the first one.
+"""
+import base64
+import binascii
+import uuid
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+DEFAULT_PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(product):
+    """Encode the ordering key of a product into an opaque URL-safe cursor."""
+    raw = f"{product.created_at.isoformat()}|{product.product_id.hex}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor into a ``(created_at, product_id)`` tuple.
+    Returns None if the cursor is missing or malformed.
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        created_at_raw, product_id_raw = raw.split('|', 1)
+        created_at = parse_datetime(created_at_raw)
+        product_id = uuid.UUID(product_id_raw)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if created_at is None:
+        return None
+    return created_at, product_id
+
+
+def clamp_page_size(value, default=DEFAULT_PAGE_SIZE):
+    """Parse a requested page size and keep it within 1..MAX_PAGE_SIZE."""
+    try:
+        page_size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(page_size, MAX_PAGE_SIZE))
+
+
+class CursorPage:
+    """A single page of products plus the cursors of its neighbours."""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+def _page_rows(queryset, after_key, before_key, page_size):
+    """Return the sliced queryset holding one page plus a look-ahead row."""
+    if before_key is not None:
+        created_at, product_id = before_key
+        return (
+            queryset.filter(created_at__gte=created_at)
+            .filter(Q(created_at__gt=created_at) | Q(product_id__gt=product_id))
+            .order_by('created_at', 'product_id')[:page_size + 1]
+        )
+    if after_key is not None:
+        created_at, product_id = after_key
+        # The plain range term lets the database seek into the
+        # (created_at, product_id) index instead of scanning from the top
+        queryset = queryset.filter(created_at__lte=created_at).filter(
+            Q(created_at__lt=created_at) | Q(product_id__lt=product_id)
+        )
+    return queryset.order_by('-created_at', '-product_id')[:page_size + 1]
+
+
+def _make_page(rows, after_key, before_key, page_size):
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if not rows:
+        return CursorPage([])
+    if before_key is not None:
+        rows.reverse()
+        return CursorPage(
+            rows,
+            next_cursor=encode_cursor(rows[-1]),
+            previous_cursor=encode_cursor(rows[0]) if has_more else None,
+        )
+    return CursorPage(
+        rows,
+        next_cursor=encode_cursor(rows[-1]) if has_more else None,
+        previous_cursor=encode_cursor(rows[0]) if after_key is not None else None,
+    )
+
+
+def _page_keys(after, before):
+    after_key = decode_cursor(after)
+    before_key = decode_cursor(before) if after_key is None else None
+    return after_key, before_key
+
+
+def paginate_products(queryset, after=None, before=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Return a CursorPage of ``queryset`` ordered newest first.
+
+    ``after`` fetches the page following the given cursor, ``before`` the page
+    preceding it. Ordering is ``-created_at`` with ``-product_id`` as the
+    tiebreaker so that rows sharing a timestamp are never skipped or repeated.
+    """
+    page_size = clamp_page_size(page_size)
+    after_key, before_key = _page_keys(after, before)
+    rows = list(_page_rows(queryset, after_key, before_key, page_size))
+    return _make_page(rows, after_key, before_key, page_size)
+
+
+async def apaginate_products(queryset, after=None, before=None, page_size=DEFAULT_PAGE_SIZE):
+    """Async version of ``paginate_products``."""
+    page_size = clamp_page_size(page_size)
+    after_key, before_key = _page_keys(after, before)
+    rows = [row async for row in _page_rows(queryset, after_key, before_key, page_size)]
+    return _make_page(rows, after_key, before_key, page_size)
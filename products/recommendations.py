@@ -0,0 +1,161 @@
+"""
+"Frequently bought together" recommendations.
+
+``update_copurchases`` scans completed orders in ``completed_at`` order and
+adds every pair of products bought together to the CoPurchase table, so
+the detail page can read the top-N for a product with one indexed query.
+Runs are incremental: each CoPurchaseRun saves its position after every
+batch and the next run only looks at orders completed after that.
+"""
+from datetime import timedelta
+from itertools import permutations
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import CoPurchase, CoPurchaseRun, Order, OrderItem, Product
+
+
+# Orders completed this recently are left for the next run, so a checkout
+# that commits after the scan started is never skipped
+DEFAULT_LAG = timedelta(seconds=60)
+
+# Bulk orders say little about what goes together and cost O(n^2) pairs
+MAX_ITEMS_PER_ORDER = 50
+
+
+def _upsert_pairs(counts):
+    """Add ``{(product_id, related_id): count}`` onto the stored scores."""
+    opts = CoPurchase._meta
+    quote = connection.ops.quote_name
+    pk_field = Product._meta.pk
+    sql = (
+        'INSERT INTO {table} ({product}, {related}, {score}) VALUES (%s, %s, %s) '
+        'ON CONFLICT ({product}, {related}) DO UPDATE SET {score} = {table}.{score} + excluded.{score}'
+    ).format(
+        table=quote(opts.db_table),
+        product=quote(opts.get_field('product').column),
+        related=quote(opts.get_field('related').column),
+        score=quote(opts.get_field('score').column),
+    )
+    params = [
+        (
+            pk_field.get_db_prep_value(product_id, connection),
+            pk_field.get_db_prep_value(related_id, connection),
+            count,
+        )
+        for (product_id, related_id), count in counts.items()
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+def _count_pairs(order_ids):
+    """Return co-purchase counts for the given orders, both directions."""
+    baskets = {}
+    items = (
+        OrderItem.objects.filter(order_id__in=order_ids)
+        .order_by()
+        .values_list('order_id', 'product_id')
+    )
+    for order_id, product_id in items:
+        baskets.setdefault(order_id, set()).add(product_id)
+    counts = {}
+    for products in baskets.values():
+        if len(products) < 2 or len(products) > MAX_ITEMS_PER_ORDER:
+            continue
+        for pair in permutations(products, 2):
+            counts[pair] = counts.get(pair, 0) + 1
+    return counts
+
+
+def update_copurchases(batch_size=1000, lag=DEFAULT_LAG, rebuild=False, progress=None):
+    """
+    Count the orders completed since the last run (or all of them with
+    ``rebuild``) into CoPurchase, ``batch_size`` orders per transaction.
+    Returns the CoPurchaseRun recording this run.
+    """
+    if rebuild:
+        with transaction.atomic():
+            CoPurchase.objects.all().delete()
+            CoPurchaseRun.objects.all().delete()
+    last = CoPurchaseRun.objects.order_by('-created_at').first()
+    run = CoPurchaseRun.objects.create(
+        last_completed_at=last.last_completed_at if last else None,
+        last_order_id=last.last_order_id if last else None,
+    )
+
+    orders = Order.objects.filter(
+        in_cart=False, completed_at__lte=timezone.now() - lag
+    ).order_by('completed_at', 'order_id')
+    while True:
+        # Keyset over (completed_at, order_id), resuming from the saved cursor
+        batch = orders
+        if run.last_completed_at is not None:
+            batch = batch.filter(completed_at__gte=run.last_completed_at).exclude(
+                completed_at=run.last_completed_at, order_id__lte=run.last_order_id
+            )
+        keys = list(batch.values_list('completed_at', 'order_id')[:batch_size])
+        if not keys:
+            break
+        counts = _count_pairs([order_id for _, order_id in keys])
+        run.last_completed_at, run.last_order_id = keys[-1]
+        run.orders_processed += len(keys)
+        run.pairs_updated += len(counts)
+        with transaction.atomic():
+            if counts:
+                _upsert_pairs(counts)
+            run.save(update_fields=[
+                'last_completed_at', 'last_order_id', 'orders_processed', 'pairs_updated'
+            ])
+        if progress:
+            progress(run)
+        if len(keys) < batch_size:
+            break
+
+    run.finished_at = timezone.now()
+    run.save(update_fields=['finished_at'])
+    return run
+
+
+def _top_copurchases(product, limit):
+    return (
+        Product.objects.filter(copurchased_by__product=product, available_stock__gt=0)
+        .select_related('brand')
+        .order_by('-copurchased_by__score', 'product_id')[:limit]
+    )
+
+
+def _category_fill(product, recommended, limit):
+    return (
+        Product.objects.filter(category_id=product.category_id, available_stock__gt=0)
+        .exclude(product_id__in=[product.product_id] + [p.product_id for p in recommended])
+        .select_related('brand')[:limit - len(recommended)]
+    )
+
+
+def _mark(products, bought_together):
+    for product in products:
+        product.bought_together = bought_together
+    return products
+
+
+def recommended_products(product, limit=4):
+    """
+    Return up to ``limit`` in-stock products most often bought together with
+    ``product``, topped up from its category when there is too little data.
+    Each has ``bought_together`` set, True for co-purchases (which come
+    first) and False for the category top-up.
+    """
+    recommended = _mark(list(_top_copurchases(product, limit)), True)
+    if len(recommended) < limit:
+        recommended += _mark(list(_category_fill(product, recommended, limit)), False)
+    return recommended
+
+
+async def arecommended_products(product, limit=4):
+    """Async version of ``recommended_products``."""
+    recommended = _mark([p async for p in _top_copurchases(product, limit)], True)
+    if len(recommended) < limit:
+        recommended += _mark([p async for p in _category_fill(product, recommended, limit)], False)
+    return recommended
@@ -0,0 +1,153 @@
+"""
+Time-limited stock holds for open carts.
+
+Adding a product to a cart holds the units in a StockReservation and moves
+``Product.reserved_stock`` up by the same amount, so the units other
+shoppers can take (``available_stock - reserved_stock``) is always a column
+read rather than an aggregate. All counter changes are conditional F()
+updates, so two carts can never hold the same last unit. Holds expire after
+STOCK_RESERVATION_TTL seconds and are released in batches by the
+``release_expired_reservations`` command; checkout converts the holds of
+the order into the sale.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Case, F, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import Product, StockReservation
+
+
+DEFAULT_RESERVATION_TTL = 60 * 15
+
+
+def reservation_ttl():
+    """Return how long a hold lasts, from the STOCK_RESERVATION_TTL setting."""
+    return timedelta(seconds=getattr(settings, 'STOCK_RESERVATION_TTL', DEFAULT_RESERVATION_TTL))
+
+
+def per_product(values, default=None):
+    """
+    Return a ``Case`` giving each product in ``{product_pk: int}`` its own
+    value, so one ``UPDATE`` of Product can move every counter by a
+    different amount. Products not in ``values`` get ``default``.
+    """
+    return Case(
+        *[When(pk=pk, then=Value(value)) for pk, value in values.items()],
+        default=None if default is None else Value(default),
+        output_field=models.IntegerField(),
+    )
+
+
+def with_max_quantity(order_items):
+    """
+    Annotate an OrderItem queryset with ``max_quantity``, the most units the
+    line can be set to: what nobody holds plus what its own cart holds.
+    """
+    held = StockReservation.objects.filter(
+        order_id=OuterRef('order_id'), product_id=OuterRef('product_id')
+    ).values('quantity')[:1]
+    return order_items.annotate(
+        max_quantity=Greatest(
+            F('product__available_stock') - F('product__reserved_stock') + Coalesce(Subquery(held), 0),
+            0,
+        )
+    )
+
+
+def reserve(order_id, product_id, quantity):
+    """
+    Hold ``quantity`` units of a product for an order, replacing any
+    previous hold of that pair and restarting its TTL. Returns False, without
+    changing anything, if fewer units are free.
+    """
+    with transaction.atomic(savepoint=False):
+        current = (
+            StockReservation.objects.select_for_update()
+            .filter(order_id=order_id, product_id=product_id)
+            .first()
+        )
+        delta = quantity - (current.quantity if current else 0)
+        if delta > 0:
+            claimed = Product.objects.filter(
+                pk=product_id,
+                available_stock__gte=F('reserved_stock') + delta,
+            ).update(reserved_stock=F('reserved_stock') + delta)
+            if not claimed:
+                return False
+        elif delta < 0:
+            Product.objects.filter(pk=product_id).update(reserved_stock=F('reserved_stock') + delta)
+
+        expires_at = timezone.now() + reservation_ttl()
+        if current:
+            current.quantity = quantity
+            current.expires_at = expires_at
+            current.save(update_fields=['quantity', 'expires_at', 'updated_at'])
+        else:
+            StockReservation.objects.create(
+                order_id=order_id, product_id=product_id, quantity=quantity,
+                expires_at=expires_at,
+            )
+    return True
+
+
+def release(order_id, product_id):
+    """Drop the hold of an order on a product, if there is one."""
+    with transaction.atomic(savepoint=False):
+        current = (
+            StockReservation.objects.select_for_update()
+            .filter(order_id=order_id, product_id=product_id)
+            .first()
+        )
+        if current is None:
+            return
+        # Only the caller that actually deleted the row gives the units back
+        deleted, _ = StockReservation.objects.filter(pk=current.pk).delete()
+        if deleted:
+            Product.objects.filter(pk=product_id).update(
+                reserved_stock=F('reserved_stock') - current.quantity
+            )
+
+
+def release_expired(batch_size=500, now=None):
+    """
+    Release every hold that expired before ``now``, ``batch_size`` at a time.
+    Each batch is one transaction with one DELETE and one UPDATE for all
+    affected products; ``reserved_stock`` only goes down by holds the DELETE
+    removed. Returns the number of holds released.
+    """
+    now = now or timezone.now()
+    released = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                StockReservation.objects.select_for_update(skip_locked=True)
+                .filter(expires_at__lte=now)
+                .order_by('expires_at')
+                .values_list('reservation_id', 'product_id', 'quantity')[:batch_size]
+            )
+            if not batch:
+                break
+            # Delete first: only holds this transaction removed give units back
+            deleted, _ = StockReservation.objects.filter(
+                reservation_id__in=[reservation_id for reservation_id, _, _ in batch]
+            ).delete()
+            if deleted != len(batch):
+                # A checkout or cart edit took some of these holds since they
+                # were read (possible where row locks are not supported); the
+                # next read no longer sees them
+                transaction.set_rollback(True)
+                continue
+            totals = {}
+            for _, product_id, quantity in batch:
+                totals[product_id] = totals.get(product_id, 0) + quantity
+            Product.objects.filter(product_id__in=totals).update(
+                reserved_stock=F('reserved_stock') - per_product(totals)
+            )
+        released += len(batch)
+        if len(batch) < batch_size:
+            break
+    return released
@@ -0,0 +1,85 @@
+"""
+Database router sending catalog reads to a replica.
+
+Reads of Product, Brand and Category go to the alias named by the
+``CATALOG_REPLICA`` setting when that alias is configured in DATABASES.
+Everything else stays on ``default``: writes, carts and orders, auth and
+sessions, and every query made while a transaction is open on the
+primary, so ``transaction.atomic()`` blocks never read stale stock.
+
+A replica lags behind the primary, so a visitor who has just written
+(added to the cart, checked out, edited a product in the admin) would not
+see the change on the next page. ``ReplicaPinMiddleware`` notices writes
+through ``db_for_write`` and sets a cookie that keeps that visitor's reads
+on the primary for ``REPLICA_PIN_SECONDS``.
+"""
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+DEFAULT_REPLICA_PIN_SECONDS = 15
+
+PIN_COOKIE = 'primary_pin'
+
+CATALOG_MODELS = frozenset({('products', 'product'), ('products', 'brand'), ('products', 'category')})
+
+
+class _RequestState:
+    def __init__(self, pinned):
+        self.pinned = pinned
+        self.wrote = False
+
+
+# Set per request by ReplicaPinMiddleware; None outside requests
+_request_state = ContextVar('replica_request_state', default=None)
+
+
+def replica_alias():
+    """Return the configured replica alias, or None when there is none."""
+    alias = getattr(settings, 'CATALOG_REPLICA', None)
+    return alias if alias and alias in settings.DATABASES else None
+
+
+def replica_pin_seconds():
+    return getattr(settings, 'REPLICA_PIN_SECONDS', DEFAULT_REPLICA_PIN_SECONDS)
+
+
+def start_request(pinned):
+    """Begin tracking writes for one request; returns a token for ``end_request``."""
+    state = _RequestState(pinned)
+    return state, _request_state.set(state)
+
+
+def end_request(token):
+    _request_state.reset(token)
+
+
+class CatalogReplicaRouter:
+    """Route catalog reads to ``CATALOG_REPLICA`` and everything else to the primary."""
+
+    def db_for_read(self, model, **hints):
+        replica = replica_alias()
+        if replica is None or (model._meta.app_label, model._meta.model_name) not in CATALOG_MODELS:
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        state = _request_state.get()
+        if state is not None and (state.pinned or state.wrote):
+            return DEFAULT_DB_ALIAS
+        return replica
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows, so a product read from it can be
+        # put in a cart on the primary
+        replica = replica_alias()
+        if replica and {obj1._state.db, obj2._state.db} <= {DEFAULT_DB_ALIAS, replica}:
+            return True
+        return None
@@ -0,0 +1,186 @@
+"""
+Daily sales rollups.
+
+Revenue and units-sold reports read SalesDailyRollup, one row per local
+calendar day and product, instead of scanning OrderItem joined to Order.
+``record_sale`` adds a completed order to its day inside the checkout
+transaction; ``rebuild_rollups`` recomputes any date range from the raw
+orders, e.g. after backfilling or correcting orders by hand. Report size
+depends on days and products sold, not on the number of orders.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import DecimalField, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import OrderItem, SalesDailyRollup
+
+
+ROLLUP_COLUMNS = ('day', 'product', 'brand', 'category', 'units', 'revenue')
+
+REPORT_GROUPS = {
+    'product': 'product__product_name',
+    'brand': 'brand__brand_name',
+    'category': 'category__category_name',
+}
+
+
+def _upsert_sql():
+    opts = SalesDailyRollup._meta
+    quote = connection.ops.quote_name
+    table = quote(opts.db_table)
+    columns = [quote(opts.get_field(name).column) for name in ROLLUP_COLUMNS]
+    day, product, brand, category, units, revenue = columns
+    return (
+        f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({", ".join(["%s"] * len(columns))}) '
+        f'ON CONFLICT ({day}, {product}) DO UPDATE SET '
+        f'{units} = {table}.{units} + excluded.{units}, '
+        f'{revenue} = {table}.{revenue} + excluded.{revenue}, '
+        f'{brand} = excluded.{brand}, {category} = excluded.{category}'
+    )
+
+
+def record_sale(items, completed_at):
+    """
+    Add the lines of a completed order (OrderItems with ``product`` loaded)
+    to the rollup of its local day, in one query.
+    """
+    if not items:
+        return
+    fields = [SalesDailyRollup._meta.get_field(name) for name in ROLLUP_COLUMNS]
+    day = timezone.localdate(completed_at)
+    params = [
+        [
+            field.get_db_prep_save(value, connection)
+            for field, value in zip(fields, (
+                day,
+                item.product_id,
+                item.product.brand_id,
+                item.product.category_id,
+                item.quantity,
+                item.get_subtotal(),
+            ))
+        ]
+        for item in items
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(_upsert_sql(), params)
+
+
+def _local_midnight(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def month_end(day):
+    """Return the last day of the month containing ``day``."""
+    next_month = (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+    return next_month - timedelta(days=1)
+
+
+def rebuild_rollups(start, end, progress=None):
+    """
+    Recompute the rollups of ``start``..``end`` (inclusive dates) from
+    completed orders, one month per transaction. Returns the rows written.
+    """
+    written = 0
+    chunk_start = start
+    while chunk_start <= end:
+        chunk_end = min(end, month_end(chunk_start))
+        rows = (
+            OrderItem.objects.filter(
+                order__in_cart=False,
+                order__completed_at__gte=_local_midnight(chunk_start),
+                order__completed_at__lt=_local_midnight(chunk_end + timedelta(days=1)),
+            )
+            .annotate(day=TruncDate('order__completed_at'))
+            .values('day', 'product_id', 'product__brand_id', 'product__category_id')
+            .annotate(
+                sold=Sum('quantity'),
+                takings=Sum(
+                    F('quantity') * F('price_at_purchase'),
+                    output_field=DecimalField(max_digits=14, decimal_places=2)
+                ),
+            )
+            .order_by()
+        )
+        with transaction.atomic():
+            SalesDailyRollup.objects.filter(day__range=(chunk_start, chunk_end)).delete()
+            created = SalesDailyRollup.objects.bulk_create(
+                (
+                    SalesDailyRollup(
+                        day=row['day'],
+                        product_id=row['product_id'],
+                        brand_id=row['product__brand_id'],
+                        category_id=row['product__category_id'],
+                        units=row['sold'],
+                        revenue=row['takings'],
+                    )
+                    for row in rows
+                ),
+                batch_size=1000,
+            )
+        written += len(created)
+        if progress:
+            progress(chunk_start, chunk_end, len(created))
+        chunk_start = chunk_end + timedelta(days=1)
+    return written
+
+
+def _add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1, day=1)
+
+
+def monthly_totals(months=12, today=None):
+    """
+    Return ``[{'month', 'units', 'revenue', 'change'}]`` for the last
+    ``months`` calendar months, oldest first. ``change`` is the revenue
+    change from the previous month in percent, or None.
+    """
+    today = today or timezone.localdate()
+    first = _add_months(today.replace(day=1), -(months - 1))
+    totals = {}
+    # Group by day in SQL (a covering index scan) and fold days into months
+    # here; TruncMonth would call a Python function for every rollup row
+    for row in daily_totals(first, today):
+        month = row['day'].replace(day=1)
+        units, revenue = totals.get(month, (0, Decimal('0.00')))
+        totals[month] = (units + row['units'], revenue + row['revenue'])
+    report = []
+    previous = None
+    for offset in range(months):
+        month = _add_months(first, offset)
+        units, revenue = totals.get(month, (0, Decimal('0.00')))
+        change = None
+        if previous:
+            change = round((revenue - previous) / previous * 100, 1)
+        report.append({'month': month, 'units': units, 'revenue': revenue, 'change': change})
+        previous = revenue
+    return report
+
+
+def daily_totals(start, end):
+    """Return ``[{'day', 'units', 'revenue'}]`` for days with sales, oldest first."""
+    return list(
+        SalesDailyRollup.objects.filter(day__range=(start, end))
+        .values('day')
+        .annotate(units=Sum('units'), revenue=Sum('revenue'))
+        .order_by('day')
+    )
+
+
+def top_sellers(start, end, group='product', limit=10):
+    """
+    Return the best-selling products, brands or categories by revenue as
+    ``[{'name', 'units', 'revenue'}]``. Names come from a join on the
+    grouped table.
+    """
+    return list(
+        SalesDailyRollup.objects.filter(day__range=(start, end))
+        .values(group, name=F(REPORT_GROUPS[group]))
+        .annotate(units=Sum('units'), revenue=Sum('revenue'))
+        .order_by('-revenue', 'name')[:limit]
+    )
@@ -0,0 +1,248 @@
+"""
+Full-text product search backed by an SQLite FTS5 index.
+
+The ``products_product_fts`` virtual table mirrors the searchable text of
+each product (name, details with HTML stripped, brand and category names)
+and is kept in sync by the signal handlers in ``products.signals``. FTS5
+cannot index ``product_id``, so each product gets a stable integer key in
+``products_product_fts_key`` and its index row is stored under that rowid;
+replacing or dropping a row is then a rowid lookup, not a scan. On
+databases other than SQLite every helper degrades to a no-op and searches
+fall back to ``icontains`` matching.
+"""
+import html
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.utils.html import escape, strip_tags
+
+from .models import Product
+
+
+FTS_TABLE = 'products_product_fts'
+KEY_TABLE = 'products_product_fts_key'
+
+# bm25() column weights in table order: product_id (unindexed), product_name,
+# product_details, brand_name, category_name
+BM25_WEIGHTS = (0.0, 10.0, 1.0, 5.0, 3.0)
+
+# Private-use markers wrapped around matches by snippet(); swapped for <mark>
+# only after the snippet text has been HTML-escaped.
+_MATCH_START = '\ue000'
+_MATCH_END = '\ue001'
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+_KEY_SQL = f'INSERT OR IGNORE INTO {KEY_TABLE} (product_id) VALUES (%s)'
+
+_INSERT_SQL = (
+    f'INSERT INTO {FTS_TABLE} '
+    '(rowid, product_id, product_name, product_details, brand_name, category_name) '
+    f'VALUES ((SELECT id FROM {KEY_TABLE} WHERE product_id = %s), %s, %s, %s, %s, %s)'
+)
+
+_DELETE_SQL = (
+    f'DELETE FROM {FTS_TABLE} WHERE rowid = '
+    f'(SELECT id FROM {KEY_TABLE} WHERE product_id = %s)'
+)
+
+
+class SearchResult:
+    """A matched product with its BM25 rank and highlighted snippet."""
+
+    def __init__(self, product, rank, snippet):
+        self.product = product
+        self.rank = rank
+        self.snippet = snippet
+
+
+def search_enabled():
+    """Return True when the default database supports the FTS5 index."""
+    return connection.vendor == 'sqlite'
+
+
+def plain_text(value):
+    """Strip HTML tags and entities from product details."""
+    return html.unescape(strip_tags(value or '')).strip()
+
+
+def build_match_query(query):
+    """
+    Turn free-form user input into a safe FTS5 MATCH expression.
+    Every word becomes a quoted prefix term, so FTS5 operators typed by the
+    user are treated as plain text. Returns an empty string if there is
+    nothing to search for.
+    """
+    tokens = _TOKEN_RE.findall(query or '')
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def _index_row(product):
+    return (
+        product.product_id.hex,
+        product.product_id.hex,
+        product.product_name,
+        plain_text(product.product_details),
+        product.brand.brand_name,
+        product.category.category_name,
+    )
+
+
+def _insert_rows(cursor, rows):
+    cursor.executemany(_KEY_SQL, [[row[0]] for row in rows])
+    cursor.executemany(_INSERT_SQL, rows)
+    return len(rows)
+
+
+def index_product(product):
+    """Insert or replace the index row for a single product."""
+    if not search_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(_DELETE_SQL, [product.product_id.hex])
+        _insert_rows(cursor, [_index_row(product)])
+
+
+def index_products(products, replace=True):
+    """
+    Index many products at once, for writers such as bulk_create() and
+    bulk_update() that bypass the post_save signal. Brand and category must
+    already be loaded on each product. Pass ``replace=False`` for products
+    known to be new to skip deleting their (non-existent) old rows.
+    """
+    if not search_enabled() or not products:
+        return
+    with connection.cursor() as cursor:
+        if replace:
+            cursor.executemany(_DELETE_SQL, [[product.product_id.hex] for product in products])
+        _insert_rows(cursor, [_index_row(product) for product in products])
+
+
+def remove_product(product_id):
+    """Drop the index row for a deleted product."""
+    if not search_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(_DELETE_SQL, [product_id.hex])
+        cursor.execute(f'DELETE FROM {KEY_TABLE} WHERE product_id = %s', [product_id.hex])
+
+
+def rename_brand(brand):
+    """Propagate a brand name change to every indexed product of that brand."""
+    if not search_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {FTS_TABLE} SET brand_name = %s WHERE rowid IN '
+            f'(SELECT k.id FROM {KEY_TABLE} k JOIN products_product p '
+            'ON p.product_id = k.product_id WHERE p.brand_id = %s)',
+            [brand.brand_name, brand.brand_id.hex]
+        )
+
+
+def rename_category(category):
+    """Propagate a category name change to every indexed product in it."""
+    if not search_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {FTS_TABLE} SET category_name = %s WHERE rowid IN '
+            f'(SELECT k.id FROM {KEY_TABLE} k JOIN products_product p '
+            'ON p.product_id = k.product_id WHERE p.category_id = %s)',
+            [category.category_name, category.category_id.hex]
+        )
+
+
+def rebuild_index(chunk_size=2000):
+    """
+    Rebuild the whole index from the product table.
+    Returns the number of products indexed.
+    """
+    if not search_enabled():
+        return 0
+    products = (
+        Product.objects.select_related('brand', 'category')
+        .only(
+            'product_id', 'product_name', 'product_details',
+            'brand__brand_name', 'category__category_name'
+        )
+        .order_by()
+    )
+    count = 0
+    batch = []
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(f'DELETE FROM {KEY_TABLE}')
+        for product in products.iterator(chunk_size=chunk_size):
+            batch.append(_index_row(product))
+            if len(batch) >= chunk_size:
+                count += _insert_rows(cursor, batch)
+                batch = []
+        if batch:
+            count += _insert_rows(cursor, batch)
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+    return count
+
+
+def _render_snippet(raw):
+    return (
+        escape(raw)
+        .replace(_MATCH_START, '<mark>')
+        .replace(_MATCH_END, '</mark>')
+    )
+
+
+def search_products(query, limit=20, in_stock_only=True):
+    """
+    Return up to ``limit`` SearchResult objects ordered by relevance.
+    Snippets are HTML-safe strings with matched terms wrapped in <mark>.
+    """
+    match = build_match_query(query)
+    if not match:
+        return []
+
+    if not search_enabled():
+        return icontains_search(query, limit=limit, in_stock_only=in_stock_only)
+
+    weights = ', '.join(str(w) for w in BM25_WEIGHTS)
+    stock_clause = 'AND p.available_stock > 0' if in_stock_only else ''
+    sql = (
+        f'SELECT {FTS_TABLE}.product_id, bm25({FTS_TABLE}, {weights}) AS score, '
+        f"snippet({FTS_TABLE}, -1, %s, %s, '…', 16) "
+        f'FROM {FTS_TABLE} '
+        f'JOIN products_product p ON p.product_id = {FTS_TABLE}.product_id '
+        f'WHERE {FTS_TABLE} MATCH %s {stock_clause} '
+        'ORDER BY score LIMIT %s'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [_MATCH_START, _MATCH_END, match, limit])
+        rows = cursor.fetchall()
+
+    products = Product.objects.select_related('brand', 'category').in_bulk(
+        [row[0] for row in rows]
+    )
+    by_hex = {pk.hex: product for pk, product in products.items()}
+    return [
+        SearchResult(by_hex[product_id], rank, _render_snippet(snippet))
+        for product_id, rank, snippet in rows
+        if product_id in by_hex
+    ]
+
+
+def icontains_search(query, limit=20, in_stock_only=True):
+    """
+    Unindexed ``icontains`` search matching the admin's search_fields.
+    Used as the fallback on non-SQLite databases and as the benchmark baseline.
+    """
+    products = Product.objects.select_related('brand', 'category')
+    if in_stock_only:
+        products = products.filter(available_stock__gt=0)
+    for token in _TOKEN_RE.findall(query or ''):
+        products = products.filter(
+            Q(product_name__icontains=token)
+            | Q(product_details__icontains=token)
+            | Q(brand__brand_name__icontains=token)
+            | Q(category__category_name__icontains=token)
+        )
+    return [SearchResult(product, None, '') for product in products[:limit]]
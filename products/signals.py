@@ -0,0 +1,82 @@
+"""
+Signal handlers that keep derived product data in sync with the catalog.
+"""
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import images, search
+from .fragments import invalidate_product_card
+from .models import Brand, Category, Product
+from .page_cache import bump_catalog_version
+
+
+@receiver(pre_save, sender=Product)
+def drop_product_card(sender, instance, raw=False, **kwargs):
+    """
+    Drop the cached card of the version being replaced. ``updated_at`` still
+    holds the old value here; auto_now only bumps it once saving starts.
+    """
+    if raw:
+        return
+    invalidate_product_card(instance)
+
+
+@receiver(post_delete, sender=Product)
+def drop_deleted_product_card(sender, instance, **kwargs):
+    """Drop the cached card of a deleted product."""
+    invalidate_product_card(instance)
+
+
+@receiver(post_save, sender=Product)
+def index_saved_product(sender, instance, raw=False, **kwargs):
+    """Refresh the search index row of a created or updated product."""
+    if raw:
+        return
+    search.index_product(instance)
+
+
+@receiver(post_save, sender=Product)
+def generate_image_derivatives(sender, instance, raw=False, **kwargs):
+    """Resize a newly uploaded product image into its srcset derivatives."""
+    if raw or not instance.product_image:
+        return
+    images.generate_derivatives_safely(instance.product_image.name)
+
+
+@receiver(post_delete, sender=Product)
+def unindex_deleted_product(sender, instance, **kwargs):
+    """Remove a deleted product from the search index."""
+    search.remove_product(instance.product_id)
+
+
+@receiver(post_save, sender=Brand)
+def reindex_brand_products(sender, instance, created, raw=False, **kwargs):
+    """Carry a brand rename over to the search index and cached product cards."""
+    if raw or created:
+        return
+    search.rename_brand(instance)
+    # Cached cards embed the brand name; moving updated_at retires them
+    Product.objects.filter(brand=instance).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_products(sender, instance, created, raw=False, **kwargs):
+    """Carry a category rename over to the search index and cached product cards."""
+    if raw or created:
+        return
+    search.rename_category(instance)
+    Product.objects.filter(category=instance).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Brand)
+@receiver(post_delete, sender=Brand)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def expire_cached_pages(sender, raw=False, **kwargs):
+    """Move anonymous page caching to a new catalog version."""
+    if raw:
+        return
+    bump_catalog_version()
@@ -0,0 +1,72 @@
+"""
+SQLite connection tuning.
+
+Every new SQLite connection gets the pragmas of the profile named by the
+``SQLITE_PROFILE`` setting, applied from the ``connection_created``
+signal. With ``CONN_MAX_AGE`` a connection is reused across requests, so
+the pragmas run once per connection rather than once per request.
+
+``tuned`` (the default) switches the database to WAL, so readers no
+longer wait for a writer to commit, relaxes fsyncs to ``synchronous =
+NORMAL`` (still safe against corruption in WAL mode; a power cut can drop
+the last commits) and starts every ``transaction.atomic()`` block with
+``BEGIN IMMEDIATE``. A deferred transaction that reads and then writes
+fails with "database is locked" straight away when another connection
+got the write lock first, whatever the busy timeout; an immediate one
+takes the write lock up front and waits for it for ``busy_timeout``.
+
+``stock`` is what Django and the sqlite3 module do out of the box, with
+the journal mode reset, for comparison (``manage.py bench_checkout``).
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+SQLITE_PROFILES = {
+    'stock': {
+        'pragmas': {
+            'journal_mode': 'DELETE',
+            'synchronous': 'FULL',
+            # The sqlite3 module's own default timeout
+            'busy_timeout': 5000,
+        },
+        'transaction_mode': None,
+    },
+    'tuned': {
+        'pragmas': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'busy_timeout': 5000,
+            'mmap_size': 256 * 1024 * 1024,
+            # Negative sizes are KiB: 64 MiB of page cache per connection
+            'cache_size': -64 * 1024,
+            'temp_store': 'MEMORY',
+        },
+        'transaction_mode': 'IMMEDIATE',
+    },
+}
+
+DEFAULT_SQLITE_PROFILE = 'tuned'
+
+
+def sqlite_profile():
+    """Return the name of the active profile, or None when tuning is off."""
+    return getattr(settings, 'SQLITE_PROFILE', DEFAULT_SQLITE_PROFILE)
+
+
+def apply_profile(connection, name):
+    """Apply the named profile to an open SQLite connection wrapper."""
+    profile = SQLITE_PROFILES[name]
+    # Run on the raw sqlite3 connection so the pragmas stay out of the
+    # query logs and per-request query counts
+    for pragma, value in profile['pragmas'].items():
+        connection.connection.execute(f'PRAGMA {pragma} = {value}')
+    connection.transaction_mode = profile['transaction_mode']
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    name = sqlite_profile()
+    if name and connection.vendor == 'sqlite':
+        apply_profile(connection, name)
@@ -0,0 +1,14 @@
+// Pages from the anonymous page cache are shared between visitors, so their
+// forms carry an empty CSRF field. Fill it from the csrftoken cookie (which
+// the page cache sets for every guest) when the form is submitted.
+document.addEventListener('submit', function (event) {
+    var field = event.target.querySelector('input[data-csrf-cookie]');
+    if (!field) {
+        return;
+    }
+    var name = field.getAttribute('data-csrf-cookie');
+    var match = document.cookie.match(new RegExp('(?:^|;\\s*)' + name + '=([^;]+)'));
+    if (match) {
+        field.value = decodeURIComponent(match[1]);
+    }
+});
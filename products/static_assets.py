@@ -0,0 +1,146 @@
+"""
+Hashed, precompressed static assets.
+
+``PrecompressedManifestStaticFilesStorage`` is Django's
+ManifestStaticFilesStorage (``collectstatic`` copies every file to a
+content-hashed name such as ``store.3f9a1c2b.css`` and ``{% static %}``
+links that name) that also writes ``.gz`` and, when the ``brotli`` package
+is installed, ``.br`` siblings of text assets at ``collectstatic`` time,
+so nothing is compressed per request.
+
+``static_asset_view`` serves ``STATIC_ROOT`` for deployments without a
+separate static file server: the brotli or gzip variant the client
+accepts, and ``Cache-Control: immutable`` for a year on hashed names,
+whose content never changes under that name.
+"""
+import gzip
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import (
+    ManifestStaticFilesStorage, StaticFilesStorage, staticfiles_storage,
+)
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.http import FileResponse, Http404
+from django.urls import re_path
+from django.utils._os import safe_join
+from django.views.decorators.http import require_safe
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+COMPRESSIBLE_EXTENSIONS = frozenset({'.css', '.js', '.mjs', '.map', '.json', '.svg', '.txt', '.xml', '.html'})
+
+# A variant must save at least this share of the bytes to be worth a file
+MIN_COMPRESSION_SAVING = 0.05
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+UNHASHED_CACHE_CONTROL = 'public, max-age=60'
+
+# ManifestStaticFilesStorage names: <root>.<12 hex digits of MD5><ext>
+HASHED_NAME_RE = re.compile(r'^(?P<root>.+)\.[0-9a-f]{12}(?P<ext>\.[^./]+)?$')
+
+# Preferred first
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def compress(data):
+    """Return ``{suffix: bytes}`` of the variants that make ``data`` smaller."""
+    variants = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(data, quality=11)
+    limit = len(data) * (1 - MIN_COMPRESSION_SAVING)
+    return {suffix: body for suffix, body in variants.items() if len(body) <= limit}
+
+
+class PrecompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """ManifestStaticFilesStorage that also stores gzip/brotli variants of hashed text files."""
+
+    def url(self, name, force=False):
+        # Until collectstatic has written a manifest (tests, a fresh
+        # checkout) link the plain names the staticfiles finders serve
+        if not self.hashed_files and not force:
+            return StaticFilesStorage.url(self, name)
+        return super().url(name, force)
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in set(self.hashed_files.values()):
+            if os.path.splitext(name)[1].lower() in COMPRESSIBLE_EXTENSIONS:
+                self._write_variants(name)
+
+    def _write_variants(self, name):
+        with self.open(name) as original:
+            data = original.read()
+        for suffix, body in compress(data).items():
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            self._save(name + suffix, ContentFile(body))
+
+
+def _accepted_encodings(header):
+    accepted = set()
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        match = re.search(r'q=(\d+(?:\.\d*)?)', params)
+        if coding and not (match and float(match.group(1)) == 0):
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def _is_hashed(path):
+    # Map the name back to its original and ask the manifest, instead of
+    # searching every hashed name on each request
+    match = HASHED_NAME_RE.match(path)
+    if not match:
+        return False
+    hashed_files = getattr(staticfiles_storage, 'hashed_files', {})
+    return hashed_files.get(match['root'] + (match['ext'] or '')) == path
+
+
+@require_safe
+def static_asset_view(request, path):
+    """Serve a collected static file, precompressed when the client allows it."""
+    if not settings.STATIC_ROOT:
+        raise Http404('STATIC_ROOT is not set.')
+    try:
+        full_path = safe_join(settings.STATIC_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404('Invalid path.')
+    if not os.path.isfile(full_path):
+        raise Http404('Not found.')
+
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+    accepted = _accepted_encodings(request.headers.get('Accept-Encoding', ''))
+    served, encoding = full_path, None
+    for coding, suffix in ENCODINGS:
+        if coding in accepted and os.path.isfile(full_path + suffix):
+            served, encoding = full_path + suffix, coding
+            break
+
+    response = FileResponse(
+        open(served, 'rb'), content_type=content_type, filename=os.path.basename(full_path)
+    )
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['Vary'] = 'Accept-Encoding'
+    response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL if _is_hashed(path) else UNHASHED_CACHE_CONTROL
+    return response
+
+
+def static_asset_urlpatterns():
+    """Route ``STATIC_URL`` to ``static_asset_view`` unless it points at another host."""
+    prefix = settings.STATIC_URL or ''
+    if not prefix or '://' in prefix or prefix.startswith('//'):
+        return []
+    return [
+        re_path(rf'^{re.escape(prefix.lstrip("/"))}(?P<path>.+)$', static_asset_view, name='static_asset'),
+    ]
@@ -0,0 +1,26 @@
+from django import template
+from django.conf import settings
+from django.middleware.csrf import get_token
+from django.utils.html import format_html
+
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def cached_page_csrf_token(context):
+    """
+    ``{% csrf_token %}`` for forms on pages the anonymous page cache shares.
+    Logged-in users get the usual token; guests get an empty field that
+    ``products/js/csrf.js`` fills from the CSRF cookie on submit, so no
+    visitor's token ends up in a cached page.
+    """
+    request = context['request']
+    if request.user.is_authenticated:
+        return format_html(
+            '<input type="hidden" name="csrfmiddlewaretoken" value="{}">', get_token(request)
+        )
+    return format_html(
+        '<input type="hidden" name="csrfmiddlewaretoken" value="" data-csrf-cookie="{}">',
+        settings.CSRF_COOKIE_NAME,
+    )
@@ -0,0 +1,15 @@
+from django import template
+
+from products.fragments import render_product_cards
+
+
+register = template.Library()
+
+
+@register.simple_tag
+def product_cards(products):
+    """
+    Return cached ProductCard fragments for ``products``; use as
+    ``{% product_cards products as cards %}``.
+    """
+    return render_product_cards(products)
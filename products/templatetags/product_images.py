@@ -0,0 +1,29 @@
+from django import template
+
+
+register = template.Library()
+
+# ``sizes`` hints matching the rendered width of each slot in the templates
+SLOT_SIZES = {
+    'thumb': '80px',
+    'card': '(max-width: 768px) 50vw, 300px',
+    'detail': '(max-width: 768px) 100vw, 600px',
+}
+
+
+@register.inclusion_tag('products/includes/product_image.html')
+def product_image(product, size='card', alt=None):
+    """
+    Render a <picture> for a product with WebP and JPEG srcsets.
+    Falls back to a plain <img> of the original (or external URL) when no
+    derivatives have been generated yet.
+    """
+    return {
+        'src': product.get_image_url(size),
+        'webp_srcset': product.get_image_srcset('webp'),
+        'jpeg_srcset': product.get_image_srcset('jpeg'),
+        'sizes': SLOT_SIZES.get(size, SLOT_SIZES['card']),
+        'alt': product.product_name if alt is None else alt,
+        # The detail image is the page's main content; don't defer it
+        'loading': 'eager' if size == 'detail' else 'lazy',
+    }
@@ -1,7 +1,56 @@
-from django.test import TestCase
+import builtins
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.templatetags.static import static
+from django.urls import resolve
+from django.db import connection, connections
+from django.db.models import Q, QuerySet
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.contrib.auth import get_user_model
 from decimal import Decimal
-from .models import Brand, Category, Product, Order, OrderItem
+from PIL import Image
+from asgiref.sync import iscoroutinefunction
+from prometheus_client import REGISTRY
+from .models import (
+    Brand, Category, CheckoutResult, CoPurchase, Product, Order, OrderItem, SalesDailyRollup,
+    StockReservation,
+)
+from .benchmarks import isolated_caches, percentile, rolled_back
+from .facets import FacetFilters, get_facets
+from .metrics import scrape_registry
+from .middleware import (
+    MetricsMiddleware, QueryInstrumentationMiddleware, ReplicaPinMiddleware, fingerprint,
+)
+from .sqlite import SQLITE_PROFILES
+from .page_cache import page_cache_stats
+from .pagination import DEFAULT_PAGE_SIZE, decode_cursor, encode_cursor, paginate_products
+from .recommendations import recommended_products, update_copurchases
+from .reservations import release_expired, reserve
+from .routers import CatalogReplicaRouter
+from .sales import monthly_totals, rebuild_rollups, top_sellers
+from . import images, search
+from .cart import get_cart_summary
+from .fragments import card_cache_key, render_product_cards
+from .guest_cart import GUEST_CART_COOKIE, merge_guest_cart
 
 User = get_user_model()
 
@@ -244,3 +293,2847 @@ class OrderItemModelTestCase(TestCase):
         # Price should be automatically set from product
         order_item.refresh_from_db()
         self.assertEqual(order_item.price_at_purchase, self.product.price)
+
+
+class HomePaginationTestCase(TestCase):
+    """Test cases for keyset pagination on the home view."""
+    
+    def setUp(self):
+        """Set up test data."""
+        self.brand = Brand.objects.create(brand_name="CeraVe")
+        self.other_brand = Brand.objects.create(brand_name="The Ordinary")
+        self.category = Category.objects.create(category_name="Moisturizers")
+        self.products = [
+            Product.objects.create(
+                product_name=f"Product {i}",
+                brand=self.brand if i % 2 else self.other_brand,
+                category=self.category,
+                product_details="Test",
+                price=Decimal("100.00"),
+                available_stock=10
+            )
+            for i in range(7)
+        ]
+    
+    def _walk_forward(self, page_size, **filters):
+        """Collect product ids by following next cursors from the first page."""
+        queryset = Product.objects.filter(available_stock__gt=0, **filters)
+        seen = []
+        page = paginate_products(queryset, page_size=page_size)
+        while True:
+            seen.extend(p.product_id for p in page)
+            if not page.has_next:
+                return seen, page
+            page = paginate_products(queryset, after=page.next_cursor, page_size=page_size)
+    
+    def test_pages_cover_catalog_in_order(self):
+        """Test following next cursors visits every product exactly once."""
+        seen, _ = self._walk_forward(page_size=3)
+        expected = list(
+            Product.objects.order_by('-created_at', '-product_id')
+            .values_list('product_id', flat=True)
+        )
+        self.assertEqual(seen, expected)
+    
+    def test_shared_timestamp_uses_product_id_tiebreaker(self):
+        """Test rows with identical created_at are neither skipped nor repeated."""
+        stamp = self.products[0].created_at
+        Product.objects.update(created_at=stamp)
+        seen, _ = self._walk_forward(page_size=2)
+        self.assertEqual(len(seen), 7)
+        self.assertEqual(len(set(seen)), 7)
+    
+    def test_previous_cursor_returns_prior_page(self):
+        """Test the previous cursor of page two yields page one."""
+        queryset = Product.objects.all()
+        first = paginate_products(queryset, page_size=3)
+        second = paginate_products(queryset, after=first.next_cursor, page_size=3)
+        back = paginate_products(queryset, before=second.previous_cursor, page_size=3)
+        self.assertEqual(
+            [p.product_id for p in back],
+            [p.product_id for p in first]
+        )
+        self.assertFalse(back.has_previous)
+        self.assertTrue(back.has_next)
+    
+    def test_filters_apply_across_pages(self):
+        """Test brand filter is respected on every page."""
+        seen, _ = self._walk_forward(page_size=2, brand=self.brand)
+        self.assertEqual(len(seen), 3)
+        self.assertEqual(
+            set(seen),
+            set(Product.objects.filter(brand=self.brand).values_list('product_id', flat=True))
+        )
+    
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        """Test a malformed cursor is ignored rather than raising."""
+        response = self.client.get('/', {'after': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.context['page'].has_previous)
+    
+    def test_home_view_links_keep_filters(self):
+        """Test next link carries the active brand filter."""
+        for i in range(DEFAULT_PAGE_SIZE):
+            Product.objects.create(
+                product_name=f"Extra {i}",
+                brand=self.brand,
+                category=self.category,
+                product_details="Test",
+                price=Decimal("100.00"),
+                available_stock=10
+            )
+        response = self.client.get('/', {'brand': str(self.brand.brand_id)})
+        page = response.context['page']
+        self.assertEqual(len(page), DEFAULT_PAGE_SIZE)
+        self.assertTrue(page.has_next)
+        self.assertContains(response, f"brand={self.brand.brand_id}")
+        self.assertContains(response, f"after={page.next_cursor}")
+
+
+class ProductSearchTestCase(TestCase):
+    """Test cases for the FTS5 product search index."""
+    
+    def setUp(self):
+        """Set up test data."""
+        self.brand = Brand.objects.create(brand_name="CeraVe")
+        self.category = Category.objects.create(category_name="Moisturizers")
+        self.named = Product.objects.create(
+            product_name="Hyaluronic Hydrating Serum",
+            brand=self.brand,
+            category=self.category,
+            product_details="<p>Lightweight serum for daily use.</p>",
+            price=Decimal("900.00"),
+            available_stock=10
+        )
+        self.described = Product.objects.create(
+            product_name="Daily Moisturizing Lotion",
+            brand=self.brand,
+            category=self.category,
+            product_details="<p>Contains <strong>hyaluronic</strong> acid &amp; ceramides.</p>",
+            price=Decimal("1200.00"),
+            available_stock=10
+        )
+    
+    def _ids(self, query):
+        return [result.product.product_id for result in search.search_products(query)]
+    
+    def test_name_match_ranks_above_details_match(self):
+        """Test BM25 weighting puts product-name matches first."""
+        self.assertEqual(self._ids("hyaluronic"), [self.named.product_id, self.described.product_id])
+    
+    def test_prefix_and_brand_matching(self):
+        """Test partial words and brand names match."""
+        self.assertEqual(len(self._ids("hydra")), 1)
+        self.assertEqual(len(self._ids("cerave")), 2)
+    
+    def test_snippet_is_html_stripped_and_highlighted(self):
+        """Test snippets drop markup and wrap matches in mark tags."""
+        results = search.search_products("ceramides")
+        self.assertEqual(len(results), 1)
+        self.assertIn("<mark>ceramides</mark>", results[0].snippet)
+        self.assertNotIn("<strong>", results[0].snippet)
+    
+    def test_query_operators_are_neutralised(self):
+        """Test FTS5 syntax in user input does not raise."""
+        self.assertEqual(search.search_products('"'), [])
+        self.assertEqual(len(self._ids('serum" -( *:')), 1)
+    
+    def test_index_follows_updates_and_deletes(self):
+        """Test signals keep the index in sync with product changes."""
+        self.named.product_name = "Niacinamide Booster"
+        self.named.save()
+        self.assertEqual(self._ids("niacinamide"), [self.named.product_id])
+        self.assertEqual(self._ids("hyaluronic"), [self.described.product_id])
+        
+        self.described.delete()
+        self.assertEqual(self._ids("hyaluronic"), [])
+    
+    def test_index_rows_are_replaced_by_rowid(self):
+        """Test saving a product finds its index row by rowid instead of scanning."""
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {search._DELETE_SQL}', [self.named.product_id.hex])
+            plan = ' | '.join(row[-1] for row in cursor.fetchall())
+        # FTS5 reports a rowid equality lookup as index string "="
+        self.assertIn(f'{search.FTS_TABLE} VIRTUAL TABLE INDEX 0:=', plan, plan)
+        self.assertIn(f'{search.KEY_TABLE}_1 (product_id=?)', plan, plan)
+    
+    def test_index_follows_brand_rename(self):
+        """Test renaming a brand updates its indexed products."""
+        self.brand.brand_name = "La Roche-Posay"
+        self.brand.save()
+        self.assertEqual(len(self._ids("roche")), 2)
+        self.assertEqual(self._ids("cerave"), [])
+    
+    def test_out_of_stock_products_are_excluded(self):
+        """Test search only returns products in stock."""
+        self.named.available_stock = 0
+        self.named.save()
+        self.assertEqual(self._ids("hyaluronic"), [self.described.product_id])
+    
+    def test_rebuild_command(self):
+        """Test the rebuild command restores a wiped index."""
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {search.FTS_TABLE}")
+        self.assertEqual(self._ids("serum"), [])
+        call_command("rebuild_search_index", stdout=StringIO())
+        self.assertEqual(self._ids("serum"), [self.named.product_id])
+    
+    def test_search_view(self):
+        """Test the search page renders ranked results."""
+        response = self.client.get('/search/', {'q': 'hyaluronic'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['results']), 2)
+        self.assertContains(response, "Hyaluronic Hydrating Serum")
+        
+        response = self.client.get('/search/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['results'], [])
+
+
+class OrderCheckoutTestCase(TestCase):
+    """Test cases for atomic order completion."""
+    
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(
+            email="test@example.com",
+            phone_number="01712345678",
+            first_name="John",
+            last_name="Doe",
+            house_number="123",
+            road_number="45",
+            postal_code="1234",
+            district="Dhaka",
+            password="testpass123"
+        )
+        self.brand = Brand.objects.create(brand_name="CeraVe")
+        self.category = Category.objects.create(category_name="Moisturizers")
+    
+    def _make_order(self, lines):
+        """Create a cart with one item per (stock, quantity) pair."""
+        order = Order.objects.create(user=self.user)
+        for i, (stock, quantity) in enumerate(lines):
+            product = Product.objects.create(
+                product_name=f"Product {i}",
+                brand=self.brand,
+                category=self.category,
+                product_details="Test",
+                price=Decimal("100.00"),
+                available_stock=stock
+            )
+            OrderItem.objects.create(
+                order=order,
+                product=product,
+                quantity=quantity,
+                price_at_purchase=product.price
+            )
+        return order
+    
+    def test_partial_shortage_rolls_back_everything(self):
+        """Test a single short line leaves every product's stock untouched."""
+        order = self._make_order([(10, 2), (1, 3), (5, 5)])
+        result = order.complete_order()
+        
+        self.assertFalse(result)
+        self.assertEqual(
+            [item.product.product_name for item in result.failed_items],
+            ["Product 1"]
+        )
+        self.assertEqual(result.failed_items[0].product.available_stock, 1)
+        self.assertEqual(
+            sorted(Product.objects.values_list('available_stock', flat=True)),
+            [1, 5, 10]
+        )
+        order.refresh_from_db()
+        self.assertTrue(order.in_cart)
+        self.assertIsNone(order.completed_at)
+    
+    def test_exact_stock_is_fulfilled(self):
+        """Test ordering the last units succeeds and empties stock."""
+        order = self._make_order([(3, 3), (4, 1)])
+        self.assertTrue(order.complete_order())
+        self.assertEqual(
+            sorted(Product.objects.values_list('available_stock', flat=True)),
+            [0, 3]
+        )
+    
+    def test_competing_order_cannot_oversell(self):
+        """Test a second cart for the same units fails once stock is claimed."""
+        first = self._make_order([(5, 4)])
+        product = first.items.get().product
+        other_user = User.objects.create_user(
+            email="other@example.com",
+            phone_number="01712345679",
+            first_name="Jane",
+            last_name="Doe",
+            house_number="1",
+            road_number="2",
+            postal_code="1234",
+            district="Dhaka",
+            password="testpass123"
+        )
+        second = Order.objects.create(user=other_user)
+        OrderItem.objects.create(order=second, product=product, quantity=4)
+        
+        self.assertTrue(first.complete_order())
+        self.assertFalse(second.complete_order())
+        product.refresh_from_db()
+        self.assertEqual(product.available_stock, 1)
+    
+    def test_order_cannot_be_completed_twice(self):
+        """Test a stale instance does not decrement stock a second time."""
+        order = self._make_order([(10, 2)])
+        stale = Order.objects.get(pk=order.pk)
+        self.assertEqual(order.complete_order().reason, 'completed')
+        result = stale.complete_order()
+        self.assertFalse(result)
+        self.assertEqual(result.reason, 'not_in_cart')
+        self.assertEqual(Product.objects.get().available_stock, 8)
+    
+    def test_query_count_is_independent_of_cart_size(self):
+        """Test completing a 20-line cart costs the same queries as 1 line."""
+        small = self._make_order([(10, 1)])
+        large = self._make_order([(10, 1)] * 20)
+        
+        with CaptureQueriesContext(connection) as small_queries:
+            self.assertTrue(small.complete_order())
+        with self.assertNumQueries(len(small_queries)):
+            self.assertTrue(large.complete_order())
+    
+    def test_checkout_view_reports_short_lines(self):
+        """Test checkout lists the products that are short on stock."""
+        order = self._make_order([(1, 2)])
+        self.client.force_login(self.user)
+        response = self.client.post('/checkout/', {
+            'first_name': 'John',
+            'last_name': 'Doe',
+            'phone_number': '01712345678',
+            'house_number': '123',
+            'road_number': '45',
+            'postal_code': '1234',
+            'district': 'Dhaka',
+        }, follow=True)
+        self.assertRedirects(response, '/cart/')
+        self.assertContains(response, "Product 0 (only 1 left)")
+        order.refresh_from_db()
+        self.assertTrue(order.in_cart)
+    
+    def test_checkout_view_reports_an_already_placed_order(self):
+        """Test a cart completed by another request is not reported as out of stock."""
+        self._make_order([(10, 2)])
+        self.client.force_login(self.user)
+        already_placed = CheckoutResult(False, reason='not_in_cart')
+        with mock.patch.object(Order, 'complete_order', return_value=already_placed):
+            response = self.client.post('/checkout/', {
+                'first_name': 'John',
+                'last_name': 'Doe',
+                'phone_number': '01712345678',
+                'house_number': '123',
+                'road_number': '45',
+                'postal_code': '1234',
+                'district': 'Dhaka',
+            }, follow=True)
+        self.assertContains(response, "This order has already been placed or is no longer in your cart.")
+        self.assertNotContains(response, "Not enough stock")
+
+
+class CartSummaryTestCase(TestCase):
+    """Test cases for the cached cart summary context processor."""
+    
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        self.user = User.objects.create_user(
+            email="test@example.com",
+            phone_number="01712345678",
+            first_name="John",
+            last_name="Doe",
+            house_number="123",
+            road_number="45",
+            postal_code="1234",
+            district="Dhaka",
+            password="testpass123"
+        )
+        self.brand = Brand.objects.create(brand_name="CeraVe")
+        self.category = Category.objects.create(category_name="Moisturizers")
+        self.product = Product.objects.create(
+            product_name="Test Product",
+            brand=self.brand,
+            category=self.category,
+            product_details="Test",
+            price=Decimal("250.00"),
+            available_stock=50
+        )
+        self.client.force_login(self.user)
+    
+    def test_summary_is_served_from_cache(self):
+        """Test the summary costs one query on a miss and none on a hit."""
+        order = Order.objects.create(user=self.user)
+        OrderItem.objects.create(order=order, product=self.product, quantity=3)
+        
+        with self.assertNumQueries(1):
+            summary = get_cart_summary(self.user)
+        self.assertEqual(summary['item_count'], 3)
+        self.assertEqual(summary['total_price'], Decimal("750.00"))
+        with self.assertNumQueries(0):
+            get_cart_summary(self.user)
+    
+    def test_cart_mutations_invalidate_summary(self):
+        """Test add, update, remove and checkout refresh the header badge."""
+        self.client.post(f'/cart/add/{self.product.product_id}/', {'quantity': 2})
+        self.assertEqual(get_cart_summary(self.user)['item_count'], 2)
+        
+        item = OrderItem.objects.get()
+        self.client.post(f'/cart/item/{item.order_item_id}/update/', {'quantity': 5})
+        self.assertEqual(get_cart_summary(self.user)['item_count'], 5)
+        
+        self.assertTrue(item.order.complete_order())
+        self.assertEqual(get_cart_summary(self.user)['item_count'], 0)
+        
+        self.client.post(f'/cart/add/{self.product.product_id}/', {'quantity': 1})
+        item = OrderItem.objects.get(order__in_cart=True)
+        self.assertEqual(get_cart_summary(self.user)['item_count'], 1)
+        self.client.post(f'/cart/item/{item.order_item_id}/remove/')
+        self.assertEqual(get_cart_summary(self.user)['item_count'], 0)
+    
+    def test_badge_rendered_on_every_page(self):
+        """Test cart and checkout pages show the item count too."""
+        self.client.post(f'/cart/add/{self.product.product_id}/', {'quantity': 4})
+        for url in ('/', f'/product/{self.product.product_id}/', '/cart/', '/checkout/'):
+            response = self.client.get(url)
+            self.assertContains(response, "Cart (4)", msg_prefix=url)
+    
+    def test_anonymous_summary_is_empty(self):
+        """Test anonymous users get an empty summary without queries."""
+        self.client.logout()
+        response = self.client.get('/')
+        self.assertEqual(response.context['cart_summary']['item_count'], 0)
+
+
+class ProductImageDerivativeTestCase(TestCase):
+    """Test cases for responsive image derivatives."""
+    
+    def setUp(self):
+        """Set up test data in a throwaway media root."""
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        images._ready.clear()
+        images._missing.clear()
+        self.addCleanup(images._ready.clear)
+        self.addCleanup(images._missing.clear)
+        
+        self.brand = Brand.objects.create(brand_name="CeraVe")
+        self.category = Category.objects.create(category_name="Moisturizers")
+    
+    def _upload(self, width=1600, height=1200, mode='RGB'):
+        buffer = BytesIO()
+        Image.new(mode, (width, height), (200, 100, 50)).save(buffer, format='PNG')
+        return Product.objects.create(
+            product_name="Imaged Product",
+            product_image=SimpleUploadedFile("photo.png", buffer.getvalue(), content_type="image/png"),
+            brand=self.brand,
+            category=self.category,
+            product_details="Test",
+            price=Decimal("100.00"),
+            available_stock=5
+        )
+    
+    def test_derivatives_generated_on_save(self):
+        """Test saving an upload writes every size in WebP and JPEG."""
+        product = self._upload(mode='RGBA')
+        name = product.product_image.name
+        for size, width in images.IMAGE_SIZES.items():
+            for fmt in images.IMAGE_FORMATS:
+                path = default_storage.path(images.derivative_name(name, size, fmt))
+                with Image.open(path) as derivative:
+                    self.assertEqual(derivative.width, width)
+                    self.assertEqual(derivative.format, fmt.upper())
+    
+    def test_small_images_are_not_upscaled(self):
+        """Test derivatives never exceed the original width."""
+        product = self._upload(width=300, height=200)
+        path = default_storage.path(
+            images.derivative_name(product.product_image.name, 'detail', 'jpeg')
+        )
+        with Image.open(path) as derivative:
+            self.assertEqual(derivative.size, (300, 200))
+    
+    def test_srcset_leaves_out_widths_the_original_lacks(self):
+        """Test a narrow original only offers the widths it really has."""
+        product = self._upload(width=300, height=200)
+        name = product.product_image.name
+        expected = (
+            f'{default_storage.url(images.derivative_name(name, "thumb", "webp"))} 160w, '
+            f'{default_storage.url(images.derivative_name(name, "card", "webp"))} 300w'
+        )
+        self.assertEqual(product.get_image_srcset('webp'), expected)
+        # Another process learns the width from the stored marker
+        images._ready.clear()
+        self.assertEqual(product.get_image_srcset('webp'), expected)
+        self.assertEqual(images._ready[name], 300)
+    
+    def test_remembered_images_are_bounded(self):
+        """Test the per-process lookups drop their oldest entries."""
+        with mock.patch.object(images._missing, 'maxsize', 2):
+            for name in ('a.png', 'b.png', 'c.png'):
+                self.assertFalse(images.has_derivatives(name))
+            self.assertEqual(list(images._missing), ['b.png', 'c.png'])
+    
+    def test_size_aware_urls_and_srcset(self):
+        """Test get_image_url(size) and srcset point at the derivatives."""
+        product = self._upload()
+        self.assertTrue(product.get_image_url('card').endswith('-480w.jpg'))
+        self.assertTrue(product.get_image_url('thumb', 'webp').endswith('-160w.webp'))
+        self.assertEqual(product.get_image_url(), product.product_image.url)
+        self.assertIn('-1000w.webp 1000w', product.get_image_srcset('webp'))
+        
+        response = self.client.get('/')
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, '-480w.jpg 480w')
+    
+    def test_missing_derivatives_fall_back_to_original(self):
+        """Test products without derivatives keep serving the original."""
+        product = self._upload()
+        shutil.rmtree(default_storage.path('products/images/derivatives'))
+        images._ready.clear()
+        self.assertEqual(product.get_image_url('card'), product.product_image.url)
+        self.assertEqual(product.get_image_srcset(), '')
+    
+    def test_backfill_command(self):
+        """Test the backfill command regenerates removed derivatives."""
+        product = self._upload()
+        shutil.rmtree(default_storage.path('products/images/derivatives'))
+        images._ready.clear()
+        call_command('generate_image_derivatives', workers=1, stdout=StringIO())
+        self.assertTrue(images.has_derivatives(product.product_image.name))
+    
+    def test_missing_derivatives_are_remembered_until_generated(self):
+        """Test a miss is not rechecked against storage on every render."""
+        product = self._upload()
+        name = product.product_image.name
+        shutil.rmtree(default_storage.path('products/images/derivatives'))
+        images._ready.clear()
+        
+        with mock.patch.object(default_storage, 'exists', wraps=default_storage.exists) as exists:
+            for _ in range(5):
+                self.assertFalse(images.has_derivatives(name))
+            self.assertEqual(exists.call_count, 1)
+        
+        images.generate_derivatives(name)
+        self.assertTrue(images.has_derivatives(name))
+        self.assertTrue(product.get_image_url('card').endswith('-480w.jpg'))
+    
+    def test_missing_derivatives_are_rechecked_later(self):
+        """Test derivatives written by another process are found after the recheck time."""
+        product = self._upload()
+        name = product.product_image.name
+        images._ready.clear()
+        images._missing[name] = time.monotonic() + images.MISSING_RECHECK_SECONDS
+        self.assertFalse(images.has_derivatives(name))
+        
+        images._missing[name] = time.monotonic() - 1
+        self.assertTrue(images.has_derivatives(name))
+        self.assertNotIn(name, images._missing)
+
+
+class ProductCardFragmentTestCase(TestCase):
+    """Test cases for cached product-card fragments."""
+    
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        self.brand = Brand.objects.create(brand_name="CeraVe")
+        self.category = Category.objects.create(category_name="Moisturizers")
+        self.product = Product.objects.create(
+            product_name="Hydrating Cleanser",
+            brand=self.brand,
+            category=self.category,
+            product_details="Test",
+            price=Decimal("800.00"),
+            available_stock=20,
+            featured=True
+        )
+    
+    def _cards(self):
+        return render_product_cards(Product.objects.select_related('brand', 'category'))
+    
+    def test_cards_are_served_from_cache(self):
+        """Test a second render reuses the cached HTML."""
+        first = self._cards()
+        self.assertIn("Hydrating Cleanser", first[0].html)
+        self.assertIsNotNone(cache.get(card_cache_key(self.product)))
+        
+        with mock.patch('django.template.backends.django.Template.render') as render:
+            second = self._cards()
+        render.assert_not_called()
+        self.assertEqual(second[0].html, first[0].html)
+    
+    def test_saving_product_replaces_card(self):
+        """Test saving drops the old fragment and renders the new version."""
+        self._cards()
+        old_key = card_cache_key(self.product)
+        self.product.product_name = "Foaming Cleanser"
+        self.product.save()
+        
+        self.assertIsNone(cache.get(old_key))
+        self.assertIn("Foaming Cleanser", self._cards()[0].html)
+    
+    def test_brand_rename_refreshes_cards(self):
+        """Test renaming a brand retires cards that embed the old name."""
+        self._cards()
+        self.brand.brand_name = "La Roche-Posay"
+        self.brand.save()
+        self.assertIn("La Roche-Posay", self._cards()[0].html)
+    
+    def test_checkout_refreshes_stock_status(self):
+        """Test stock decrements move the card to a new version."""
+        self._cards()
+        Product.objects.filter(pk=self.product.pk).update(available_stock=3, updated_at=timezone.now())
+        self.assertIn("Low Stock (3 left)", self._cards()[0].html)
+    
+    def test_home_renders_cards_and_actions(self):
+        """Test home shows the cached card and per-user actions."""
+        response = self.client.get('/')
+        self.assertContains(response, "Hydrating Cleanser", count=2)
+        self.assertContains(response, f'action="/cart/add/{self.product.product_id}/"', count=2)
+        # The shared cached page carries an empty token field, filled from the cookie
+        self.assertContains(response, 'value="" data-csrf-cookie="csrftoken"', count=2)
+    
+    @override_settings(PRODUCT_CARD_CACHE=False)
+    def test_cache_can_be_disabled(self):
+        """Test the setting bypasses the cache entirely."""
+        self._cards()
+        self.assertIsNone(cache.get(card_cache_key(self.product)))
+
+
+class AdminChangelistQueryTestCase(TestCase):
+    """Test cases pinning admin changelists to a constant query count."""
+    
+    CHANGELISTS = (
+        '/admin/products/brand/',
+        '/admin/products/category/',
+        '/admin/products/product/',
+        '/admin/products/order/',
+        '/admin/products/orderitem/',
+    )
+    
+    def setUp(self):
+        """Set up an admin user."""
+        self.admin = User.objects.create_superuser(
+            email="admin@example.com",
+            phone_number="01700000000",
+            first_name="Admin",
+            last_name="User",
+            house_number="1",
+            road_number="1",
+            postal_code="1000",
+            district="Dhaka",
+            password="adminpass123"
+        )
+        self.client.force_login(self.admin)
+        self.seeded = 0
+    
+    def _seed(self, count):
+        """Add ``count`` brands, categories, products, carts and order items."""
+        for i in range(self.seeded, self.seeded + count):
+            brand = Brand.objects.create(brand_name=f"Brand {i}")
+            category = Category.objects.create(category_name=f"Category {i}")
+            product = Product.objects.create(
+                product_name=f"Product {i}",
+                brand=brand,
+                category=category,
+                product_details="Test",
+                price=Decimal("100.00"),
+                available_stock=10
+            )
+            user = User.objects.create_user(
+                email=f"customer{i}@example.com",
+                phone_number=f"018{i:08d}",
+                first_name="Customer",
+                last_name=str(i),
+                house_number="1",
+                road_number="1",
+                postal_code="1000",
+                district="Dhaka"
+            )
+            order = Order.objects.create(user=user, in_cart=bool(i % 2))
+            OrderItem.objects.create(order=order, product=product, quantity=2)
+        self.seeded += count
+    
+    def _query_counts(self):
+        counts = {}
+        for url in self.CHANGELISTS:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            counts[url] = len(queries)
+        return counts
+    
+    def test_query_count_does_not_grow_with_rows(self):
+        """Test 3-row and 30-row changelists cost the same queries."""
+        self._seed(3)
+        small = self._query_counts()
+        self._seed(27)
+        self.assertEqual(self._query_counts(), small)
+    
+    def test_annotated_columns(self):
+        """Test annotated totals render and are sortable."""
+        self._seed(2)
+        order = Order.objects.first()
+        OrderItem.objects.create(
+            order=order,
+            product=Product.objects.exclude(order_items__order=order).first(),
+            quantity=3,
+            price_at_purchase=Decimal("50.00")
+        )
+        response = self.client.get('/admin/products/order/', {'o': '4'})
+        self.assertContains(response, "৳350.00")
+        response = self.client.get('/admin/products/brand/', {'o': '-2'})
+        self.assertContains(response, "1 product")
+        response = self.client.get('/admin/products/order/', {'o': '-5'})
+        self.assertEqual(response.status_code, 200)
+    
+    def test_complete_orders_reports_failures_separately(self):
+        """Test the action tells already completed orders apart from stock shortages."""
+        self._seed(4)
+        Product.objects.filter(product_name="Product 3").update(available_stock=1)
+        response = self.client.post('/admin/products/order/', {
+            'action': 'complete_orders',
+            '_selected_action': [str(pk) for pk in Order.objects.values_list('pk', flat=True)],
+        }, follow=True)
+        messages = [(m.level_tag, m.message) for m in response.context['messages']]
+        
+        self.assertEqual(messages[0], ('info', '1 order(s) completed successfully.'))
+        self.assertEqual(messages[1][0], 'warning')
+        self.assertIn('2 order(s) were already completed', messages[1][1])
+        self.assertEqual(messages[2][0], 'error')
+        self.assertIn('1 order(s) failed due to insufficient stock', messages[2][1])
+        self.assertIn('(Product 3)', messages[2][1])
+        self.assertNotIn('already completed', messages[2][1])
+
+
+class StorefrontQueryBudgetTestCase(TestCase):
+    """
+    Pin every storefront view to an exact query count on a seeded catalog
+    and check that the hot lookups use the storefront indexes.
+    """
+    
+    @classmethod
+    def setUpTestData(cls):
+        """Seed a catalog and a user with a five-line cart."""
+        cls.user = User.objects.create_user(
+            email="test@example.com",
+            phone_number="01712345678",
+            first_name="John",
+            last_name="Doe",
+            house_number="123",
+            road_number="45",
+            postal_code="1234",
+            district="Dhaka",
+            password="testpass123"
+        )
+        cls.brands = [Brand.objects.create(brand_name=f"Brand {i}") for i in range(3)]
+        cls.categories = [Category.objects.create(category_name=f"Category {i}") for i in range(3)]
+        cls.products = [
+            Product.objects.create(
+                product_name=f"Product {i}",
+                brand=cls.brands[i % 3],
+                category=cls.categories[i % 3],
+                product_details="<p>Seeded product</p>",
+                price=Decimal("100.00"),
+                available_stock=0 if i % 10 == 0 else 50,
+                featured=i % 4 == 0
+            )
+            for i in range(90)
+        ]
+        cls.cart = Order.objects.create(user=cls.user)
+        cls.items = [
+            OrderItem.objects.create(order=cls.cart, product=product, quantity=1)
+            for product in cls.products[1:6]
+        ]
+        for item in cls.items:
+            reserve(cls.cart.pk, item.product_id, item.quantity)
+    
+    def setUp(self):
+        """Start every request with cold caches."""
+        cache.clear()
+    
+    def _login(self):
+        self.client.force_login(self.user)
+    
+    def test_home_anonymous(self):
+        """Test anonymous home: products page, featured, brand and category facets."""
+        with self.assertNumQueries(4):
+            response = self.client.get('/')
+        self.assertEqual(response.status_code, 200)
+    
+    def test_home_filtered_deep_page(self):
+        """Test a filtered later page: products page; facet counts are cached."""
+        brand = str(self.brands[0].brand_id)
+        first = self.client.get('/', {'brand': brand})
+        with self.assertNumQueries(1):
+            response = self.client.get('/', {'brand': brand, 'after': first.context['page'].next_cursor})
+        self.assertEqual(response.status_code, 200)
+    
+    def test_home_authenticated(self):
+        """Test authenticated home adds session, user and the cart summary."""
+        self._login()
+        with self.assertNumQueries(7):
+            self.client.get('/')
+    
+    def test_product_detail(self):
+        """Test product detail without co-purchase data: product, co-purchases, category fallback."""
+        with self.assertNumQueries(3):
+            self.client.get(f'/product/{self.products[1].product_id}/')
+    
+    def test_search(self):
+        """Test search: FTS match, then the matched products."""
+        with self.assertNumQueries(2):
+            self.client.get('/search/', {'q': 'seeded'})
+    
+    def test_cart(self):
+        """Test cart: session, user, cart, items with products, cart summary."""
+        self._login()
+        with self.assertNumQueries(5):
+            self.client.get('/cart/')
+    
+    def test_add_to_cart(self):
+        """Test add-to-cart: cart, then locked line get_or_create (own savepoint) and hold in one savepoint."""
+        self._login()
+        with self.assertNumQueries(13):
+            self.client.post(f'/cart/add/{self.products[11].product_id}/', {'quantity': 1})
+    
+    def test_update_cart_item(self):
+        """Test cart line update: hold lookup, stock and hold updates, line save."""
+        self._login()
+        with self.assertNumQueries(9):
+            self.client.post(f'/cart/item/{self.items[0].order_item_id}/update/', {'quantity': 2})
+    
+    def test_remove_cart_item(self):
+        """Test cart line removal: line delete, hold lookup, delete and release."""
+        self._login()
+        with self.assertNumQueries(9):
+            self.client.post(f'/cart/item/{self.items[0].order_item_id}/remove/')
+    
+    def test_checkout_form(self):
+        """Test checkout form query budget."""
+        self._login()
+        with self.assertNumQueries(6):
+            self.client.get('/checkout/')
+    
+    def test_checkout_submit(self):
+        """Test placing an order: adds the hold lookup, hold delete and sales rollup upsert."""
+        self._login()
+        with self.assertNumQueries(14):
+            response = self.client.post('/checkout/', {
+                'first_name': 'John',
+                'last_name': 'Doe',
+                'phone_number': '01712345678',
+                'house_number': '123',
+                'road_number': '45',
+                'postal_code': '1234',
+                'district': 'Dhaka',
+            })
+        self.assertRedirects(response, '/', fetch_redirect_response=False)
+    
+    def _plan(self, queryset):
+        return queryset.explain()
+    
+    def test_listing_queries_use_indexes(self):
+        """Test EXPLAIN QUERY PLAN picks the storefront indexes."""
+        in_stock = Product.objects.filter(available_stock__gt=0)
+        page = paginate_products(in_stock, page_size=5)
+        after = decode_cursor(page.next_cursor)
+        
+        plans = {
+            'product_instock_recent_idx': in_stock.order_by('-created_at', '-product_id')[:25],
+            'product_featured_recent_idx': in_stock.filter(featured=True)[:6],
+            'product_brand_instock_idx': in_stock.filter(brand=self.brands[0]).order_by('-created_at', '-product_id')[:25],
+            'product_category_instock_idx': in_stock.filter(category=self.categories[0]).exclude(
+                product_id=self.products[0].product_id
+            )[:4],
+            'order_open_cart_idx': Order.objects.filter(user=self.user, in_cart=True),
+        }
+        for index, queryset in plans.items():
+            plan = self._plan(queryset)
+            self.assertIn(index, plan, f"{index} not used:\n{plan}")
+            self.assertNotIn('TEMP B-TREE', plan, plan)
+        
+        deep = in_stock.filter(created_at__lte=after[0]).filter(
+            Q(created_at__lt=after[0]) | Q(product_id__lt=after[1])
+        ).order_by('-created_at', '-product_id')[:25]
+        plan = self._plan(deep)
+        self.assertIn('product_instock_recent_idx (created_at<?)', plan, plan)
+
+
+class BenchHarnessTestCase(TestCase):
+    """Test cases for the plumbing shared by the bench_* commands."""
+    
+    def test_isolated_caches_leave_the_configured_cache_alone(self):
+        """Test a benchmark neither sees nor clears the site's cache."""
+        cache.set('site-key', 'kept')
+        with isolated_caches():
+            self.assertIsNone(cache.get('site-key'))
+            cache.set('bench-key', 'dropped')
+            cache.clear()
+        self.assertEqual(cache.get('site-key'), 'kept')
+        self.assertIsNone(cache.get('bench-key'))
+    
+    def test_rolled_back_unless_kept(self):
+        """Test seeded rows disappear unless keep is set."""
+        with rolled_back():
+            Brand.objects.create(brand_name="Rolled Back")
+        with rolled_back(keep=True):
+            Brand.objects.create(brand_name="Kept")
+        self.assertEqual(list(Brand.objects.values_list('brand_name', flat=True)), ["Kept"])
+    
+    def test_percentile(self):
+        """Test nearest-rank percentiles of a sorted list."""
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([], 95), 0.0)
+
+
+class BenchStoreCommandTestCase(TestCase):
+    """Test cases for the bench_store management command."""
+    
+    def test_reports_every_view_and_cleans_up(self):
+        """Test a tiny run reports stats per view and leaves no data behind."""
+        cache.set('site-key', 'kept')
+        out = StringIO()
+        call_command(
+            'bench_store', products=30, users=3, carts=2, orders=5,
+            requests=3, stdout=out
+        )
+        report = json.loads(out.getvalue())
+        # The run used its own caches
+        self.assertEqual(cache.get('site-key'), 'kept')
+        
+        self.assertEqual(report['config']['products'], 30)
+        self.assertIn('home_view (anonymous)', report['views'])
+        self.assertIn('checkout_view (POST)', report['views'])
+        for name, stats in report['views'].items():
+            self.assertEqual(stats['requests'], 3)
+            self.assertLessEqual(stats['p50_ms'], stats['p99_ms'])
+            if 'anonymous' not in name and name != 'product_detail_view':
+                self.assertGreater(stats['queries_max'], 0)
+        # Anonymous home is served from the page cache after the warm-up
+        self.assertEqual(report['views']['home_view (anonymous)']['page_cache_hits'], 3)
+        self.assertEqual(report['views']['home_view (anonymous)']['queries_max'], 0)
+        self.assertEqual(report['views']['checkout_view (POST)']['status_codes'], {'302': 3})
+        self.assertFalse(Product.objects.exists())
+        self.assertFalse(User.objects.exists())
+
+
+class CatalogImportExportTestCase(TestCase):
+    """Test cases for the import_catalog and export_catalog commands."""
+    
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.brand = Brand.objects.create(brand_name="CeraVe")
+        self.category = Category.objects.create(category_name="Moisturizers")
+        self.product = Product.objects.create(
+            product_name="Moisturizing Cream",
+            brand=self.brand,
+            category=self.category,
+            product_details="<p>Rich cream</p>",
+            price=Decimal("1200.00"),
+            available_stock=5
+        )
+    
+    def _path(self, name):
+        return f"{self.tmpdir}/{name}"
+    
+    def _write(self, name, text):
+        path = self._path(name)
+        with open(path, 'w', encoding='utf-8') as handle:
+            handle.write(text)
+        return path
+    
+    def _import(self, path, **options):
+        out, err = StringIO(), StringIO()
+        call_command('import_catalog', path, stdout=out, stderr=err, **options)
+        return out.getvalue(), err.getvalue()
+    
+    def test_csv_import_creates_products_brands_and_categories(self):
+        """Test a CSV import creates rows, new brands and categories in bulk."""
+        path = self._write('feed.csv', (
+            "product_name,brand,category,product_details,price,available_stock,featured\n"
+            "Hydrating Serum,The Ordinary,Serums,<b>Hyaluronic</b> serum,850.00,10,yes\n"
+            "Night Cream,CeraVe,Moisturizers,Overnight repair,1500,0,\n"
+            "Bad Price,CeraVe,Moisturizers,,free,1,\n"
+        ))
+        with CaptureQueriesContext(connection) as captured:
+            out, err = self._import(path)
+        
+        self.assertIn('2 created, 0 updated', out)
+        self.assertIn('line 4: invalid price', err)
+        serum = Product.objects.get(product_name="Hydrating Serum")
+        self.assertEqual(serum.brand.brand_name, "The Ordinary")
+        self.assertEqual(serum.category.category_name, "Serums")
+        self.assertTrue(serum.featured)
+        self.assertEqual(Brand.objects.count(), 2)
+        self.assertEqual(Category.objects.count(), 2)
+        self.assertEqual(
+            [result.product for result in search.search_products("hyaluronic")], [serum]
+        )
+        # Name caches, one product INSERT and no per-row lookups
+        self.assertLess(len(captured), 15)
+    
+    def test_jsonl_import_updates_existing_products(self):
+        """Test rows carrying a known product_id update it in place."""
+        before = self.product.updated_at
+        path = self._write('feed.jsonl', "\n".join([
+            json.dumps({
+                "product_id": str(self.product.product_id),
+                "product_name": "Moisturizing Cream XL",
+                "brand": "CeraVe",
+                "category": "Moisturizers",
+                "price": "1400.00",
+                "available_stock": 8,
+                "featured": True,
+            }),
+            "not json",
+        ]) + "\n")
+        out, err = self._import(path)
+        
+        self.assertIn('0 created, 1 updated', out)
+        self.assertIn('line 2: invalid JSON', err)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.product_name, "Moisturizing Cream XL")
+        self.assertEqual(self.product.price, Decimal("1400.00"))
+        self.assertEqual(self.product.available_stock, 8)
+        self.assertGreater(self.product.updated_at, before)
+        self.assertEqual(Product.objects.count(), 1)
+        self.assertEqual(
+            [result.product for result in search.search_products("XL")], [self.product]
+        )
+    
+    def test_batches_commit_separately(self):
+        """Test a large import is written in several batches."""
+        rows = "".join(
+            f"Product {i},CeraVe,Moisturizers,,100,1\n" for i in range(25)
+        )
+        path = self._write(
+            'feed.csv', "product_name,brand,category,product_details,price,available_stock\n" + rows
+        )
+        out, _ = self._import(path, batch_size=10)
+        
+        self.assertEqual(out.count('row(s) read'), 3)
+        self.assertEqual(Product.objects.count(), 26)
+    
+    def test_export_round_trips_through_import(self):
+        """Test an exported file re-imports as updates without duplicates."""
+        for fmt in ('csv', 'jsonl'):
+            path = self._path(f'catalog.{fmt}')
+            call_command('export_catalog', path, stdout=StringIO())
+            out, err = self._import(path)
+            
+            self.assertIn('0 created, 1 updated', out)
+            self.assertEqual(err, '')
+            self.assertEqual(Product.objects.count(), 1)
+        
+        with open(self._path('catalog.jsonl'), encoding='utf-8') as handle:
+            row = json.loads(handle.readline())
+        self.assertEqual(row['product_id'], str(self.product.product_id))
+        self.assertEqual(row['brand'], "CeraVe")
+        self.assertEqual(row['price'], "1200.00")
+    
+    def test_out_of_range_values_skip_the_row(self):
+        """Test rows the database could not store are skipped, not fatal."""
+        long_name = "x" * 256
+        path = self._write('feed.csv', (
+            "product_name,brand,category,product_details,price,available_stock\n"
+            "Good Serum,CeraVe,Moisturizers,,100,1\n"
+            "Not A Number,CeraVe,Moisturizers,,NaN,1\n"
+            "Infinite,CeraVe,Moisturizers,,Infinity,1\n"
+            "Too Dear,CeraVe,Moisturizers,,100000000,1\n"
+            "Huge,CeraVe,Moisturizers,,1e40,1\n"
+            "Overstocked,CeraVe,Moisturizers,,100,99999999999999999999\n"
+            f"{long_name},CeraVe,Moisturizers,,100,1\n"
+            f"Long Brand,{long_name},Moisturizers,,100,1\n"
+            "Rounded,CeraVe,Moisturizers,,9.999,1\n"
+        ))
+        out, err = self._import(path, batch_size=2)
+        
+        self.assertIn('2 created, 0 updated', out)
+        for line in (3, 4):
+            self.assertIn(f'line {line}: invalid price', err)
+        for line in (5, 6):
+            self.assertIn(f'line {line}: price must be below 100000000', err)
+        self.assertIn('line 7: available_stock cannot exceed', err)
+        self.assertIn('line 8: product_name is longer than 255 characters', err)
+        self.assertIn('line 9: brand is longer than 100 characters', err)
+        self.assertEqual(Product.objects.get(product_name="Rounded").price, Decimal("10.00"))
+    
+    def test_unknown_extension_requires_format(self):
+        """Test a file without a recognised extension needs --format."""
+        with self.assertRaises(CommandError):
+            self._import(self._write('feed.txt', ''))
+
+
+class StockReservationTestCase(TestCase):
+    """Test cases for cart stock reservations."""
+    
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(
+            email="test@example.com",
+            phone_number="01712345678",
+            first_name="John",
+            last_name="Doe",
+            house_number="123",
+            road_number="45",
+            postal_code="1234",
+            district="Dhaka",
+            password="testpass123"
+        )
+        self.other_user = User.objects.create_user(
+            email="other@example.com",
+            phone_number="01712345679",
+            first_name="Jane",
+            last_name="Doe",
+            house_number="1",
+            road_number="2",
+            postal_code="1234",
+            district="Dhaka",
+            password="testpass123"
+        )
+        self.brand = Brand.objects.create(brand_name="CeraVe")
+        self.category = Category.objects.create(category_name="Moisturizers")
+        self.product = Product.objects.create(
+            product_name="Moisturizing Cream",
+            brand=self.brand,
+            category=self.category,
+            product_details="Test",
+            price=Decimal("100.00"),
+            available_stock=5
+        )
+    
+    def _add(self, user, quantity):
+        self.client.force_login(user)
+        return self.client.post(
+            f'/cart/add/{self.product.product_id}/', {'quantity': quantity}, follow=True
+        )
+    
+    def _stock(self):
+        self.product.refresh_from_db()
+        return self.product.available_stock, self.product.reserved_stock
+    
+    def test_add_to_cart_holds_units(self):
+        """Test adding to cart reserves units other carts cannot take."""
+        self._add(self.user, 3)
+        self.assertEqual(self._stock(), (5, 3))
+        self.assertEqual(self.product.available_to_sell, 2)
+        
+        response = self._add(self.other_user, 3)
+        self.assertContains(response, "Requested quantity exceeds available stock.")
+        self.assertFalse(OrderItem.objects.filter(order__user=self.other_user).exists())
+        self.assertEqual(self._stock(), (5, 3))
+        
+        self._add(self.other_user, 2)
+        self.assertEqual(self._stock(), (5, 5))
+        response = self._add(self.other_user, 1)
+        self.assertContains(response, "This product is currently out of stock.")
+    
+    def test_double_submitted_first_add_joins_the_line(self):
+        """Test a first add racing another finds its line instead of a 500."""
+        self._add(self.user, 1)
+        real_get = QuerySet.get
+        raced = []
+        
+        def racing_get(queryset, *args, **kwargs):
+            # The other request's line is not visible to the first lookup
+            if queryset.model is OrderItem and not raced:
+                raced.append(True)
+                raise OrderItem.DoesNotExist
+            return real_get(queryset, *args, **kwargs)
+        
+        with mock.patch.object(QuerySet, 'get', racing_get):
+            response = self._add(self.user, 2)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(raced)
+        self.assertEqual(OrderItem.objects.get().quantity, 3)
+        self.assertEqual(self._stock(), (5, 3))
+    
+    def test_rejected_first_add_leaves_no_line(self):
+        """Test a line created for a hold that fails is rolled back."""
+        response = self._add(self.user, 6)
+        self.assertContains(response, "Requested quantity exceeds available stock.")
+        self.assertFalse(OrderItem.objects.exists())
+        self.assertEqual(self._stock(), (5, 0))
+    
+    def test_update_and_remove_adjust_hold(self):
+        """Test changing and removing a cart line moves the hold with it."""
+        self._add(self.user, 4)
+        item = OrderItem.objects.get()
+        
+        self.client.post(f'/cart/item/{item.order_item_id}/update/', {'quantity': 2})
+        self.assertEqual(self._stock(), (5, 2))
+        self.assertEqual(StockReservation.objects.get().quantity, 2)
+        
+        response = self.client.post(
+            f'/cart/item/{item.order_item_id}/update/', {'quantity': 6}, follow=True
+        )
+        self.assertContains(response, "Requested quantity exceeds available stock.")
+        self.assertEqual(self._stock(), (5, 2))
+        
+        self.client.post(f'/cart/item/{item.order_item_id}/remove/')
+        self.assertEqual(self._stock(), (5, 0))
+        self.assertFalse(StockReservation.objects.exists())
+    
+    def test_checkout_converts_hold_into_sale(self):
+        """Test checkout takes held units even when no free stock is left."""
+        self._add(self.user, 3)
+        self._add(self.other_user, 2)
+        order = Order.objects.get(user=self.user)
+        
+        self.assertTrue(order.complete_order())
+        self.assertEqual(self._stock(), (2, 2))
+        self.assertFalse(StockReservation.objects.filter(order=order).exists())
+    
+    def test_checkout_without_hold_uses_free_stock_only(self):
+        """Test a line whose hold was swept cannot take units held by others."""
+        self._add(self.user, 3)
+        order = Order.objects.get(user=self.user)
+        self.assertEqual(release_expired(now=timezone.now() + timedelta(days=1)), 1)
+        self._add(self.other_user, 4)
+        
+        result = order.complete_order()
+        self.assertFalse(result)
+        self.assertEqual(result.failed_items[0].available_quantity, 1)
+        self.assertEqual(self._stock(), (5, 4))
+    
+    def test_release_expired_in_batches(self):
+        """Test the sweeper releases only expired holds, batch by batch."""
+        orders = [Order.objects.create(user=self.user) for _ in range(5)]
+        for order in orders:
+            self.assertTrue(reserve(order.pk, self.product.pk, 1))
+        self.assertFalse(reserve(Order.objects.create(user=self.other_user).pk, self.product.pk, 1))
+        StockReservation.objects.filter(order__in=orders[:3]).update(
+            expires_at=timezone.now() - timedelta(minutes=1)
+        )
+        
+        out = StringIO()
+        call_command('release_expired_reservations', batch_size=2, stdout=out)
+        self.assertIn('Released 3 expired reservation(s).', out.getvalue())
+        self.assertEqual(self._stock(), (5, 2))
+        self.assertEqual(StockReservation.objects.count(), 2)
+    
+    def test_sweeper_releases_only_holds_it_deleted(self):
+        """Test a hold a checkout already took is not given back by the sweeper too."""
+        self._add(self.user, 2)
+        self._add(self.other_user, 1)
+        StockReservation.objects.update(expires_at=timezone.now() - timedelta(minutes=1))
+        # A stale read: the first batch still lists a hold a checkout has
+        # since converted into a sale
+        stale = (uuid.uuid4(), self.product.pk, 2)
+        reads = []
+        
+        def read(rows):
+            rows = builtins.list(rows)
+            reads.append(rows)
+            return rows + [stale] if len(reads) == 1 else rows
+        
+        with mock.patch('products.reservations.list', read, create=True):
+            self.assertEqual(release_expired(), 2)
+        self.assertEqual(len(reads), 2)
+        self.assertEqual(self._stock(), (5, 0))
+        self.assertFalse(StockReservation.objects.exists())
+    
+    def test_checkout_deletes_its_holds_before_moving_stock(self):
+        """Test checkout removes the holds it converts, locked, in its own transaction."""
+        self._add(self.user, 3)
+        order = Order.objects.get(user=self.user)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(order.complete_order())
+        statements = [query['sql'] for query in queries.captured_queries]
+        first = lambda prefix: next(i for i, sql in enumerate(statements) if sql.startswith(prefix))
+        self.assertLess(
+            first('DELETE FROM "products_stockreservation"'), first('UPDATE "products_product"')
+        )
+        self.assertEqual(self._stock(), (2, 0))
+    
+    def test_product_save_keeps_concurrent_holds(self):
+        """Test saving a stale product instance does not overwrite reserved_stock."""
+        stale = Product.objects.get(pk=self.product.pk)
+        self._add(self.user, 2)
+        stale.product_name = "Renamed Cream"
+        stale.save()
+        
+        self.assertEqual(self._stock(), (5, 2))
+        self.assertEqual(self.product.product_name, "Renamed Cream")
+
+
+class CatalogApiTestCase(TestCase):
+    """Test cases for the read-only JSON catalog API."""
+    
+    def setUp(self):
+        """Set up test data."""
+        self.brands = [Brand.objects.create(brand_name=f"Brand {i}") for i in range(2)]
+        self.category = Category.objects.create(category_name="Serums")
+        self.products = [
+            Product.objects.create(
+                product_name=f"Product {i}",
+                brand=self.brands[i % 2],
+                category=self.category,
+                product_details="<p>Details</p>",
+                price=Decimal("100.00"),
+                available_stock=0 if i == 0 else 10
+            )
+            for i in range(30)
+        ]
+    
+    def test_list_filters_and_paginates(self):
+        """Test the list returns in-stock products with working cursors."""
+        response = self.client.get('/api/products/', {'brand': self.brands[1].brand_id, 'page_size': 10})
+        data = response.json()
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(data['results']), 10)
+        self.assertEqual(data['results'][0]['brand']['name'], "Brand 1")
+        self.assertNotIn('details_html', data['results'][0])
+        self.assertIsNone(data['previous'])
+        
+        second = self.client.get(data['next']).json()
+        self.assertEqual(len(second['results']), 5)
+        self.assertIsNone(second['next'])
+        names = [row['name'] for row in data['results'] + second['results']]
+        self.assertEqual(len(set(names)), 15)
+        
+        response = self.client.get('/api/products/', {'brand': 'not-a-uuid'})
+        self.assertEqual(response.status_code, 400)
+    
+    def test_list_not_modified(self):
+        """Test a matching ETag is answered with one key query and a 304."""
+        response = self.client.get('/api/products/')
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('"'))
+        self.assertIn('Last-Modified', response)
+        
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        
+        self.products[-1].price = Decimal("120.00")
+        self.products[-1].save()
+        response = self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+    
+    def test_list_etag_changes_when_product_leaves_page(self):
+        """Test the ETag changes when a product drops out of the result set."""
+        etag = self.client.get('/api/products/')['ETag']
+        Product.objects.filter(pk=self.products[-2].pk).update(available_stock=0)
+        response = self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+    
+    def test_detail_conditional_get(self):
+        """Test detail sends validators and honours both conditional headers."""
+        url = f'/api/products/{self.products[1].product_id}/'
+        response = self.client.get(url)
+        data = response.json()
+        
+        self.assertEqual(data['name'], "Product 1")
+        self.assertEqual(data['details_html'], "<p>Details</p>")
+        self.assertEqual(data['price'], "100.00")
+        with CaptureQueriesContext(connection) as captured:
+            self.assertEqual(
+                self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304
+            )
+        # The 304 reads the validator only, not the product and its relations
+        self.assertEqual(len(captured), 1)
+        self.assertNotIn('JOIN', captured[0]['sql'])
+        self.assertNotIn('product_details', captured[0]['sql'])
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304
+        )
+        
+        self.brands[1].brand_name = "Renamed"
+        self.brands[1].save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['brand']['name'], "Renamed")
+    
+    def test_detail_missing_and_read_only(self):
+        """Test unknown products 404 and writes are rejected."""
+        self.assertEqual(self.client.get(f'/api/products/{uuid.uuid4()}/').status_code, 404)
+        self.assertEqual(self.client.post('/api/products/').status_code, 405)
+
+
+class AnonymousPageCacheTestCase(TestCase):
+    """Test cases for the anonymous full-page cache."""
+    
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        self.brand = Brand.objects.create(brand_name="CeraVe")
+        self.category = Category.objects.create(category_name="Moisturizers")
+        self.product = Product.objects.create(
+            product_name="Moisturizing Cream",
+            brand=self.brand,
+            category=self.category,
+            product_details="Test",
+            price=Decimal("100.00"),
+            available_stock=5
+        )
+        self.detail_url = f'/product/{self.product.product_id}/'
+    
+    def test_repeat_anonymous_request_is_served_from_cache(self):
+        """Test the second anonymous request runs no queries."""
+        first = self.client.get(self.detail_url)
+        self.assertEqual(first['X-Page-Cache'], 'miss')
+        
+        with self.assertNumQueries(0):
+            second = self.client.get(self.detail_url, {'utm_source': 'newsletter'})
+        self.assertEqual(second['X-Page-Cache'], 'hit')
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(page_cache_stats(), {'hits': 1, 'misses': 1, 'hit_rate': 0.5})
+    
+    def test_key_includes_filters(self):
+        """Test brand and category filters are cached as separate pages."""
+        self.client.get('/')
+        response = self.client.get('/', {'brand': self.brand.brand_id})
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        response = self.client.get('/', {'brand': self.brand.brand_id})
+        self.assertEqual(response['X-Page-Cache'], 'hit')
+    
+    def test_catalog_changes_expire_pages(self):
+        """Test saving or deleting catalog rows moves to a new version."""
+        self.client.get(self.detail_url)
+        self.product.product_name = "Renamed Cream"
+        self.product.save()
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertContains(response, "Renamed Cream")
+        
+        self.client.get('/')
+        Category.objects.create(category_name="Serums")
+        response = self.client.get('/')
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertContains(response, "Serums")
+    
+    def test_authenticated_users_get_fresh_pages(self):
+        """Test logged-in users bypass the page cache."""
+        user = User.objects.create_user(
+            email="test@example.com",
+            phone_number="01712345678",
+            first_name="John",
+            last_name="Doe",
+            house_number="123",
+            road_number="45",
+            postal_code="1234",
+            district="Dhaka",
+            password="testpass123"
+        )
+        self.client.get(self.detail_url)
+        self.client.force_login(user)
+        response = self.client.get(self.detail_url)
+        self.assertNotIn('X-Page-Cache', response)
+        self.assertContains(response, "Add to Cart")
+    
+    def test_stats_command(self):
+        """Test the stats command prints and resets the counters."""
+        self.client.get('/')
+        self.client.get('/')
+        out, err = StringIO(), StringIO()
+        call_command('page_cache_stats', reset=True, stdout=out, stderr=err)
+        self.assertIn('hits=1 misses=1 hit_rate=50.00%', out.getvalue())
+        self.assertEqual(page_cache_stats()['hits'], 0)
+        # The default LocMemCache is per process, so the command says so
+        self.assertIn("'default' cache is LocMemCache", err.getvalue())
+    
+    def test_counters_use_the_stats_cache(self):
+        """Test STATS_CACHE moves the counters to a shared cache alias."""
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location, ignore_errors=True)
+        caches_setting = dict(settings.CACHES, stats={
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': location,
+        })
+        with override_settings(CACHES=caches_setting, STATS_CACHE='stats'):
+            self.client.get('/')
+            self.client.get('/')
+            self.assertIsNone(cache.get('products:page-cache:hits'))
+            out, err = StringIO(), StringIO()
+            call_command('page_cache_stats', stdout=out, stderr=err)
+        self.assertIn('hits=1 misses=1', out.getvalue())
+        self.assertEqual(err.getvalue(), '')
+
+
+class FacetedFilterTestCase(TestCase):
+    """Test cases for faceted filtering on the home page."""
+    
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        self.brands = [Brand.objects.create(brand_name=name) for name in ("Alpha", "Beta", "Gamma")]
+        self.categories = [Category.objects.create(category_name=name) for name in ("Cleansers", "Serums")]
+        # (brand, category, price, stock)
+        rows = [
+            (0, 0, "100.00", 5), (0, 1, "300.00", 5), (1, 0, "200.00", 5),
+            (1, 1, "400.00", 5), (1, 1, "500.00", 0), (2, 0, "600.00", 5),
+        ]
+        self.products = [
+            Product.objects.create(
+                product_name=f"Product {i}",
+                brand=self.brands[brand],
+                category=self.categories[category],
+                product_details="Test",
+                price=Decimal(price),
+                available_stock=stock
+            )
+            for i, (brand, category, price, stock) in enumerate(rows)
+        ]
+    
+    def _get(self, **params):
+        return self.client.get('/', params)
+    
+    def _counts(self, facets):
+        return {value.name: value.count for value in facets}
+    
+    def test_multi_select_and_price_range(self):
+        """Test several brands plus a price range narrow the listing."""
+        response = self._get(
+            brand=[self.brands[0].brand_id, self.brands[1].brand_id],
+            min_price="150", max_price="400"
+        )
+        names = sorted(product.product_name for product in response.context['page'])
+        self.assertEqual(names, ["Product 1", "Product 2", "Product 3"])
+        self.assertNotContains(response, "Featured Products")
+    
+    def test_counts_ignore_own_facet_only(self):
+        """Test each facet counts in-stock products under the other filters."""
+        response = self._get(brand=self.brands[1].brand_id, category=self.categories[1].category_id)
+        brands = self._counts(response.context['brand_facets'])
+        categories = self._counts(response.context['category_facets'])
+        
+        # Brand counts are limited by the category, not by the selected brand
+        self.assertEqual(brands, {"Alpha": 1, "Beta": 1, "Gamma": 0})
+        self.assertEqual(categories, {"Cleansers": 1, "Serums": 1})
+        self.assertEqual(
+            [value.name for value in response.context['brand_facets'] if value.selected], ["Beta"]
+        )
+        self.assertContains(response, "Gamma (0)")
+    
+    def test_facets_cached_per_filter_signature(self):
+        """Test repeat filter states reuse cached counts, new ones query once per facet."""
+        filters = FacetFilters(brands=[self.brands[0].brand_id], min_price=Decimal("50"))
+        with self.assertNumQueries(2):
+            get_facets(filters)
+        with self.assertNumQueries(0):
+            get_facets(FacetFilters(brands=[self.brands[0].brand_id], min_price=Decimal("50.0")))
+        with self.assertNumQueries(2):
+            get_facets(FacetFilters(brands=[self.brands[1].brand_id]))
+        
+        Product.objects.create(
+            product_name="New", brand=self.brands[0], category=self.categories[0],
+            product_details="Test", price=Decimal("90.00"), available_stock=1
+        )
+        self.assertEqual(self._counts(get_facets(filters)['categories'])["Cleansers"], 2)
+    
+    def test_invalid_values_are_ignored(self):
+        """Test malformed ids and prices do not break the page."""
+        response = self._get(brand="nope", min_price="abc", max_price="-5")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['page']), 5)
+
+
+class CoPurchaseRecommendationTestCase(TestCase):
+    """Test cases for frequently-bought-together recommendations."""
+    
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(
+            email="test@example.com",
+            phone_number="01712345678",
+            first_name="John",
+            last_name="Doe",
+            house_number="123",
+            road_number="45",
+            postal_code="1234",
+            district="Dhaka",
+            password="testpass123"
+        )
+        self.brand = Brand.objects.create(brand_name="CeraVe")
+        self.categories = [Category.objects.create(category_name=name) for name in ("Cleansers", "Serums")]
+        self.products = [
+            Product.objects.create(
+                product_name=f"Product {i}",
+                brand=self.brand,
+                category=self.categories[i % 2],
+                product_details="Test",
+                price=Decimal("100.00"),
+                available_stock=10
+            )
+            for i in range(6)
+        ]
+        self.completed_at = timezone.now() - timedelta(hours=1)
+    
+    def _order(self, indexes, in_cart=False):
+        order = Order.objects.create(
+            user=self.user,
+            in_cart=in_cart,
+            completed_at=None if in_cart else self.completed_at
+        )
+        for i in indexes:
+            OrderItem.objects.create(
+                order=order, product=self.products[i], quantity=1, price_at_purchase=Decimal("100.00")
+            )
+        return order
+    
+    def _scores(self, index):
+        return {
+            row.related.product_name: row.score
+            for row in CoPurchase.objects.filter(product=self.products[index]).select_related('related')
+        }
+    
+    def test_counts_completed_orders_incrementally(self):
+        """Test each run only adds orders completed since the previous one."""
+        self._order([0, 1, 2])
+        self._order([0, 1])
+        self._order([0, 3], in_cart=True)
+        
+        out = StringIO()
+        call_command('update_copurchases', batch_size=1, stdout=out)
+        self.assertIn('Counted 2 order(s)', out.getvalue())
+        self.assertEqual(self._scores(0), {"Product 1": 2, "Product 2": 1})
+        self.assertEqual(self._scores(1), {"Product 0": 2, "Product 2": 1})
+        
+        self.completed_at += timedelta(minutes=1)
+        self._order([0, 2])
+        run = update_copurchases()
+        self.assertEqual(run.orders_processed, 1)
+        self.assertEqual(self._scores(0), {"Product 1": 2, "Product 2": 2})
+        
+        self.assertEqual(update_copurchases().orders_processed, 0)
+        run = update_copurchases(rebuild=True)
+        self.assertEqual(run.orders_processed, 3)
+        self.assertEqual(self._scores(0), {"Product 1": 2, "Product 2": 2})
+    
+    def test_recent_orders_wait_for_next_run(self):
+        """Test orders inside the lag window are left for a later run."""
+        self.completed_at = timezone.now()
+        self._order([0, 1])
+        self.assertEqual(update_copurchases(lag=timedelta(minutes=5)).orders_processed, 0)
+        self.assertEqual(update_copurchases(lag=timedelta(0)).orders_processed, 1)
+    
+    def test_detail_page_serves_top_copurchases(self):
+        """Test the detail page ranks co-purchases and tops up from the category."""
+        self._order([0, 1, 3])
+        self._order([0, 3])
+        self._order([0, 5])
+        update_copurchases()
+        Product.objects.filter(pk=self.products[5].pk).update(available_stock=0)
+        
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/product/{self.products[0].product_id}/')
+        names = [product.product_name for product in response.context['related_products']]
+        # 3 was bought with 0 twice, 1 once, 5 is out of stock; 2/4 fill from the category
+        self.assertEqual(names[:2], ["Product 3", "Product 1"])
+        self.assertEqual(sorted(names[2:]), ["Product 2", "Product 4"])
+        self.assertContains(response, "<h2>Frequently Bought Together</h2>", count=1)
+        self.assertContains(response, "<h2>More from Cleansers</h2>", count=1)
+    
+    def test_category_fallback_is_not_called_bought_together(self):
+        """Test a product nobody bought with anything only shows its category."""
+        response = self.client.get(f'/product/{self.products[0].product_id}/')
+        self.assertEqual(len(response.context['related_products']), 2)
+        self.assertNotContains(response, "Frequently Bought Together")
+        self.assertContains(response, "<h2>More from Cleansers</h2>", count=1)
+    
+    def test_full_recommendations_need_one_query(self):
+        """Test a product with enough co-purchases skips the category fallback."""
+        self._order([0, 1, 2, 3, 4])
+        update_copurchases()
+        with self.assertNumQueries(1):
+            recommended = recommended_products(self.products[0], limit=4)
+        self.assertEqual(len(recommended), 4)
+        self.assertNotIn(self.products[0], recommended)
+        plan = Product.objects.filter(
+            copurchased_by__product=self.products[0], available_stock__gt=0
+        ).order_by('-copurchased_by__score', 'product_id')[:4].explain()
+        self.assertIn('copurchase_top_idx', plan)
+
+
+@override_settings(ROOT_URLCONF='pookiecare.asgi_urls')
+class AsyncCatalogViewTestCase(TestCase):
+    """Test cases for the async catalog views served under ASGI."""
+    
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        self.user = User.objects.create_user(
+            email="test@example.com",
+            phone_number="01712345678",
+            first_name="John",
+            last_name="Doe",
+            house_number="123",
+            road_number="45",
+            postal_code="1234",
+            district="Dhaka",
+            password="testpass123"
+        )
+        self.brand = Brand.objects.create(brand_name="CeraVe")
+        self.category = Category.objects.create(category_name="Moisturizers")
+        self.products = [
+            Product.objects.create(
+                product_name=f"Cream {i}",
+                brand=self.brand,
+                category=self.category,
+                product_details="Test",
+                price=Decimal("100.00"),
+                available_stock=5,
+                featured=i % 2 == 0
+            )
+            for i in range(6)
+        ]
+        self.cart = Order.objects.create(user=self.user, in_cart=True)
+        OrderItem.objects.create(
+            order=self.cart, product=self.products[0], quantity=2, price_at_purchase=Decimal("100.00")
+        )
+    
+    def test_catalog_routes_are_async_only_under_asgi(self):
+        """Test asgi_urls swaps in the async views and pookiecare.urls keeps the sync ones."""
+        product_url = f'/product/{self.products[0].product_id}/'
+        for path in ('/', product_url, '/cart/'):
+            self.assertTrue(iscoroutinefunction(resolve(path).func))
+            self.assertFalse(iscoroutinefunction(resolve(path, urlconf='pookiecare.urls').func))
+        self.assertFalse(iscoroutinefunction(resolve('/checkout/').func))
+    
+    @override_settings(PAGE_CACHE=False)
+    async def test_home_matches_sync_view(self):
+        """Test the async home page shows the same listing, featured block and facets."""
+        response = await self.async_client.get('/')
+        with self.settings(ROOT_URLCONF='pookiecare.urls'):
+            expected = await self.async_client.get('/')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [p.product_name for p in response.context['products']],
+            [p.product_name for p in expected.context['products']],
+        )
+        self.assertEqual(
+            sorted(p.product_name for p in response.context['featured_products']),
+            ["Cream 0", "Cream 2", "Cream 4"],
+        )
+        self.assertEqual(
+            [(f.name, f.count, f.selected) for f in response.context['brand_facets']],
+            [("CeraVe", 6, False)],
+        )
+        
+        response = await self.async_client.get('/', {'brand': str(self.brand.brand_id)})
+        self.assertEqual(response.context['featured_products'], [])
+        self.assertTrue(response.context['brand_facets'][0].selected)
+    
+    @override_settings(PAGE_CACHE=False)
+    async def test_featured_block_only_on_first_page(self):
+        """Test later pages skip the featured block, like the sync view."""
+        listed = list((await self.async_client.get('/')).context['products'])
+        
+        response = await self.async_client.get('/', {'after': encode_cursor(listed[0])})
+        self.assertTrue(response.context['page'].has_previous)
+        self.assertEqual(response.context['featured_products'], [])
+        
+        # Paging back lands on the first page, which shows the block again
+        response = await self.async_client.get('/', {'before': encode_cursor(listed[1])})
+        self.assertFalse(response.context['page'].has_previous)
+        self.assertEqual(len(response.context['featured_products']), 3)
+    
+    async def test_authenticated_pages_load_user_and_cart_summary(self):
+        """Test the header's user and cart badge are loaded before rendering."""
+        await self.async_client.aforce_login(self.user)
+        for path in ('/', f'/product/{self.products[1].product_id}/', '/cart/'):
+            response = await self.async_client.get(path)
+            self.assertContains(response, 'Cart (2)')
+            self.assertContains(response, 'Logout')
+        self.assertContains(response, 'Cream 0')
+        self.assertEqual(response.context['total_price'], Decimal("200.00"))
+    
+    async def test_anonymous_pages_use_page_cache(self):
+        """Test the async views share the anonymous page cache."""
+        url = f'/product/{self.products[0].product_id}/'
+        first = await self.async_client.get(url)
+        second = await self.async_client.get(url)
+        self.assertEqual(first['X-Page-Cache'], 'miss')
+        self.assertEqual(second['X-Page-Cache'], 'hit')
+        self.assertEqual(second.content, first.content)
+    
+    async def test_missing_product_and_anonymous_cart(self):
+        """Test unknown products 404 and guests see their cookie cart."""
+        response = await self.async_client.get(f'/product/{uuid.uuid4()}/')
+        self.assertEqual(response.status_code, 404)
+        response = await self.async_client.get('/cart/')
+        self.assertContains(response, "Your cart is empty.")
+    
+    def test_bench_async_command(self):
+        """Test bench_async drives both modes and rolls back its data."""
+        out = StringIO()
+        call_command('bench_async', products=20, requests=4, concurrency=2, stdout=out)
+        output = out.getvalue()
+        self.assertEqual(output.count('cart_view'), 2)
+        self.assertIn('async', output)
+        self.assertEqual(Product.objects.count(), 6)
+
+
+class SalesRollupTestCase(TestCase):
+    """Test cases for daily sales rollups and the sales dashboard."""
+    
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(
+            email="test@example.com",
+            phone_number="01712345678",
+            first_name="John",
+            last_name="Doe",
+            house_number="123",
+            road_number="45",
+            postal_code="1234",
+            district="Dhaka",
+            password="testpass123"
+        )
+        self.brand = Brand.objects.create(brand_name="CeraVe")
+        self.category = Category.objects.create(category_name="Moisturizers")
+        self.cream = Product.objects.create(
+            product_name="Moisturizing Cream",
+            brand=self.brand,
+            category=self.category,
+            product_details="Test",
+            price=Decimal("100.10"),
+            available_stock=50
+        )
+        self.serum = Product.objects.create(
+            product_name="Serum",
+            brand=self.brand,
+            category=self.category,
+            product_details="Test",
+            price=Decimal("250.00"),
+            available_stock=50
+        )
+    
+    def _checkout(self, lines):
+        order = Order.objects.create(user=self.user, in_cart=True)
+        for product, quantity in lines:
+            OrderItem.objects.create(
+                order=order, product=product, quantity=quantity, price_at_purchase=product.price
+            )
+        self.assertTrue(order.complete_order())
+        return order
+    
+    def _rollups(self):
+        return {
+            (row.day, row.product.product_name): (row.units, row.revenue)
+            for row in SalesDailyRollup.objects.select_related('product')
+        }
+    
+    def test_checkout_adds_to_rollup(self):
+        """Test each completed order is added to its product's row for the day."""
+        self._checkout([(self.cream, 2), (self.serum, 1)])
+        self._checkout([(self.cream, 1)])
+        today = timezone.localdate()
+        self.assertEqual(self._rollups(), {
+            (today, "Moisturizing Cream"): (3, Decimal("300.30")),
+            (today, "Serum"): (1, Decimal("250.00")),
+        })
+        row = SalesDailyRollup.objects.get(product=self.cream)
+        self.assertEqual((row.brand_id, row.category_id), (self.brand.pk, self.category.pk))
+    
+    def test_failed_checkout_records_nothing(self):
+        """Test a checkout rolled back for lack of stock leaves the rollups alone."""
+        order = Order.objects.create(user=self.user, in_cart=True)
+        OrderItem.objects.create(order=order, product=self.cream, quantity=60, price_at_purchase=self.cream.price)
+        self.assertFalse(order.complete_order())
+        self.assertFalse(SalesDailyRollup.objects.exists())
+    
+    def test_rebuild_recomputes_range_from_orders(self):
+        """Test rebuilding replaces drifted rows with totals from completed orders."""
+        self._checkout([(self.cream, 2), (self.serum, 1)])
+        late = self._checkout([(self.serum, 4)])
+        # 19:00 UTC on 31 Jan is already 1 Feb in Dhaka (UTC+6)
+        Order.objects.filter(pk=late.pk).update(
+            completed_at=datetime(2026, 1, 31, 19, 0, tzinfo=dt_timezone.utc)
+        )
+        cart = Order.objects.create(user=self.user, in_cart=True)
+        OrderItem.objects.create(order=cart, product=self.cream, quantity=9, price_at_purchase=self.cream.price)
+        SalesDailyRollup.objects.filter(product=self.cream).update(units=99)
+        
+        out = StringIO()
+        call_command('rebuild_sales_rollups', start='2026-01-01', stdout=out)
+        self.assertIn('2026-01-01 .. 2026-01-31: 0 row(s)', out.getvalue())
+        self.assertIn('2026-02-01 .. 2026-02-28: 1 row(s)', out.getvalue())
+        today = timezone.localdate()
+        self.assertEqual(self._rollups(), {
+            (date(2026, 2, 1), "Serum"): (4, Decimal("1000.00")),
+            (today, "Moisturizing Cream"): (2, Decimal("200.20")),
+            (today, "Serum"): (1, Decimal("250.00")),
+        })
+    
+    def test_rebuild_leaves_other_days_alone(self):
+        """Test only the requested range is replaced."""
+        self._checkout([(self.cream, 1)])
+        written = rebuild_rollups(date(2020, 1, 1), date(2020, 1, 2))
+        self.assertEqual(written, 0)
+        self.assertEqual(SalesDailyRollup.objects.count(), 1)
+    
+    def test_rebuild_command_validates_dates(self):
+        """Test bad or reversed dates are rejected."""
+        with self.assertRaises(CommandError):
+            call_command('rebuild_sales_rollups', start='yesterday', stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('rebuild_sales_rollups', start='2026-02-02', end='2026-02-01', stdout=StringIO())
+        out = StringIO()
+        call_command('rebuild_sales_rollups', stdout=out)
+        self.assertIn('No completed orders.', out.getvalue())
+    
+    def test_monthly_totals(self):
+        """Test months are zero-filled and compared with the previous month."""
+        today = date(2026, 3, 15)
+        for day, product, revenue in (
+            (date(2026, 1, 5), self.cream, "100.00"),
+            (date(2026, 1, 20), self.serum, "100.00"),
+            (date(2026, 3, 1), self.cream, "300.00"),
+        ):
+            SalesDailyRollup.objects.create(
+                day=day, product=product, brand=self.brand, category=self.category,
+                units=1, revenue=Decimal(revenue)
+            )
+        report = monthly_totals(months=3, today=today)
+        self.assertEqual(
+            [(row['month'].month, row['units'], row['revenue'], row['change']) for row in report],
+            [(1, 2, Decimal("200.00"), None), (2, 0, Decimal("0.00"), Decimal("-100.0")), (3, 1, Decimal("300.00"), None)],
+        )
+        top = top_sellers(today.replace(day=1), today, 'brand')
+        self.assertEqual([(row['name'], row['revenue']) for row in top], [("CeraVe", Decimal("300.00"))])
+    
+    def test_dashboard_reads_only_rollups(self):
+        """Test the admin dashboard renders from the rollups without reading orders."""
+        self._checkout([(self.cream, 2), (self.serum, 1)])
+        admin_user = User.objects.create_superuser(
+            email="admin@example.com",
+            phone_number="01812345678",
+            first_name="Admin",
+            last_name="User",
+            house_number="1",
+            road_number="1",
+            postal_code="1000",
+            district="Dhaka",
+            password="adminpass123"
+        )
+        self.client.force_login(admin_user)
+        
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get('/admin/products/salesdailyrollup/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Moisturizing Cream")
+        self.assertContains(response, "৳450.20")
+        self.assertFalse([q['sql'] for q in captured if 'products_order' in q['sql']])
+        self.assertNotContains(response, '<style>')
+        self.assertContains(response, 'products/css/sales_dashboard.css')
+        
+        response = self.client.get('/admin/products/salesdailyrollup/dashboard/', {'month': '2020-01'})
+        self.assertContains(response, "No sales this month.")
+        response = self.client.get('/admin/products/salesdailyrollup/')
+        self.assertContains(response, "Sales dashboard")
+        
+        self.client.force_login(self.user)
+        response = self.client.get('/admin/products/salesdailyrollup/dashboard/')
+        self.assertEqual(response.status_code, 302)
+
+
+class QueryInstrumentationTestCase(TestCase):
+    """Test cases for the per-request query instrumentation middleware."""
+    
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        self.brand = Brand.objects.create(brand_name="CeraVe")
+        self.category = Category.objects.create(category_name="Moisturizers")
+        self.products = [
+            Product.objects.create(
+                product_name=f"Cream {i}",
+                brand=self.brand,
+                category=self.category,
+                product_details="Test",
+                price=Decimal("100.00"),
+                available_stock=5
+            )
+            for i in range(8)
+        ]
+    
+    def _run(self, view):
+        request = RequestFactory().get('/n-plus-one/')
+        response = QueryInstrumentationMiddleware(view)(request)
+        return request, response
+    
+    def test_fingerprint_collapses_literals(self):
+        """Test IN lists and numbers do not split one statement shape."""
+        self.assertEqual(
+            fingerprint('SELECT a FROM t WHERE id IN (%s, %s, %s) LIMIT 21'),
+            fingerprint('SELECT a FROM t WHERE id IN (%s) LIMIT 5'),
+        )
+        self.assertNotEqual(fingerprint('SELECT a FROM t1'), fingerprint('SELECT a FROM t2'))
+    
+    @override_settings(QUERY_REPEAT_WARNING=5, QUERY_COUNT_WARNING=7)
+    def test_warns_about_repeated_queries(self):
+        """Test an N+1 loop is logged with its statement shape."""
+        def view(request):
+            names = [Product.objects.get(pk=product.pk).brand.brand_name for product in self.products]
+            return HttpResponse(", ".join(names))
+        
+        with self.assertLogs('products.queries', 'WARNING') as logs:
+            request, _ = self._run(view)
+        self.assertEqual(request.query_stats.count, 16)
+        self.assertIn('/n-plus-one/ ran 16 queries', logs.output[0])
+        self.assertIn('ran the same query 8 times (likely N+1)', logs.output[1])
+        self.assertIn('"products_brand"', logs.output[2])
+    
+    @override_settings(SERVER_TIMING=True)
+    def test_server_timing_header(self):
+        """Test the stats are reported in Server-Timing for devtools."""
+        with self.assertNoLogs('products.queries', 'WARNING'):
+            response = self.client.get(f'/product/{self.products[0].product_id}/')
+        self.assertRegex(
+            response['Server-Timing'],
+            r'^db;dur=[\d.]+;desc="3 queries", dup;desc="0 repeated", total;dur=[\d.]+$'
+        )
+    
+    @override_settings(SERVER_TIMING=False)
+    def test_server_timing_can_be_disabled(self):
+        """Test the header is left off when SERVER_TIMING is False."""
+        response = self.client.get('/')
+        self.assertNotIn('Server-Timing', response)
+    
+    async def test_async_views_are_counted(self):
+        """Test queries an async view runs through sync_to_async are recorded."""
+        async def view(request):
+            names = [product.product_name async for product in Product.objects.all()]
+            await Brand.objects.aget(pk=self.brand.pk)
+            return HttpResponse(", ".join(names))
+        
+        middleware = QueryInstrumentationMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        request = RequestFactory().get('/async/')
+        with override_settings(SERVER_TIMING=True):
+            response = await middleware(request)
+        self.assertEqual(request.query_stats.count, 2)
+        self.assertIn('desc="2 queries"', response['Server-Timing'])
+    
+    @override_settings(SERVER_TIMING=True)
+    async def test_asgi_requests_skip_the_thread_hop(self):
+        """Test the project middleware runs natively under the ASGI handler."""
+        for middleware_class in (MetricsMiddleware, QueryInstrumentationMiddleware, ReplicaPinMiddleware):
+            self.assertTrue(middleware_class.sync_capable and middleware_class.async_capable)
+            self.assertFalse(iscoroutinefunction(middleware_class(lambda request: None)))
+        
+        response = await self.async_client.get(f'/product/{self.products[0].product_id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['Server-Timing'], r'desc="[1-9]\d* queries"')
+    
+    def test_routes_are_tagged_by_url_name(self):
+        """Test warnings name the resolved view, e.g. admin changelists."""
+        admin_user = User.objects.create_superuser(
+            email="admin@example.com",
+            phone_number="01812345678",
+            first_name="Admin",
+            last_name="User",
+            house_number="1",
+            road_number="1",
+            postal_code="1000",
+            district="Dhaka",
+            password="adminpass123"
+        )
+        self.client.force_login(admin_user)
+        for product in self.products:
+            SalesDailyRollup.objects.create(
+                day=timezone.localdate(), product=product, brand=self.brand,
+                category=self.category, units=1, revenue=Decimal("100.00")
+            )
+        with self.assertNoLogs('products.queries', 'WARNING'):
+            self.client.get('/admin/products/salesdailyrollup/')
+        
+        with override_settings(QUERY_COUNT_WARNING=1):
+            with self.assertLogs('products.queries', 'WARNING') as logs:
+                self.client.get('/admin/products/salesdailyrollup/')
+        self.assertIn('admin:products_salesdailyrollup_changelist ran', logs.output[0])
+
+
+class PrometheusMetricsTestCase(TestCase):
+    """Test cases for the Prometheus metrics endpoint and counters."""
+    
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        self.user = User.objects.create_user(
+            email="test@example.com",
+            phone_number="01712345678",
+            first_name="John",
+            last_name="Doe",
+            house_number="123",
+            road_number="45",
+            postal_code="1234",
+            district="Dhaka",
+            password="testpass123"
+        )
+        self.brand = Brand.objects.create(brand_name="CeraVe")
+        self.category = Category.objects.create(category_name="Moisturizers")
+        self.product = Product.objects.create(
+            product_name="Moisturizing Cream",
+            brand=self.brand,
+            category=self.category,
+            product_details="Test",
+            price=Decimal("100.00"),
+            available_stock=3
+        )
+    
+    def _value(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+    
+    def _order(self, quantity):
+        order = Order.objects.create(user=self.user)
+        OrderItem.objects.create(
+            order=order, product=self.product, quantity=quantity, price_at_purchase=self.product.price
+        )
+        return order
+    
+    def test_requests_are_labelled_by_url_name(self):
+        """Test latency and status are recorded per route, not per path."""
+        route = {'route': 'products:product_detail', 'method': 'GET'}
+        before = self._value('pookiecare_request_duration_seconds_count', **route)
+        missing = self._value('pookiecare_responses_total', status='404', **route)
+        
+        self.client.get(f'/product/{self.product.product_id}/')
+        self.client.get(f'/product/{uuid.uuid4()}/')
+        
+        self.assertEqual(self._value('pookiecare_request_duration_seconds_count', **route), before + 2)
+        self.assertEqual(self._value('pookiecare_responses_total', status='404', **route), missing + 1)
+    
+    def test_unresolved_paths_share_one_label(self):
+        """Test random paths cannot create a label per URL."""
+        before = self._value('pookiecare_responses_total', route='unmatched', method='GET', status='404')
+        self.client.get('/no-such-page/')
+        self.client.get('/another-missing-page/')
+        self.assertEqual(
+            self._value('pookiecare_responses_total', route='unmatched', method='GET', status='404'),
+            before + 2
+        )
+    
+    def test_checkout_outcomes_are_counted(self):
+        """Test completed, out of stock and repeated checkouts."""
+        counts = {
+            result: self._value('pookiecare_checkouts_total', result=result)
+            for result in ('completed', 'out_of_stock', 'not_in_cart')
+        }
+        order = self._order(2)
+        self.assertTrue(order.complete_order())
+        self.assertFalse(order.complete_order())
+        self.assertFalse(self._order(2).complete_order())
+        
+        for result in counts:
+            self.assertEqual(self._value('pookiecare_checkouts_total', result=result), counts[result] + 1)
+    
+    def test_cache_hits_and_misses_are_counted(self):
+        """Test the page and facet caches report lookups."""
+        page_hits = self._value('pookiecare_cache_lookups_total', cache='page', result='hit')
+        page_misses = self._value('pookiecare_cache_lookups_total', cache='page', result='miss')
+        facet_misses = self._value('pookiecare_cache_lookups_total', cache='facets', result='miss')
+        
+        self.client.get('/')
+        self.client.get('/')
+        
+        self.assertEqual(self._value('pookiecare_cache_lookups_total', cache='page', result='miss'), page_misses + 1)
+        self.assertEqual(self._value('pookiecare_cache_lookups_total', cache='page', result='hit'), page_hits + 1)
+        self.assertEqual(self._value('pookiecare_cache_lookups_total', cache='facets', result='miss'), facet_misses + 1)
+    
+    def test_metrics_endpoint(self):
+        """Test /metrics serves the Prometheus text format."""
+        self.client.get('/')
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        self.assertContains(response, 'pookiecare_request_duration_seconds_bucket{')
+        self.assertContains(response, 'route="products:home"')
+    
+    def test_metrics_endpoint_is_restricted(self):
+        """Test only METRICS_ALLOWED_IPS may scrape."""
+        response = self.client.get('/metrics', REMOTE_ADDR='203.0.113.9')
+        self.assertEqual(response.status_code, 403)
+        with override_settings(METRICS_ALLOWED_IPS=['203.0.113.0/24']):
+            response = self.client.get('/metrics', REMOTE_ADDR='203.0.113.9')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.post('/metrics').status_code, 405)
+    
+    def test_worker_processes_are_aggregated(self):
+        """Test counters written by separate processes are summed on scrape."""
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=path)
+        script = (
+            'from products.metrics import count_checkout, observe_request\n'
+            'count_checkout("completed")\n'
+            'observe_request("products:home", "GET", 200, 0.02)\n'
+        )
+        for _ in range(3):
+            subprocess.run([sys.executable, '-c', script], env=env, check=True)
+        
+        registry = scrape_registry(path)
+        self.assertEqual(registry.get_sample_value('pookiecare_checkouts_total', {'result': 'completed'}), 3)
+        self.assertEqual(
+            registry.get_sample_value(
+                'pookiecare_request_duration_seconds_bucket',
+                {'route': 'products:home', 'method': 'GET', 'le': '0.025'}
+            ),
+            3
+        )
+
+
+class SQLiteProfileTestCase(TestCase):
+    """Test cases for the SQLite connection pragma profiles."""
+    
+    def _open(self, profile):
+        """Open a new connection to a throwaway database file."""
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        settings_dict = dict(connection.settings_dict, NAME=os.path.join(path, 'db.sqlite3'))
+        wrapper = type(connections['default'])(settings_dict, alias='sqlite_profile_test')
+        with override_settings(SQLITE_PROFILE=profile):
+            wrapper.connect()
+        self.addCleanup(wrapper.close)
+        return wrapper
+    
+    def _pragma(self, wrapper, name):
+        with wrapper.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+    
+    def test_tuned_profile_is_applied_to_new_connections(self):
+        """Test WAL, relaxed syncs, busy timeout and BEGIN IMMEDIATE."""
+        wrapper = self._open('tuned')
+        self.assertEqual(self._pragma(wrapper, 'journal_mode'), 'wal')
+        self.assertEqual(self._pragma(wrapper, 'synchronous'), 1)
+        self.assertEqual(self._pragma(wrapper, 'busy_timeout'), 5000)
+        self.assertEqual(self._pragma(wrapper, 'cache_size'), SQLITE_PROFILES['tuned']['pragmas']['cache_size'])
+        self.assertEqual(wrapper.transaction_mode, 'IMMEDIATE')
+        
+        with CaptureQueriesContext(wrapper) as captured:
+            wrapper._start_transaction_under_autocommit()
+            wrapper.rollback()
+        self.assertEqual(captured[0]['sql'], 'BEGIN IMMEDIATE')
+    
+    def test_stock_profile_resets_journal_mode(self):
+        """Test the comparison profile leaves WAL again."""
+        wrapper = self._open('tuned')
+        wrapper.close()
+        with override_settings(SQLITE_PROFILE='stock'):
+            wrapper.connect()
+        self.assertEqual(self._pragma(wrapper, 'journal_mode'), 'delete')
+        self.assertEqual(self._pragma(wrapper, 'synchronous'), 2)
+        self.assertIsNone(wrapper.transaction_mode)
+    
+    def test_profile_can_be_switched_off(self):
+        """Test SQLITE_PROFILE=None leaves connections untouched."""
+        wrapper = self._open(None)
+        self.assertEqual(self._pragma(wrapper, 'journal_mode'), 'delete')
+        self.assertIsNone(wrapper.transaction_mode)
+    
+    def test_pragmas_stay_out_of_query_counts(self):
+        """Test opening a connection adds no queries to the log."""
+        wrapper = self._open('tuned')
+        wrapper.close()
+        with CaptureQueriesContext(wrapper) as captured:
+            wrapper.connect()
+        self.assertEqual(len(captured), 0)
+    
+    def test_bench_checkout_needs_a_file_database(self):
+        """Test the stress command refuses the in-memory test database."""
+        with self.assertRaises(CommandError):
+            call_command('bench_checkout', carts=1, stdout=StringIO())
+    
+    def test_bench_checkout_compares_profiles(self):
+        """Test concurrent checkouts complete without lock errors when tuned."""
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        env = dict(os.environ, POOKIECARE_DB=os.path.join(path, 'db.sqlite3'))
+        manage = [sys.executable, os.path.join(settings.BASE_DIR, 'manage.py')]
+        subprocess.run(manage + ['migrate', '-v', '0'], env=env, check=True)
+        output = subprocess.run(
+            manage + ['bench_checkout', '--carts', '40', '--threads', '4', '--readers', '1'],
+            env=env, check=True, capture_output=True, text=True,
+        ).stdout
+        report = json.loads(output)
+        
+        self.assertEqual(set(report['profiles']), {'stock', 'tuned'})
+        tuned = report['profiles']['tuned']
+        self.assertEqual(tuned['completed'], 40)
+        self.assertEqual(tuned['locked'], 0)
+        stock = report['profiles']['stock']
+        self.assertEqual(stock['completed'] + stock['failed'] + stock['locked'] + stock['errors'], 40)
+
+
+REPLICA_SCRIPT = """
+import json
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import transaction
+from django.test import Client
+from django.test.utils import override_settings
+from products.models import Brand, Category, Order, Product
+
+brand = Brand.objects.create(brand_name="CeraVe")
+category = Category.objects.create(category_name="Moisturizers")
+product = Product.objects.create(
+    product_name="Old Name", brand=brand, category=category,
+    product_details="Test", price=100, available_stock=5,
+)
+user = get_user_model().objects.create_user(
+    email="test@example.com", phone_number="01712345678", first_name="John", last_name="Doe",
+    house_number="1", road_number="1", postal_code="1000", district="Dhaka", password="testpass123",
+)
+call_command("sync_replica", verbosity=0)
+Product.objects.filter(pk=product.pk).update(product_name="New Name")
+
+seen = {"replica": Product.objects.get(pk=product.pk).product_name}
+with transaction.atomic():
+    seen["in_transaction"] = Product.objects.get(pk=product.pk).product_name
+url = f"/product/{product.pk}/"
+client = Client(SERVER_NAME="localhost")
+with override_settings(PAGE_CACHE=False):
+    seen["anonymous_page"] = "New Name" in client.get(url).content.decode()
+    client.force_login(user)
+    response = client.post(f"/cart/add/{product.pk}/", {"quantity": 1})
+    seen["pin_max_age"] = response.cookies["primary_pin"]["max-age"]
+    seen["cart_items"] = Order.objects.get(user=user, in_cart=True).items.count()
+    seen["pinned_page"] = "New Name" in client.get(url).content.decode()
+    del client.cookies["primary_pin"]
+    seen["unpinned_page"] = "New Name" in client.get(url).content.decode()
+print(json.dumps(seen))
+"""
+
+
+class CatalogReplicaRouterTestCase(TestCase):
+    """Test cases for routing catalog reads to a replica."""
+    
+    def test_everything_uses_the_primary_without_a_replica(self):
+        """Test the router stays out of the way when no replica is configured."""
+        router = CatalogReplicaRouter()
+        self.assertNotIn('replica', settings.DATABASES)
+        self.assertIsNone(router.db_for_read(Product))
+        self.assertEqual(router.db_for_write(Product), 'default')
+        response = self.client.post('/user/login/', {'email': 'nobody@example.com', 'password': 'x'})
+        self.assertNotIn('primary_pin', response.cookies)
+    
+    def test_replica_with_two_sqlite_files(self):
+        """Test stale replica reads, primary pinning after a write and in transactions."""
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        env = dict(
+            os.environ,
+            POOKIECARE_DB=os.path.join(path, 'primary.sqlite3'),
+            POOKIECARE_REPLICA_DB=os.path.join(path, 'replica.sqlite3'),
+        )
+        manage = [sys.executable, os.path.join(settings.BASE_DIR, 'manage.py')]
+        subprocess.run(manage + ['migrate', '-v', '0'], env=env, check=True)
+        output = subprocess.run(
+            manage + ['shell', '-v', '0', '-c', REPLICA_SCRIPT],
+            env=env, check=True, capture_output=True, text=True,
+        ).stdout
+        seen = json.loads(output.strip().splitlines()[-1])
+        
+        # Catalog reads see the replica until the next sync
+        self.assertEqual(seen['replica'], 'Old Name')
+        self.assertFalse(seen['anonymous_page'])
+        self.assertFalse(seen['unpinned_page'])
+        # Transactions and recent writers read the primary
+        self.assertEqual(seen['in_transaction'], 'New Name')
+        self.assertEqual(seen['pin_max_age'], 15)
+        self.assertTrue(seen['pinned_page'])
+        # A product read from the replica can go into a cart on the primary
+        self.assertEqual(seen['cart_items'], 1)
+
+
+class GuestCartTestCase(TestCase):
+    """Test cases for the signed-cookie guest cart and its merge on login."""
+    
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        self.user = User.objects.create_user(
+            email="test@example.com",
+            phone_number="01712345678",
+            first_name="John",
+            last_name="Doe",
+            house_number="123",
+            road_number="45",
+            postal_code="1234",
+            district="Dhaka",
+            password="testpass123"
+        )
+        self.brand = Brand.objects.create(brand_name="CeraVe")
+        self.category = Category.objects.create(category_name="Moisturizers")
+        self.products = [
+            Product.objects.create(
+                product_name=f"Cream {i}",
+                brand=self.brand,
+                category=self.category,
+                product_details="Test",
+                price=Decimal("100.00") * (i + 1),
+                available_stock=5
+            )
+            for i in range(6)
+        ]
+    
+    def _add(self, product, quantity=1):
+        return self.client.post(f'/cart/add/{product.product_id}/', {'quantity': quantity})
+    
+    def test_guest_add_writes_nothing(self):
+        """Test adding as a guest only reads the product and sets the cookie."""
+        with CaptureQueriesContext(connection) as captured:
+            response = self._add(self.products[0], 2)
+            self._add(self.products[1])
+            self._add(self.products[0])
+        self.assertRedirects(response, '/', fetch_redirect_response=False)
+        self.assertEqual(len(captured), 3)
+        self.assertTrue(all(query['sql'].startswith('SELECT') for query in captured))
+        self.assertFalse(OrderItem.objects.exists())
+        
+        response = self.client.get('/cart/')
+        self.assertEqual([item.quantity for item in response.context['items']], [3, 1])
+        self.assertEqual(response.context['total_price'], Decimal("500.00"))
+        self.assertEqual(response.context['cart_summary']['item_count'], 4)
+    
+    def test_guest_add_checks_stock(self):
+        """Test a guest cannot put more units in the cookie than are free."""
+        self._add(self.products[0], 4)
+        response = self.client.post(
+            f'/cart/add/{self.products[0].product_id}/', {'quantity': 2}, follow=True
+        )
+        self.assertContains(response, "Only 5 items available")
+        response = self.client.get('/cart/')
+        self.assertEqual(response.context['items'][0].quantity, 4)
+    
+    def test_tampered_cookie_is_an_empty_cart(self):
+        """Test a cookie without a valid signature is ignored."""
+        self.client.cookies[GUEST_CART_COOKIE] = f'{self.products[0].product_id.hex}:3'
+        response = self.client.get('/cart/')
+        self.assertContains(response, "Your cart is empty.")
+    
+    def test_guest_update_and_remove(self):
+        """Test guest lines can be changed and removed from the cart page."""
+        self._add(self.products[0])
+        self._add(self.products[1])
+        product_id = self.products[0].product_id
+        self.client.post(f'/cart/guest/{product_id}/update/', {'quantity': 3})
+        self.client.post(f'/cart/guest/{product_id}/update/', {'quantity': 9})
+        self.client.post(f'/cart/guest/{self.products[1].product_id}/remove/')
+        
+        response = self.client.get('/cart/')
+        self.assertEqual([(item.product, item.quantity) for item in response.context['items']], [(self.products[0], 3)])
+        self.assertContains(response, f'name="quantity-{product_id}"')
+        
+        self.client.post(f'/cart/guest/{product_id}/update/', {'quantity': 0})
+        response = self.client.get('/cart/')
+        self.assertContains(response, "Your cart is empty.")
+    
+    def test_guest_with_cart_skips_page_cache(self):
+        """Test the cached anonymous page never shows a guest's cart count."""
+        self.client.get('/')
+        self._add(self.products[0], 2)
+        response = self.client.get('/')
+        self.assertContains(response, "Cart (2)")
+        self.assertNotIn('X-Page-Cache', response)
+        self.assertNotContains(self.client_class().get('/'), "Cart (2)")
+    
+    def test_login_merges_guest_cart(self):
+        """Test logging in moves cookie lines into the DB cart with stock holds."""
+        order = Order.objects.create(user=self.user)
+        OrderItem.objects.create(
+            order=order, product=self.products[0], quantity=2, price_at_purchase=Decimal("100.00")
+        )
+        reserve(order.pk, self.products[0].pk, 2)
+        self._add(self.products[0], 2)
+        self._add(self.products[1], 4)
+        self._add(self.products[2], 1)
+        # Meanwhile another cart takes 3 of product 1's 5 units
+        other = Order.objects.create(user=User.objects.create_user(
+            email="other@example.com", phone_number="01812345678", first_name="Jane", last_name="Roe",
+            house_number="1", road_number="1", postal_code="1000", district="Dhaka", password="testpass123"
+        ))
+        reserve(other.pk, self.products[1].pk, 3)
+        
+        response = self.client.post('/user/login/', {'email': 'test@example.com', 'password': 'testpass123'})
+        self.assertRedirects(response, '/cart/', fetch_redirect_response=False)
+        self.assertEqual(response.cookies[GUEST_CART_COOKIE].value, '')
+        response = self.client.get('/cart/')
+        self.assertContains(response, "Not enough stock to add everything from your cart: Cream 1.")
+        
+        lines = dict(order.items.values_list('product__product_name', 'quantity'))
+        self.assertEqual(lines, {"Cream 0": 4, "Cream 1": 2, "Cream 2": 1})
+        self.assertEqual(
+            dict(StockReservation.objects.filter(order=order).values_list('product__product_name', 'quantity')),
+            lines
+        )
+        self.assertEqual(
+            list(Product.objects.filter(pk__in=[p.pk for p in self.products[:3]]).order_by('price').values_list('reserved_stock', flat=True)),
+            [4, 5, 1]
+        )
+        self.assertEqual(self.client.get('/cart/').context['cart_summary']['item_count'], 7)
+    
+    def test_merge_claims_stock_conditionally(self):
+        """Test units taken after the stock was read are not reserved twice."""
+        real_select_for_update = StockReservation.objects.select_for_update
+        
+        def take_units(*args, **kwargs):
+            # Another cart takes 4 of product 0's units after they were read
+            Product.objects.filter(pk=self.products[0].pk).update(reserved_stock=4)
+            return real_select_for_update(*args, **kwargs)
+        
+        with mock.patch.object(StockReservation.objects, 'select_for_update', side_effect=take_units):
+            short = merge_guest_cart(self.user, {self.products[0].pk: 3, self.products[1].pk: 2})
+        self.assertEqual(short, [self.products[0]])
+        self.assertEqual(
+            dict(OrderItem.objects.filter(order__user=self.user).values_list('product', 'quantity')),
+            {self.products[1].pk: 2}
+        )
+        self.assertEqual(
+            list(Product.objects.filter(pk__in=[p.pk for p in self.products[:2]]).order_by('price').values_list('reserved_stock', flat=True)),
+            [4, 2]
+        )
+    
+    def test_merge_query_count_is_flat(self):
+        """Test the merge runs the same queries for two lines or six."""
+        def merge(products):
+            Order.objects.filter(user=self.user).delete()
+            with CaptureQueriesContext(connection) as captured:
+                merge_guest_cart(self.user, {product.pk: 1 for product in products})
+            return len(captured)
+        
+        self.assertEqual(merge(self.products[:2]), merge(self.products))
+        self.assertEqual(OrderItem.objects.filter(order__user=self.user).count(), 6)
+    
+    def test_guest_add_requires_post_and_csrf(self):
+        """Test cross-site requests cannot fill a guest's cookie cart."""
+        client = Client(enforce_csrf_checks=True)
+        url = f'/cart/add/{self.products[0].product_id}/'
+        self.assertEqual(client.get(url).status_code, 405)
+        response = client.post(url, {'quantity': 1})
+        self.assertEqual(response.status_code, 403)
+        self.assertNotIn(GUEST_CART_COOKIE, response.cookies)
+    
+    def test_add_only_follows_local_next(self):
+        """Test next sends the shopper back to this site, never to another one."""
+        url = f'/cart/add/{self.products[0].product_id}/'
+        response = self.client.post(url, {'quantity': 1, 'next': '/cart/'})
+        self.assertRedirects(response, '/cart/', fetch_redirect_response=False)
+        for offsite in ('https://evil.example/', '//evil.example/'):
+            response = self.client.post(url, {'quantity': 1, 'next': offsite})
+            self.assertRedirects(response, '/', fetch_redirect_response=False)
+    
+    def test_guest_line_edits_require_post(self):
+        """Test a GET cannot change or drop a line of the guest cart."""
+        self.client.cookies[GUEST_CART_COOKIE] = f'{self.products[0].product_id.hex}:3'
+        for action in ('update', 'remove'):
+            response = self.client.get(f'/cart/guest/{self.products[0].product_id}/{action}/')
+            self.assertEqual(response.status_code, 405)
+            self.assertNotIn(GUEST_CART_COOKIE, response.cookies)
+    
+    def test_cached_pages_set_cookie_for_double_submit(self):
+        """Test guests get the CSRF cookie with cached pages and can post it back."""
+        client = Client(enforce_csrf_checks=True)
+        client.get('/')
+        response = client.get('/')
+        self.assertEqual(response['X-Page-Cache'], 'hit')
+        self.assertNotContains(response, settings.CSRF_COOKIE_NAME + '=')
+        token = client.cookies[settings.CSRF_COOKIE_NAME].value
+        
+        response = client.post(
+            f'/cart/add/{self.products[0].product_id}/',
+            {'quantity': 2, 'csrfmiddlewaretoken': token}
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(GUEST_CART_COOKIE, response.cookies)
+    
+    def test_guest_checkout_requires_login(self):
+        """Test checkout still sends guests to the login page."""
+        self._add(self.products[0])
+        response = self.client.get('/checkout/')
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('/user/login/', response['Location'])
+
+
+class CartBatchUpdateTestCase(TestCase):
+    """Test cases for the batched cart update endpoint."""
+    
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        self.user = User.objects.create_user(
+            email="test@example.com",
+            phone_number="01712345678",
+            first_name="John",
+            last_name="Doe",
+            house_number="123",
+            road_number="45",
+            postal_code="1234",
+            district="Dhaka",
+            password="testpass123"
+        )
+        self.brand = Brand.objects.create(brand_name="CeraVe")
+        self.category = Category.objects.create(category_name="Moisturizers")
+        self.products = [
+            Product.objects.create(
+                product_name=f"Cream {i}",
+                brand=self.brand,
+                category=self.category,
+                product_details="Test",
+                price=Decimal("100.00"),
+                available_stock=5
+            )
+            for i in range(10)
+        ]
+        self.order = Order.objects.create(user=self.user, in_cart=True)
+        self.items = []
+        for product in self.products:
+            reserve(self.order.pk, product.pk, 1)
+            self.items.append(OrderItem.objects.create(
+                order=self.order, product=product, quantity=1, price_at_purchase=product.price
+            ))
+        self.client.login(email="test@example.com", password="testpass123")
+    
+    def _post(self, quantities, **extra):
+        data = {f'quantity-{item.order_item_id}': quantity for item, quantity in quantities}
+        return self.client.post('/cart/update/', data, **extra)
+    
+    def _reserved(self, product):
+        product.refresh_from_db()
+        return product.reserved_stock
+    
+    def test_form_update_changes_quantities_and_holds(self):
+        """Test one form post updates many lines and their stock holds."""
+        response = self._post([(self.items[0], 3), (self.items[1], 2)])
+        self.assertRedirects(response, '/cart/', fetch_redirect_response=False)
+        self.items[0].refresh_from_db()
+        self.assertEqual(self.items[0].quantity, 3)
+        self.assertEqual(self._reserved(self.products[0]), 3)
+        self.assertEqual(self._reserved(self.products[1]), 2)
+        self.assertEqual(
+            StockReservation.objects.get(order=self.order, product=self.products[0]).quantity, 3
+        )
+        self.assertEqual(self.client.get('/cart/').context['cart_summary']['item_count'], 13)
+    
+    def test_zero_quantity_removes_line(self):
+        """Test a quantity of 0 deletes the line and releases its hold."""
+        self._post([(self.items[0], 0), (self.items[1], 2)])
+        self.assertFalse(OrderItem.objects.filter(pk=self.items[0].pk).exists())
+        self.assertFalse(StockReservation.objects.filter(order=self.order, product=self.products[0]).exists())
+        self.assertEqual(self._reserved(self.products[0]), 0)
+    
+    def test_query_count_is_flat(self):
+        """Test updating ten lines runs the same queries as two."""
+        def update(quantity, count):
+            with CaptureQueriesContext(connection) as captured:
+                self._post([(item, quantity) for item in self.items[:count]])
+            return len(captured)
+        
+        self.assertEqual(update(2, 2), update(3, 10))
+        self.assertEqual(self._reserved(self.products[9]), 3)
+    
+    def test_lines_short_of_stock_are_rejected(self):
+        """Test a line asking for more than is free is left as it was."""
+        self.products[0].available_stock = 2
+        self.products[0].save()
+        response = self._post([(self.items[0], 4), (self.items[1], 2)], follow=True)
+        self.assertContains(response, "Not enough stock for: Cream 0 (only 2 available)")
+        self.items[0].refresh_from_db()
+        self.items[1].refresh_from_db()
+        self.assertEqual((self.items[0].quantity, self.items[1].quantity), (1, 2))
+        self.assertEqual(self._reserved(self.products[0]), 1)
+    
+    def test_removals_apply_when_stock_is_oversubscribed(self):
+        """Test removing lines works even when holds exceed the stock left."""
+        # Stock was cut to 0 while this cart holds 1 and other carts hold 2
+        Product.objects.filter(pk=self.products[0].pk).update(available_stock=0, reserved_stock=3)
+        response = self._post([(self.items[0], 0)], follow=True)
+        self.assertContains(response, "Cart updated.")
+        self.assertFalse(OrderItem.objects.filter(pk=self.items[0].pk).exists())
+        self.assertEqual(self._reserved(self.products[0]), 2)
+    
+    def test_conflicting_batch_is_reported_not_applied(self):
+        """Test a batch rolled back by a concurrent claim says nothing changed."""
+        real_select_for_update = StockReservation.objects.select_for_update
+        
+        def claim_everything(*args, **kwargs):
+            # Another cart takes the remaining units after the lines were read
+            Product.objects.filter(pk=self.products[0].pk).update(reserved_stock=5)
+            return real_select_for_update(*args, **kwargs)
+        
+        with mock.patch.object(
+            StockReservation.objects, 'select_for_update', side_effect=claim_everything
+        ):
+            response = self._post([(self.items[0], 3), (self.items[1], 0)])
+        response = self.client.get(response['Location'])
+        self.assertContains(response, "nothing was changed")
+        self.assertNotContains(response, "Cart updated.")
+        self.assertTrue(OrderItem.objects.filter(pk=self.items[1].pk).exists())
+        self.items[0].refresh_from_db()
+        self.assertEqual(self.items[0].quantity, 1)
+    
+    def test_json_response_has_subtotals(self):
+        """Test a JSON body gets JSON subtotals and totals back."""
+        body = {'items': [{'order_item_id': str(self.items[0].order_item_id), 'quantity': 4}]}
+        response = self.client.post(
+            '/cart/update/', json.dumps(body), content_type='application/json',
+            HTTP_ACCEPT='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        line = next(line for line in data['items'] if line['order_item_id'] == str(self.items[0].order_item_id))
+        self.assertEqual((line['quantity'], line['subtotal']), (4, '400.00'))
+        self.assertEqual(data['item_count'], 13)
+        self.assertEqual(data['total_price'], '1300.00')
+        self.assertEqual(data['rejected'], [])
+        
+        body['items'][0]['quantity'] = 6
+        response = self.client.post(
+            '/cart/update/', json.dumps(body), content_type='application/json',
+            HTTP_ACCEPT='application/json'
+        )
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(
+            response.json()['rejected'],
+            [{'order_item_id': str(self.items[0].order_item_id), 'available': 5}]
+        )
+    
+    def test_ajax_gets_cart_fragment(self):
+        """Test an XMLHttpRequest gets the cart items fragment only."""
+        response = self._post([(self.items[0], 2)], HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertTemplateUsed(response, 'products/includes/cart_items.html')
+        self.assertTemplateNotUsed(response, 'products/cart.html')
+        self.assertContains(response, 'id="cart-items"')
+        self.assertContains(response, 'Total: BDT 1100.00')
+    
+    def test_bad_input_is_rejected(self):
+        """Test malformed lines change nothing; JSON gets a 400, forms a message."""
+        response = self.client.post('/cart/update/', {'quantity-not-a-uuid': 2}, follow=True)
+        self.assertRedirects(response, '/cart/')
+        self.assertContains(response, "Please enter a whole number for each quantity.")
+        response = self.client.post('/cart/update/', '{"lines": []}', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self._reserved(self.products[0]), 1)
+    
+    def test_fractional_and_boolean_quantities_are_rejected(self):
+        """Test a quantity that is not a whole number is rejected, not rounded."""
+        line = str(self.items[0].order_item_id)
+        response = self._post([(self.items[0], '1.7')])
+        self.assertRedirects(response, '/cart/', fetch_redirect_response=False)
+        for quantity in (1.7, True):
+            body = {'items': [{'order_item_id': line, 'quantity': quantity}]}
+            response = self.client.post('/cart/update/', json.dumps(body), content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+        self.items[0].refresh_from_db()
+        self.assertEqual(self.items[0].quantity, 1)
+        self.assertEqual(self._reserved(self.products[0]), 1)
+    
+    def test_quantity_max_is_what_this_cart_can_take(self):
+        """Test the quantity field allows free units plus this cart's own hold."""
+        # Another cart holds 2 of the 5 units, this one holds 1
+        Product.objects.filter(pk=self.products[0].pk).update(reserved_stock=3)
+        response = self.client.get('/cart/')
+        self.assertContains(
+            response,
+            f'name="quantity-{self.items[0].order_item_id}" min="0" max="3" value="1"'
+        )
+        
+        self.client.logout()
+        self.client.post(f'/cart/add/{self.products[0].product_id}/', {'quantity': 1})
+        response = self.client.get('/cart/')
+        self.assertContains(response, f'name="quantity-{self.products[0].product_id}" min="0" max="2"')
+    
+    def test_guest_batch_update(self):
+        """Test the cookie cart takes the same batched update by product id."""
+        self.client.logout()
+        for product in self.products[:3]:
+            self.client.post(f'/cart/add/{product.product_id}/', {'quantity': 1})
+        response = self.client.post('/cart/guest/update/', {
+            f'quantity-{self.products[0].product_id}': 3,
+            f'quantity-{self.products[1].product_id}': 0,
+            f'quantity-{self.products[2].product_id}': 9,
+        }, follow=True)
+        self.assertContains(response, "Not enough stock for: Cream 2 (only 4 available)")
+        self.assertEqual(
+            [(item.product, item.quantity) for item in response.context['items']],
+            [(self.products[0], 3), (self.products[2], 1)]
+        )
+    
+    def test_cart_page_posts_to_batch_endpoint(self):
+        """Test the cart page renders one update form for all lines."""
+        response = self.client.get('/cart/')
+        self.assertContains(response, 'action="/cart/update/"', count=1)
+        self.assertContains(response, f'name="quantity-{self.items[0].order_item_id}"')
+
+
+class StaticAssetTestCase(TestCase):
+    """Test cases for the extracted, hashed and precompressed stylesheets."""
+    
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        self.static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.static_root, ignore_errors=True)
+    
+    def test_pages_link_stylesheets_instead_of_inline_css(self):
+        """Test storefront and account pages carry no <style> block."""
+        for url, stylesheet in [
+            ('/', 'products/css/catalog'),
+            ('/cart/', 'products/css/cart'),
+            ('/user/login/', 'user/css/login'),
+            ('/user/register/', 'user/css/register'),
+        ]:
+            response = self.client.get(url)
+            self.assertNotContains(response, '<style>')
+            self.assertContains(response, stylesheet)
+    
+    def test_collectstatic_writes_hashed_precompressed_files(self):
+        """Test collectstatic hashes the CSS and writes smaller gzip and brotli copies."""
+        with override_settings(STATIC_ROOT=self.static_root, DEBUG=False):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            url = static('products/css/store.css')
+            self.assertRegex(url, r'^/static/products/css/store\.[0-9a-f]{12}\.css$')
+            
+            path = os.path.join(self.static_root, url.removeprefix('/static/'))
+            size = os.path.getsize(path)
+            self.assertLess(os.path.getsize(path + '.gz'), size)
+            self.assertLess(os.path.getsize(path + '.br'), size)
+            self.assertContains(self.client.get('/user/login/'), static('user/css/account.css'))
+    
+    def test_view_serves_accepted_encoding_with_far_future_headers(self):
+        """Test hashed files are served precompressed and cached for a year."""
+        with override_settings(STATIC_ROOT=self.static_root, DEBUG=False):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            url = static('products/css/store.css')
+            
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, br')
+            self.assertEqual(response['Content-Encoding'], 'br')
+            self.assertEqual(response['Content-Type'], 'text/css')
+            self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+            self.assertEqual(response['Vary'], 'Accept-Encoding')
+            
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip;q=1, br;q=0')
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            
+            response = self.client.get(url)
+            self.assertFalse(response.has_header('Content-Encoding'))
+            self.assertIn(b'.header', b''.join(response.streaming_content))
+            
+            response = self.client.get('/static/products/css/store.css')
+            self.assertEqual(response['Cache-Control'], 'public, max-age=60')
+            self.assertEqual(self.client.get('/static/../manage.py').status_code, 404)
+    
+    def test_plain_names_without_manifest(self):
+        """Test pages still link the unhashed files before collectstatic has run."""
+        with override_settings(STATIC_ROOT=self.static_root, DEBUG=False):
+            self.assertEqual(static('products/css/store.css'), '/static/products/css/store.css')
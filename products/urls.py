@@ -1,14 +1,34 @@
 from django.urls import path
-from . import views
+from . import api, async_views, views
 
 app_name = 'products'
 
 urlpatterns = [
     path('', views.home_view, name='home'),
+    path('search/', views.search_view, name='search'),
     path('product/<uuid:product_id>/', views.product_detail_view, name='product_detail'),
     path('cart/', views.cart_view, name='cart'),
     path('cart/add/<uuid:product_id>/', views.add_to_cart_view, name='add_to_cart'),
+    path('cart/update/', views.update_cart_view, name='update_cart'),
+    path('cart/guest/update/', views.update_guest_cart_view, name='update_guest_cart'),
     path('cart/item/<uuid:order_item_id>/update/', views.update_cart_item_view, name='update_cart_item'),
     path('cart/item/<uuid:order_item_id>/remove/', views.remove_from_cart_view, name='remove_cart_item'),
+    path('cart/guest/<uuid:product_id>/update/', views.update_guest_cart_item_view, name='update_guest_cart_item'),
+    path('cart/guest/<uuid:product_id>/remove/', views.remove_guest_cart_item_view, name='remove_guest_cart_item'),
     path('checkout/', views.checkout_view, name='checkout'),
+    path('api/products/', api.product_list_api, name='api_product_list'),
+    path('api/products/<uuid:product_id>/', api.product_detail_api, name='api_product_detail'),
+]
+
+# The same routes with the async catalog views, served under ASGI
+# (see pookiecare.asgi_urls)
+ASYNC_VIEWS = {
+    'home': async_views.home_view,
+    'product_detail': async_views.product_detail_view,
+    'cart': async_views.cart_view,
+}
+async_urlpatterns = [
+    path(str(pattern.pattern), ASYNC_VIEWS[pattern.name], name=pattern.name)
+    if pattern.name in ASYNC_VIEWS else pattern
+    for pattern in urlpatterns
 ]
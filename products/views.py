@@ -1,135 +1,211 @@
+import json
+import re
+import uuid
+
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
+from django.db.models import Prefetch
+from django.http import JsonResponse
 from django.urls import reverse
+from django.utils.http import url_has_allowed_host_and_scheme
+from django.views.decorators.http import require_POST
 
-from .models import Product, Brand, Category, Order, OrderItem
+from .models import Product, Order, OrderItem
+from .facets import FacetFilters, get_facets
 from .forms import CheckoutForm
+from .cart import invalidate_cart_summary
+from .cart_updates import update_cart_lines
+from .guest_cart import (
+    MAX_GUEST_CART_LINES, MAX_GUEST_LINE_QUANTITY, guest_cart_items, guest_cart_total,
+    read_guest_cart, save_guest_cart,
+)
+from .page_cache import cache_anonymous_page
+from .pagination import paginate_products
+from .recommendations import recommended_products
+from .reservations import release, reserve, with_max_quantity
+from .search import search_products
+
+
+# Lines accepted by one batched cart update
+MAX_CART_UPDATE_LINES = 100
 
+# A quantity form field: digits with an optional minus
+QUANTITY_FIELD = re.compile(r'-?[0-9]+')
 
+
+@cache_anonymous_page
 def home_view(request):
     """Display homepage with all products and featured products."""
     products = Product.objects.filter(available_stock__gt=0).select_related('brand', 'category')
     featured_products = products.filter(featured=True)[:6]
-    cart_item_count = 0
-
-    if request.user.is_authenticated:
-        cart = (
-            Order.objects.filter(user=request.user, in_cart=True)
-            .prefetch_related('items')
-            .first()
-        )
-        if cart:
-            cart_item_count = cart.get_total_items()
     
-    # Get filter parameters
-    brand_filter = request.GET.get('brand')
-    category_filter = request.GET.get('category')
+    # Multi-select brand/category and price range filters
+    filters = FacetFilters.from_query(request.GET)
+    if filters.active:
+        products = filters.apply(products)
     
-    # Apply filters
-    if brand_filter:
-        products = products.filter(brand__brand_id=brand_filter)
-    if category_filter:
-        products = products.filter(category__category_id=category_filter)
+    # Keyset pagination keeps deep pages as cheap as the first one
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+    page = paginate_products(products, after=after, before=before)
     
-    # Get all brands and categories for filter dropdown
-    brands = Brand.objects.all()
-    categories = Category.objects.all()
+    # Per-value product counts for the filter panel (cached per filter state)
+    facets = get_facets(filters)
     
     context = {
-        'products': products,
+        'products': page,
+        'page': page,
+        'is_first_page': not page.has_previous,
         'featured_products': featured_products,
-        'brands': brands,
-        'categories': categories,
-        'selected_brand': brand_filter,
-        'selected_category': category_filter,
-        'cart_item_count': cart_item_count,
+        'filters': filters,
+        'brand_facets': facets['brands'],
+        'category_facets': facets['categories'],
     }
     
     return render(request, 'products/home.html', context)
 
 
+@cache_anonymous_page
 def product_detail_view(request, product_id):
     """Display detailed product information."""
-    product = get_object_or_404(Product, product_id=product_id)
-    related_products = Product.objects.filter(
-        category=product.category,
-        available_stock__gt=0
-    ).exclude(product_id=product_id)[:4]
-    cart_item_count = 0
-
-    if request.user.is_authenticated:
-        cart = (
-            Order.objects.filter(user=request.user, in_cart=True)
-            .prefetch_related('items')
-            .first()
-        )
-        if cart:
-            cart_item_count = cart.get_total_items()
+    product = get_object_or_404(
+        Product.objects.select_related('brand', 'category'),
+        product_id=product_id
+    )
+    # Frequently bought together, topped up from the same category
+    related_products = recommended_products(product, limit=4)
     
     context = {
         'product': product,
         'related_products': related_products,
-        'cart_item_count': cart_item_count,
     }
     
     return render(request, 'products/product_detail.html', context)
 
 
-@login_required
-def add_to_cart_view(request, product_id):
-    """Add a product to the authenticated user's cart."""
-    product = get_object_or_404(Product, product_id=product_id)
+def search_view(request):
+    """Display products matching a full-text search query, best match first."""
+    query = request.GET.get('q', '').strip()
+    results = search_products(query, limit=48) if query else []
+    
+    context = {
+        'query': query,
+        'results': results,
+    }
+    
+    return render(request, 'products/search.html', context)
+
 
+def _posted_quantity(request):
     try:
-        quantity = int(request.POST.get('quantity', 1))
+        return int(request.POST.get('quantity', 1))
     except (TypeError, ValueError):
-        quantity = 1
+        return 1
 
-    quantity = max(quantity, 1)
-    next_url = request.POST.get('next') or reverse('products:home')
 
-    if product.available_stock <= 0:
+@require_POST
+def add_to_cart_view(request, product_id):
+    """
+    Add a product to the cart: the database cart of a logged-in user, or
+    the signed cookie cart of a guest. Guests post from cached pages, whose
+    CSRF field is filled from the CSRF cookie (see ``products.page_cache``).
+    """
+    product = get_object_or_404(Product, product_id=product_id)
+    quantity = max(_posted_quantity(request), 1)
+    next_url = request.POST.get('next')
+    # Guests can reach this view from any site, so never follow an offsite next
+    if not url_has_allowed_host_and_scheme(
+        next_url, allowed_hosts={request.get_host()}, require_https=request.is_secure()
+    ):
+        next_url = reverse('products:home')
+
+    if product.available_to_sell <= 0:
         messages.error(request, "This product is currently out of stock.")
         return redirect(next_url)
 
-    if quantity > product.available_stock:
-        messages.error(request, "Requested quantity exceeds available stock.")
-        return redirect(next_url)
-
-    order, _ = Order.objects.get_or_create(user=request.user, in_cart=True)
-    order_item, created = OrderItem.objects.get_or_create(
-        order=order,
-        product=product,
-        defaults={
-            'quantity': quantity,
-            'price_at_purchase': product.price,
-        }
-    )
-
-    if created:
-        messages.success(request, f"Added {quantity} x {product.product_name} to your cart.")
+    if not request.user.is_authenticated:
+        # Cookie cart: nothing is written to the database or held
+        lines = read_guest_cart(request)
+        held = lines.get(product.pk, 0)
+        limit = min(product.available_to_sell, MAX_GUEST_LINE_QUANTITY)
+        if held + quantity > limit:
+            messages.error(request, f"Only {limit} items available. Update quantity in cart.")
+            return redirect(next_url)
+        if not held and len(lines) >= MAX_GUEST_CART_LINES:
+            messages.error(request, "Your cart is full. Log in to add more products.")
+            return redirect(next_url)
+        lines[product.pk] = held + quantity
+        response = redirect(next_url)
+        save_guest_cart(response, lines)
     else:
-        new_quantity = order_item.quantity + quantity
-        if new_quantity > product.available_stock:
-            messages.error(
-                request,
-                f"Only {product.available_stock} items available. Update quantity in cart."
+        order, _ = Order.objects.get_or_create(user=request.user, in_cart=True)
+
+        with transaction.atomic():
+            # Locked, and created if missing, inside the transaction: a double
+            # submit of the first add finds the line the other request made
+            order_item, created = OrderItem.objects.select_for_update().get_or_create(
+                order=order,
+                product=product,
+                defaults={'quantity': quantity, 'price_at_purchase': product.price},
             )
-            return redirect(next_url)
-        order_item.quantity = new_quantity
-        order_item.save()
+            held = 0 if created else order_item.quantity
+
+            # Hold the units before keeping the line so a short line is
+            # rejected here instead of at checkout
+            if not reserve(order.pk, product.pk, held + quantity):
+                transaction.set_rollback(True)
+                if held:
+                    messages.error(
+                        request,
+                        f"Only {product.available_to_sell + held} items available. Update quantity in cart."
+                    )
+                else:
+                    messages.error(request, "Requested quantity exceeds available stock.")
+                return redirect(next_url)
+
+            if held:
+                order_item.quantity = held + quantity
+                order_item.save()
+
+        invalidate_cart_summary(request.user.pk)
+        response = redirect(next_url)
+
+    if held:
         messages.success(request, f"Updated {product.product_name} quantity in your cart.")
+    else:
+        messages.success(request, f"Added {quantity} x {product.product_name} to your cart.")
+    return response
 
-    return redirect(next_url)
+
+def _user_cart_items(user):
+    return list(
+        with_max_quantity(OrderItem.objects.filter(order__user=user, order__in_cart=True))
+        .select_related('product__brand', 'product__category')
+        .order_by('-created_at')
+    )
 
 
-@login_required
 def cart_view(request):
-    """Display the current user's shopping cart."""
+    """Display the shopping cart: the user's database cart or the guest's cookie cart."""
+    if not request.user.is_authenticated:
+        items = guest_cart_items(read_guest_cart(request))
+        return render(
+            request,
+            'products/cart.html',
+            {'cart': None, 'items': items, 'total_price': guest_cart_total(items)}
+        )
+
     cart = (
         Order.objects.filter(user=request.user, in_cart=True)
-        .prefetch_related('items__product__brand', 'items__product__category')
+        .prefetch_related(
+            Prefetch(
+                'items',
+                queryset=with_max_quantity(OrderItem.objects.all())
+                .select_related('product__brand', 'product__category')
+            )
+        )
         .first()
     )
     items = cart.items.all() if cart else []
@@ -147,6 +223,7 @@ def cart_view(request):
 
 
 @login_required
+@require_POST
 def update_cart_item_view(request, order_item_id):
     """Update the quantity of a cart item or remove it if quantity < 1."""
     order_item = get_object_or_404(
@@ -156,27 +233,218 @@ def update_cart_item_view(request, order_item_id):
         order__in_cart=True,
     )
 
-    try:
-        quantity = int(request.POST.get('quantity', 1))
-    except (TypeError, ValueError):
-        quantity = 1
-
+    quantity = _posted_quantity(request)
     if quantity < 1:
-        order_item.delete()
+        with transaction.atomic():
+            order_item.delete()
+            release(order_item.order_id, order_item.product_id)
+        invalidate_cart_summary(request.user.pk)
         messages.success(request, "Item removed from your cart.")
         return redirect('products:cart')
 
-    if quantity > order_item.product.available_stock:
-        messages.error(request, "Requested quantity exceeds available stock.")
-        return redirect('products:cart')
-
-    order_item.quantity = quantity
-    order_item.save()
+    with transaction.atomic():
+        if not reserve(order_item.order_id, order_item.product_id, quantity):
+            messages.error(request, "Requested quantity exceeds available stock.")
+            return redirect('products:cart')
+        order_item.quantity = quantity
+        order_item.save()
+    invalidate_cart_summary(request.user.pk)
     messages.success(request, "Cart updated.")
     return redirect('products:cart')
 
 
+def _is_quantity(value):
+    """Whole numbers only, so a posted 1.7, "1.7" or true is not taken as 1."""
+    if isinstance(value, str):
+        return QUANTITY_FIELD.fullmatch(value) is not None
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _posted_quantities(request, id_field):
+    """
+    Return ``{id: quantity}`` from the cart form's ``quantity-<id>`` fields
+    or a JSON body ``{"items": [{"<id_field>": ..., "quantity": ...}]}``.
+    Raises ValueError on malformed input.
+    """
+    if request.content_type == 'application/json':
+        try:
+            pairs = [(line[id_field], line['quantity']) for line in json.loads(request.body)['items']]
+        except (KeyError, TypeError) as exc:
+            raise ValueError(f'Expected {{"items": [{{"{id_field}": ..., "quantity": ...}}]}}.') from exc
+    else:
+        pairs = [
+            (key.removeprefix('quantity-'), value)
+            for key, value in request.POST.items() if key.startswith('quantity-')
+        ]
+    if len(pairs) > MAX_CART_UPDATE_LINES:
+        raise ValueError(f'At most {MAX_CART_UPDATE_LINES} lines per update.')
+    quantities = {}
+    for key, value in pairs:
+        try:
+            if not _is_quantity(value):
+                raise ValueError(value)
+            quantities[uuid.UUID(str(key))] = int(value)
+        except (TypeError, ValueError) as exc:
+            raise ValueError(f'Invalid line: {key}.') from exc
+    return quantities
+
+
+def _invalid_cart_update(request, exc):
+    """
+    Answer malformed batched cart input with a JSON 400 for JSON clients and
+    an error message on the cart page for form posts.
+    """
+    if request.content_type == 'application/json' or 'application/json' in request.headers.get('Accept', ''):
+        return JsonResponse({'detail': str(exc)}, status=400)
+    messages.error(request, "Please enter a whole number for each quantity.")
+    return redirect('products:cart')
+
+
+def _cart_update_response(request, items, rejected, id_field, applied=True):
+    """
+    Answer a batched cart update with JSON subtotals when the client
+    accepts JSON, the cart items fragment for XMLHttpRequest, and a
+    redirect to the cart page otherwise. ``applied`` is False when the
+    batch was rolled back as a whole.
+    """
+    for item in items:
+        available = rejected.get(getattr(item, id_field))
+        if available is not None:
+            item.rejected, item.available_quantity = True, available
+    total_price = guest_cart_total(items)
+    status = 409 if rejected or not applied else 200
+
+    if 'application/json' in request.headers.get('Accept', ''):
+        return JsonResponse(
+            {
+                'items': [
+                    {
+                        id_field: str(getattr(item, id_field)),
+                        'quantity': item.quantity,
+                        'subtotal': str(item.get_subtotal()),
+                    }
+                    for item in items
+                ],
+                'rejected': [
+                    {id_field: str(key), 'available': available} for key, available in rejected.items()
+                ],
+                'item_count': sum(item.quantity for item in items),
+                'total_price': str(total_price),
+                'applied': applied,
+            },
+            status=status,
+        )
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        return render(
+            request,
+            'products/includes/cart_items.html',
+            {'items': items, 'total_price': total_price},
+            status=status,
+        )
+    if not applied:
+        messages.error(
+            request, "Stock changed while your cart was being updated, so nothing was changed. Please try again."
+        )
+    elif rejected:
+        shortages = ", ".join(
+            f"{item.product.product_name} (only {item.available_quantity} available)"
+            for item in items if getattr(item, 'rejected', False)
+        )
+        messages.error(request, f"Not enough stock for: {shortages}.")
+    else:
+        messages.success(request, "Cart updated.")
+    return redirect('products:cart')
+
+
+@login_required
+@require_POST
+def update_cart_view(request):
+    """
+    Apply the quantity changes of many cart lines in one request and one
+    transaction. Takes ``quantity-<order_item_id>`` form fields or JSON
+    ``{"items": [{"order_item_id": ..., "quantity": ...}]}``; a quantity
+    below 1 removes the line.
+    """
+    try:
+        quantities = _posted_quantities(request, 'order_item_id')
+    except ValueError as exc:
+        return _invalid_cart_update(request, exc)
+
+    cart = Order.objects.filter(user=request.user, in_cart=True).first()
+    rejected, applied = {}, True
+    if cart and quantities:
+        result = update_cart_lines(cart, quantities)
+        rejected, applied = result.rejected, not result.conflict
+        invalidate_cart_summary(request.user.pk)
+    return _cart_update_response(
+        request, _user_cart_items(request.user), rejected, 'order_item_id', applied=applied
+    )
+
+
+@require_POST
+def update_guest_cart_view(request):
+    """Batched update of the cookie cart, keyed by product id; see ``update_cart_view``."""
+    try:
+        quantities = _posted_quantities(request, 'product_id')
+    except ValueError as exc:
+        return _invalid_cart_update(request, exc)
+
+    lines = read_guest_cart(request)
+    quantities = {pk: quantity for pk, quantity in quantities.items() if pk in lines}
+    products = Product.objects.in_bulk([pk for pk, quantity in quantities.items() if quantity > 0])
+    rejected = {}
+    for pk, quantity in quantities.items():
+        if quantity < 1:
+            del lines[pk]
+            continue
+        product = products.get(pk)
+        available = min(product.available_to_sell, MAX_GUEST_LINE_QUANTITY) if product else 0
+        if quantity > available:
+            rejected[pk] = max(available, 0)
+        else:
+            lines[pk] = quantity
+
+    response = _cart_update_response(request, guest_cart_items(lines), rejected, 'product_id')
+    save_guest_cart(response, lines)
+    return response
+
+
+@require_POST
+def update_guest_cart_item_view(request, product_id):
+    """Update the quantity of a cookie cart line or remove it if quantity < 1."""
+    lines = read_guest_cart(request)
+    if product_id not in lines:
+        return redirect('products:cart')
+
+    quantity = _posted_quantity(request)
+    if quantity < 1:
+        del lines[product_id]
+        messages.success(request, "Item removed from your cart.")
+    else:
+        product = get_object_or_404(Product, product_id=product_id)
+        if quantity > min(product.available_to_sell, MAX_GUEST_LINE_QUANTITY):
+            messages.error(request, "Requested quantity exceeds available stock.")
+            return redirect('products:cart')
+        lines[product_id] = quantity
+        messages.success(request, "Cart updated.")
+    response = redirect('products:cart')
+    save_guest_cart(response, lines)
+    return response
+
+
+@require_POST
+def remove_guest_cart_item_view(request, product_id):
+    """Remove a line from the cookie cart."""
+    lines = read_guest_cart(request)
+    response = redirect('products:cart')
+    if lines.pop(product_id, None):
+        messages.success(request, "Item removed from your cart.")
+        save_guest_cart(response, lines)
+    return response
+
+
 @login_required
+@require_POST
 def remove_from_cart_view(request, order_item_id):
     """Remove an item from the cart."""
     order_item = get_object_or_404(
@@ -185,7 +453,10 @@ def remove_from_cart_view(request, order_item_id):
         order__user=request.user,
         order__in_cart=True,
     )
-    order_item.delete()
+    with transaction.atomic():
+        order_item.delete()
+        release(order_item.order_id, order_item.product_id)
+    invalidate_cart_summary(request.user.pk)
     messages.success(request, "Item removed from your cart.")
     return redirect('products:cart')
 
@@ -227,11 +498,22 @@ def checkout_view(request):
             user.district = form.cleaned_data['district']
             user.save()
 
-            success = cart.complete_order()
-            if success:
+            result = cart.complete_order()
+            if result:
                 messages.success(request, "Order placed successfully!")
                 return redirect('products:home')
-            messages.error(request, "Not enough stock to complete your order.")
+            if result.reason == 'not_in_cart':
+                # Completed by another request (a double submit) since the cart was read
+                messages.error(request, "This order has already been placed or is no longer in your cart.")
+                return redirect('products:cart')
+            if result.failed_items:
+                shortages = ", ".join(
+                    f"{item.product.product_name} (only {item.available_quantity} left)"
+                    for item in result.failed_items
+                )
+                messages.error(request, f"Not enough stock to complete your order: {shortages}.")
+            else:
+                messages.error(request, "Not enough stock to complete your order.")
             return redirect('products:cart')
     else:
         form = CheckoutForm(initial=initial_data)
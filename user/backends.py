@@ -20,6 +20,8 @@ class EmailBackend(ModelBackend):
         try:
             user = User.objects.get(email=email)
         except User.DoesNotExist:
+            # Hash anyway so unknown emails take as long as wrong passwords
+            User().set_password(password)
             return None
         
         if user.check_password(password) and self.user_can_authenticate(user):
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from products.counters import process_local_warning
+
+from user.throttle import login_throttle_stats, reset_login_throttle_stats
+
+
+class Command(BaseCommand):
+    """
+    Print how many login attempts the throttle rejected per bucket. The
+    counters live in the ``STATS_CACHE`` alias (see ``products.counters``);
+    with a per-process backend such as LocMemCache this command cannot see
+    the web server's counts, and says so.
+    """
+
+    help = 'Show (and optionally reset) the rejected login attempt counters.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Zero the counters afterwards.')
+
+    def handle(self, *args, **options):
+        warning = process_local_warning()
+        if warning:
+            self.stderr.write(self.style.WARNING(warning))
+        stats = login_throttle_stats()
+        self.stdout.write(f"rejected_ip={stats['rejected_ip']} rejected_email={stats['rejected_email']}")
+        if options['reset']:
+            reset_login_throttle_stats()
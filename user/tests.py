@@ -1,6 +1,13 @@
-from django.test import TestCase
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import authenticate
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
 from django.core.exceptions import ValidationError
 from .models import User
+from .throttle import check_login, login_throttle_stats
 
 
 class UserModelTestCase(TestCase):
@@ -127,3 +134,95 @@ class UserModelTestCase(TestCase):
         expected = f"John Doe (test@example.com)"
         self.assertEqual(str(user), expected)
 
+
+
+@override_settings(LOGIN_THROTTLE_RATES={'ip': (6, 60), 'email': (3, 60)})
+class LoginThrottleTestCase(TestCase):
+    """Test cases for login throttling."""
+    
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            phone_number='01712345678',
+            first_name='John',
+            last_name='Doe',
+            house_number='123',
+            road_number='45',
+            postal_code='1234',
+            district='Dhaka',
+            password='testpass123'
+        )
+    
+    def _login(self, email='test@example.com', password='wrong', ip='10.0.0.1'):
+        return self.client.post(
+            '/user/login/', {'email': email, 'password': password}, REMOTE_ADDR=ip
+        )
+    
+    def test_email_bucket_rejects_before_hashing(self):
+        """Test attempts beyond the email burst get a 429 without a query or hash."""
+        for _ in range(3):
+            self.assertEqual(self._login().status_code, 200)
+        
+        with mock.patch.object(User, 'check_password') as check_password:
+            with self.assertNumQueries(0):
+                response = self._login(email=' TEST@example.com', ip='10.0.0.2')
+        check_password.assert_not_called()
+        self.assertEqual(response.status_code, 429)
+        self.assertIn(int(response['Retry-After']), range(1, 21))
+        self.assertContains(response, 'Too many login attempts', status_code=429)
+        self.assertEqual(login_throttle_stats(), {'rejected_ip': 0, 'rejected_email': 1})
+        
+        # Even the right password waits for the bucket to refill
+        self.assertEqual(self._login(password='testpass123').status_code, 429)
+    
+    def test_ip_bucket_covers_many_emails(self):
+        """Test one address cycling through emails is limited by the IP bucket."""
+        for i in range(6):
+            self.assertEqual(self._login(email=f'user{i}@example.com').status_code, 200)
+        self.assertEqual(self._login(email='other@example.com').status_code, 429)
+        self.assertEqual(self._login(email='other@example.com', ip='10.0.0.9').status_code, 200)
+        self.assertEqual(login_throttle_stats()['rejected_ip'], 1)
+    
+    def test_successful_login_refills_email_bucket(self):
+        """Test a successful login forgives earlier typos."""
+        self._login()
+        self._login()
+        response = self._login(password='testpass123')
+        self.assertRedirects(response, '/user/profile/')
+        self.client.logout()
+        for _ in range(3):
+            self.assertEqual(self._login(ip='10.0.0.3').status_code, 200)
+    
+    def test_bucket_refills_over_time(self):
+        """Test tokens come back at attempts / seconds."""
+        request = mock.Mock(META={'REMOTE_ADDR': '10.0.0.4'})
+        for _ in range(3):
+            self.assertEqual(check_login(request, 'a@example.com', now=1000.0), 0)
+        self.assertEqual(check_login(request, 'a@example.com', now=1000.0), 20)
+        self.assertEqual(check_login(request, 'a@example.com', now=1015.0), 5)
+        self.assertEqual(check_login(request, 'a@example.com', now=1020.0), 0)
+        self.assertEqual(check_login(request, 'a@example.com', now=1020.0), 20)
+    
+    @override_settings(LOGIN_THROTTLE=False)
+    def test_throttle_can_be_disabled(self):
+        """Test LOGIN_THROTTLE = False lets every attempt through."""
+        for _ in range(5):
+            self.assertEqual(self._login().status_code, 200)
+    
+    def test_unknown_email_still_hashes(self):
+        """Test unknown emails run the hasher so they are not faster to reject."""
+        with mock.patch('django.contrib.auth.base_user.make_password') as make_password:
+            self.assertIsNone(authenticate(email='nobody@example.com', password='x'))
+        make_password.assert_called_once_with('x')
+    
+    def test_stats_command(self):
+        """Test login_throttle_stats prints and resets the counters."""
+        for _ in range(4):
+            self._login()
+        out, err = StringIO(), StringIO()
+        call_command('login_throttle_stats', reset=True, stdout=out, stderr=err)
+        self.assertIn('rejected_ip=0 rejected_email=1', out.getvalue())
+        self.assertIn('Point STATS_CACHE at a shared cache', err.getvalue())
+        self.assertEqual(login_throttle_stats(), {'rejected_ip': 0, 'rejected_email': 0})
@@ -0,0 +1,109 @@
+"""
+Login throttling.
+
+Every login attempt that names an existing email runs a full PBKDF2 hash,
+so a credential-stuffing burst can keep every worker busy hashing.
+``check_login`` runs before ``authenticate`` and takes a token from two
+buckets kept in the cache: one for the client IP and one for the submitted
+email. When either bucket is empty the attempt is rejected without touching
+the database or the hasher.
+
+Buckets refill continuously, so a client that slows down is never locked
+out for long. Cache updates are read-modify-write, so concurrent requests
+can occasionally share the last token; the limit is approximate, which is
+enough to cap the hashing rate.
+"""
+import hashlib
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from products.counters import increment, read_counters, reset_counters
+
+
+# (attempts, seconds): a full bucket allows a burst of ``attempts``, then
+# one attempt every ``seconds / attempts``
+DEFAULT_LOGIN_THROTTLE_RATES = {
+    'ip': (30, 300),
+    'email': (10, 300),
+}
+
+REJECTED_KEYS = {
+    'ip': 'user:login-throttle:rejected:ip',
+    'email': 'user:login-throttle:rejected:email',
+}
+
+
+def login_throttle_enabled():
+    """Return False when ``LOGIN_THROTTLE`` is switched off in settings."""
+    return getattr(settings, 'LOGIN_THROTTLE', True)
+
+
+def _rate(scope):
+    rates = getattr(settings, 'LOGIN_THROTTLE_RATES', {})
+    return rates.get(scope, DEFAULT_LOGIN_THROTTLE_RATES[scope])
+
+
+def client_ip(request):
+    # Behind a proxy, set REMOTE_ADDR from the trusted forwarding header there;
+    # X-Forwarded-For is client-controlled and cannot be used directly
+    return request.META.get('REMOTE_ADDR') or 'unknown'
+
+
+def normalize_email(email):
+    return (email or '').strip().lower()
+
+
+def _bucket_key(scope, value):
+    digest = hashlib.sha256(value.encode()).hexdigest()[:32]
+    return f'user:login-throttle:{scope}:{digest}'
+
+
+def _take(scope, value, now):
+    """
+    Take a token from a bucket. Return 0 on success, otherwise the whole
+    seconds until a token is available again.
+    """
+    capacity, period = _rate(scope)
+    refill = capacity / period
+    key = _bucket_key(scope, value)
+    tokens, stamp = cache.get(key, (capacity, now))
+    tokens = min(capacity, tokens + max(now - stamp, 0) * refill)
+    if tokens < 1:
+        return max(math.ceil((1 - tokens) / refill), 1)
+    # An untouched bucket is full again after ``period``, so it can expire then
+    cache.set(key, (tokens - 1, now), math.ceil(period))
+    return 0
+
+
+def check_login(request, email, now=None):
+    """
+    Spend one login attempt for the client IP and ``email``. Return 0 to let
+    the attempt through, otherwise the seconds the client should wait.
+    """
+    if not login_throttle_enabled():
+        return 0
+    now = time.time() if now is None else now
+    for scope, value in (('ip', client_ip(request)), ('email', normalize_email(email))):
+        wait = _take(scope, value, now)
+        if wait:
+            increment(REJECTED_KEYS[scope])
+            return wait
+    return 0
+
+
+def reset_email(email):
+    """Refill the bucket of ``email`` after a successful login."""
+    cache.delete(_bucket_key('email', normalize_email(email)))
+
+
+def login_throttle_stats():
+    """Return ``{'rejected_ip', 'rejected_email'}`` since the counters were last reset."""
+    counts = read_counters(REJECTED_KEYS.values())
+    return {f'rejected_{scope}': counts[key] for scope, key in REJECTED_KEYS.items()}
+
+
+def reset_login_throttle_stats():
+    reset_counters(REJECTED_KEYS.values())
@@ -2,7 +2,9 @@ from django.shortcuts import render, redirect
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from products.guest_cart import clear_guest_cart, merge_guest_cart, read_guest_cart
 from .forms import UserRegistrationForm
+from .throttle import check_login, reset_email
 
 
 def register_view(request):
@@ -33,12 +35,31 @@ def login_view(request):
         email = request.POST.get('email')
         password = request.POST.get('password')
         
+        # Turn floods away before they reach the password hasher
+        wait = check_login(request, email)
+        if wait:
+            messages.error(request, 'Too many login attempts. Please try again in a few minutes.')
+            response = render(request, 'user/login.html', status=429)
+            response['Retry-After'] = str(wait)
+            return response
+        
         user = authenticate(request, email=email, password=password)
         
         if user is not None:
+            reset_email(email)
             login(request, user)
             messages.success(request, f'Welcome back, {user.get_full_name()}!')
-            return redirect('user:profile')
+            # Move what the visitor picked as a guest into their account's cart
+            guest_lines = read_guest_cart(request)
+            if not guest_lines:
+                return redirect('user:profile')
+            short = merge_guest_cart(user, guest_lines)
+            if short:
+                names = ', '.join(product.product_name for product in short)
+                messages.warning(request, f'Not enough stock to add everything from your cart: {names}.')
+            response = redirect('products:cart')
+            clear_guest_cart(response)
+            return response
         else:
             messages.error(request, 'Invalid email or password.')
     